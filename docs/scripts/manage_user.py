@@ -10,6 +10,10 @@ import db_utils_neon as db_utils  # Changed from db_utils_sqlite to db_utils_neo
 def update_user_username_and_prn(old_username, new_username, new_prn):
     """
     Update an existing user's username and PRN
+
+    Clears this process's cached records for both names, so the verification reads
+    the updated row. A running API keeps serving its own cached record until
+    USER_CACHE_TTL_SECONDS (default 300) expires, or until it restarts.
     
     Args:
         old_username (str): The current username of the user
@@ -51,6 +55,10 @@ def update_user_username_and_prn(old_username, new_username, new_prn):
         # Update the username and PRN
         cursor.execute("UPDATE users SET first_name = %s, prn = %s WHERE id = %s", (new_username.lower().strip(), new_prn, user_id))
         conn.commit()
+        cursor.close()
+        conn.close()
+        # Drop cached records under both names so the verification below reads the new row
+        db_utils.invalidate_user_cache(old_username, new_username)
         
         # Verify the update by fetching the user again
         updated_user_data = db_utils.get_user_from_db_pg(new_username)
@@ -70,8 +78,6 @@ def update_user_username_and_prn(old_username, new_username, new_prn):
     except Exception as e:
         print(f"Unexpected error: {e}")
         return False
-    finally:
-        # Connection will be closed by db_utils functions
 
 
 def create_user(username, full_name, prn, dob_day, dob_month, dob_year):
@@ -0,0 +1,148 @@
+# reparse_archive.py
+"""
+Re-runs the current dashboard extractors over the raw-HTML archive (PORTAL_ARCHIVE_DIR)
+and backfills the database, without touching the portal.
+
+Usage:
+    python docs/scripts/reparse_archive.py --dry-run           # parse coverage only
+    python docs/scripts/reparse_archive.py --workers 8          # backfill from each student's latest page
+    python docs/scripts/reparse_archive.py --since-days 3
+    python docs/scripts/reparse_archive.py --prune              # apply the retention policy
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import pytz
+from dotenv import load_dotenv
+
+# Load environment variables from .env file FIRST
+load_dotenv()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from src import config
+from src import dashboard_parser
+from src import html_archive
+
+_worker_archive = None
+
+
+def _reparse_one(job):
+    """Worker: loads one archived page and parses it. Returns (sha256, attendance, cie_marks)."""
+    global _worker_archive
+    archive_dir, sha = job
+    if _worker_archive is None:
+        _worker_archive = html_archive.HtmlArchive(archive_dir, config.PORTAL_ARCHIVE_RETENTION_DAYS)
+    page_html = _worker_archive.load(sha)
+    if page_html is None:
+        return sha, None, None
+    with contextlib.redirect_stdout(io.StringIO()):
+        dashboard = dashboard_parser.parse_dashboard(page_html)
+    return sha, dashboard.attendance, dashboard.cie_marks
+
+
+def with_stored_counts(attendance, stored_attendance):
+    """
+    The archive only holds dashboards, not the per-subject detail pages, so re-parsed records
+    have no present/absent/total. Copies them from the stored rows, which gives the records the
+    shape a live scrape saves and fingerprints. Returns None if any subject's percentage moved
+    since then: its stored counts would be wrong, so attendance is left out of the backfill.
+    """
+    if not config.PORTAL_FETCH_ATTENDANCE_DETAILS:
+        # Live scrapes don't add counts either
+        return attendance
+    stored_by_subject = {record["subject"]: record for record in stored_attendance}
+    merged = []
+    for record in attendance:
+        stored = stored_by_subject.get(record["subject"])
+        if stored is None or stored["percentage"] is None or float(record["percentage"]) != stored["percentage"]:
+            return None
+        merged.append({**record, "present": stored["present"], "absent": stored["absent"], "total": stored["total"]})
+    return merged
+
+
+def run_reparse(args):
+    archive = html_archive.get_archive()
+    if archive is None:
+        print("❌ PORTAL_ARCHIVE_DIR is not set; there is no archive to re-parse.")
+        return 1
+
+    if args.prune:
+        entries, blobs = archive.prune()
+        print(f"🧹 Pruned {entries} archive entries and {blobs} blobs older than {archive.retention_days} days.")
+        return 0
+
+    since = time.time() - args.since_days * 86400 if args.since_days else None
+    entries = archive.entries(since=since, latest_only=not args.all_versions)
+    unique_shas = sorted({sha for _, _, sha in entries})
+    print(f"✅ Re-parsing {len(unique_shas)} unique pages ({len(entries)} archive entries) with {args.workers} workers...")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = {sha: (attendance, cie_marks) for sha, attendance, cie_marks in
+                   pool.map(_reparse_one, [(archive.root, sha) for sha in unique_shas], chunksize=16)}
+    elapsed = time.perf_counter() - start
+
+    parsed_cie = sum(1 for _, cie_marks in results.values() if cie_marks)
+    parsed_attendance = sum(1 for attendance, _ in results.values() if attendance)
+    print(f"  - Parsed in {elapsed:.2f}s: CIE marks on {parsed_cie}/{len(results)} pages, "
+          f"attendance on {parsed_attendance}/{len(results)} pages")
+
+    if args.dry_run or args.all_versions:
+        if args.all_versions and not args.dry_run:
+            print("  - --all-versions only reports coverage; the database is backfilled from latest pages.")
+        return 0
+
+    from src import db_utils_neon as db_utils
+    users_by_prn = {user["prn"]: user for user in (db_utils.get_all_users_from_db_pg() or [])}
+    archived_user_ids = [users_by_prn[prn]["id"] for prn, _, _ in entries if prn in users_by_prn]
+    stored = db_utils.get_bulk_student_data_pg(archived_user_ids, with_attendance=True) if archived_user_ids else {}
+    if stored is None:
+        print("❌ Could not read the stored attendance; nothing was backfilled.")
+        return 1
+
+    counts = {"updated": 0, "unchanged": 0, "skipped": 0, "failed": 0, "attendance_kept": 0}
+    for prn, fetched_at, sha in entries:
+        user = users_by_prn.get(prn)
+        attendance, cie_marks = results.get(sha, (None, None))
+        if user and attendance:
+            attendance = with_stored_counts(attendance, stored[user["id"]]["attendance"])
+            if attendance is None:
+                counts["attendance_kept"] += 1
+        if not user or not (cie_marks or attendance):
+            counts["skipped"] += 1
+            continue
+        # Same fingerprint a live scrape of this page stores, so unchanged data isn't rewritten
+        fingerprint = dashboard_parser.payload_fingerprint(attendance, cie_marks)
+        save_status = db_utils.save_scrape_if_changed_pg(
+            user["id"], cie_marks, fingerprint, datetime.fromtimestamp(fetched_at, pytz.utc), attendance
+        )
+        counts[save_status or "failed"] += 1
+
+    print("\n" + "="*50)
+    print("🎉 Archive backfill finished!")
+    print(f"  - Updated: {counts['updated']}, unchanged: {counts['unchanged']}, "
+          f"skipped (no user or nothing parsed): {counts['skipped']}, failed: {counts['failed']}")
+    print(f"  - Attendance left as stored (percentages changed, detail counts unknown): {counts['attendance_kept']}")
+    print("="*50)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--since-days", type=float, help="only pages fetched in the last N days")
+    parser.add_argument("--all-versions", action="store_true", help="parse every archived page, not just the latest per student")
+    parser.add_argument("--dry-run", action="store_true", help="report parse coverage without writing to the database")
+    parser.add_argument("--prune", action="store_true", help="apply PORTAL_ARCHIVE_RETENTION_DAYS and exit")
+    return run_reparse(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,5 @@
 # update_all_students.py
 
-import time
 from datetime import datetime
 import pytz
 from dotenv import load_dotenv
@@ -11,13 +10,15 @@ load_dotenv()
 import db_utils_neon as db_utils  # Changed from db_utils_sqlite to db_utils_neon
 import web_scraper
 from src import config
+from src import portal_rate_limit
 
 # --- Configuration ---
-# Be a good internet citizen. Wait this many seconds between scraping each student.
-# A value between 5 and 15 is recommended to avoid getting blocked.
-DELAY_BETWEEN_REQUESTS = 7 
+# Pacing comes from the shared portal token bucket (PORTAL_RATE_LIMIT_PER_SECOND / PORTAL_RATE_BURST)
+# instead of a fixed sleep. This job runs in the background lane, so it yields to interactive
+# API/Streamlit requests that share the same budget.
 
 
+@portal_rate_limit.lane(portal_rate_limit.BACKGROUND)
 def run_update():
     """
     Main function to fetch data for all registered users and update the database.
@@ -34,9 +35,15 @@ def run_update():
 
     total_users = len(all_users)
     print(f"✅ Found {total_users} users to process.")
+
+    # Saved detail counts: subjects whose gauge hasn't moved skip their detail page
+    stored_data = {}
+    if config.PORTAL_FETCH_ATTENDANCE_DETAILS:
+        stored_data = db_utils.get_bulk_student_data_pg([user['id'] for user in all_users], with_attendance=True) or {}
     
     success_count = 0
     fail_count = 0
+    unchanged_count = 0
 
     for i, user in enumerate(all_users):
         user_id = user['id']
@@ -50,35 +57,41 @@ def run_update():
         print(f"⚙️ Processing user {i+1}/{total_users}: {full_name} (ID: {user_id})")
 
         try:
-            # Step 1: Login and get the welcome page HTML
+            # Step 1: Login, fetch and parse the dashboard
             print(f"  - Logging in for {full_name}...")
-            session, html = web_scraper.login_and_get_welcome_page(
-                prn, dob_day, dob_month, dob_year, full_name
+            dashboard = web_scraper.fetch_dashboard(
+                prn, dob_day, dob_month, dob_year, full_name,
+                stored_data.get(user_id, {}).get("attendance")
             )
 
-            if not html:
+            if not dashboard:
                 print(f"  - ❌ Login FAILED or page not retrieved for {full_name}.")
                 fail_count += 1
-                # Wait before processing the next user
-                time.sleep(DELAY_BETWEEN_REQUESTS)
                 continue
 
-            # Step 2: Extract the CIE marks from the HTML
-            print("  - Parsing CIE marks...")
-            cie_marks_records = web_scraper.extract_cie_marks(html)
+            # Step 2: Take the CIE marks and attendance from the parsed dashboard
+            cie_marks_records = dashboard.cie_marks
+            attendance_records = dashboard.attendance
 
-            if not cie_marks_records:
-                print(f"  - ⚠️ Could not parse CIE marks for {full_name}. They may not be available yet.")
+            if not cie_marks_records and not attendance_records:
+                print(f"  - ⚠️ Could not parse CIE marks or attendance for {full_name}. They may not be available yet.")
                 # We'll still count this as a success since login worked, but you could change this
                 success_count += 1
-                time.sleep(DELAY_BETWEEN_REQUESTS)
                 continue
             
-            # Step 3: Update the database with the new marks
-            print(f"  - Found marks for {len(cie_marks_records)} subjects. Updating database...")
+            # Step 3: Update the database with the new marks and attendance
+            print(f"  - Found marks for {len(cie_marks_records or {})} subjects and attendance for "
+                  f"{len(attendance_records or [])} subjects. Updating database...")
             scraped_timestamp = datetime.now(pytz.utc)
             
-            if db_utils.update_student_marks_in_db_pg(user_id, cie_marks_records, scraped_timestamp):
+            save_status = db_utils.save_scrape_if_changed_pg(
+                user_id, cie_marks_records, dashboard.fingerprint(), scraped_timestamp, attendance_records
+            )
+            if save_status == "unchanged":
+                print(f"  - 💤 Marks unchanged for {full_name}; only last_checked_at was updated.")
+                success_count += 1
+                unchanged_count += 1
+            elif save_status:
                 print(f"  - ✅ Successfully updated marks for {full_name}.")
                 success_count += 1
             else:
@@ -88,16 +101,18 @@ def run_update():
         except Exception as e:
             print(f"  - 🚨 An unexpected error occurred while processing {full_name}: {e}")
             fail_count += 1
-        
-        # Step 4: Wait before processing the next user
-        if i + 1 < total_users:
-            print(f"  - 😴 Waiting for {DELAY_BETWEEN_REQUESTS} seconds before next user...")
-            time.sleep(DELAY_BETWEEN_REQUESTS)
 
     print("\n" + "="*50)
     print("🎉 Batch update process finished!")
     print(f"  - Successful updates: {success_count}")
     print(f"  - Failed updates: {fail_count}")
+    print(f"  - Unchanged (write skipped): {unchanged_count}")
+    pool_stats = web_scraper.portal_http.get_pool_stats()["sync"]
+    print(f"  - Portal connections reused: {pool_stats['hits']}/{pool_stats['requests']} requests")
+    rate_stats = portal_rate_limit.get_stats()
+    if rate_stats["enabled"]:
+        background = rate_stats["lanes"][portal_rate_limit.BACKGROUND]
+        print(f"  - Rate limiter waits: {background['wait_seconds']}s over {background['acquired']} portal requests")
     print("="*50)
 
 
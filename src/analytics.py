@@ -3,14 +3,15 @@ Analytics Module for Student Performance Analysis
 Provides insights, correlations, and predictions
 """
 
-from src import config
 from . import cgpa_calculator
-from typing import Dict, List, Optional, Tuple
+from .cgpa_calculator import MarksProfile
+from typing import Dict, List, Union
 import statistics
 
-def calculate_subject_performance_dashboard(cie_marks_records: Dict) -> Dict:
+def calculate_subject_performance_dashboard(cie_marks_records: Union[Dict, MarksProfile]) -> Dict:
     """
     Generate comprehensive subject-wise performance metrics.
+    Accepts the raw CIE marks dict or a precomputed MarksProfile.
     
     Returns:
         dict: {
@@ -20,55 +21,41 @@ def calculate_subject_performance_dashboard(cie_marks_records: Dict) -> Dict:
             'strong_subjects': [performing well subjects]
         }
     """
+    profile = cgpa_calculator.as_marks_profile(cie_marks_records)
     subjects_data = []
     all_percentages = []
     
-    for subject_code, marks_dict in cie_marks_records.items():
-        result = cgpa_calculator.calculate_subject_total(marks_dict, subject_code)
+    for subject in profile.graded_subjects():
+        marks_dict = subject.marks
         
-        if result != (None, None):
-            total_marks, max_marks = result
-            percentage = (total_marks / max_marks) * 100 if max_marks > 0 else 0
-            grade_point, grade = cgpa_calculator.get_grade_point(total_marks, max_marks)
-            credits = cgpa_calculator.get_subject_credits(subject_code)
-            subject_name = config.SUBJECT_CODE_TO_NAME_MAP.get(subject_code, subject_code)
-            
-            # Determine subject type
-            if subject_code.startswith("CSL") or subject_code.startswith("CSDL"):
-                subject_type = "Lab"
-            elif subject_code.startswith("CSC") or subject_code.startswith("CSDC"):
-                subject_type = "Theory"
-            else:
-                subject_type = "Other"
-            
-            # Calculate completion status
-            expected_exams = []
-            if subject_type == "Theory":
-                expected_exams = ["MSE", "TH-ISE1", "TH-ISE2", "ESE"]
-            elif subject_type == "Lab":
-                expected_exams = ["PR-ISE1", "PR-ISE2"]
-            
-            completed_exams = [exam for exam in expected_exams if isinstance(marks_dict.get(exam), (int, float))]
-            completion_rate = (len(completed_exams) / len(expected_exams) * 100) if expected_exams else 100
-            
-            subject_info = {
-                'code': subject_code,
-                'name': subject_name,
-                'type': subject_type,
-                'credits': credits,
-                'total_marks': round(total_marks, 2),
-                'max_marks': max_marks,
-                'percentage': round(percentage, 2),
-                'grade': grade,
-                'grade_point': grade_point,
-                'completion_rate': round(completion_rate, 2),
-                'completed_exams': completed_exams,
-                'pending_exams': [e for e in expected_exams if e not in completed_exams],
-                'marks_breakdown': {k: v for k, v in marks_dict.items() if isinstance(v, (int, float))}
-            }
-            
-            subjects_data.append(subject_info)
-            all_percentages.append(percentage)
+        # Calculate completion status
+        expected_exams = []
+        if subject.subject_type == "Theory":
+            expected_exams = ["MSE", "TH-ISE1", "TH-ISE2", "ESE"]
+        elif subject.subject_type == "Lab":
+            expected_exams = ["PR-ISE1", "PR-ISE2"]
+        
+        completed_exams = [exam for exam in expected_exams if isinstance(marks_dict.get(exam), (int, float))]
+        completion_rate = (len(completed_exams) / len(expected_exams) * 100) if expected_exams else 100
+        
+        subject_info = {
+            'code': subject.code,
+            'name': subject.name,
+            'type': subject.subject_type,
+            'credits': subject.credits,
+            'total_marks': round(subject.total_marks, 2),
+            'max_marks': subject.max_marks,
+            'percentage': round(subject.percentage, 2),
+            'grade': subject.grade,
+            'grade_point': subject.grade_point,
+            'completion_rate': round(completion_rate, 2),
+            'completed_exams': completed_exams,
+            'pending_exams': [e for e in expected_exams if e not in completed_exams],
+            'marks_breakdown': {k: v for k, v in marks_dict.items() if isinstance(v, (int, float))}
+        }
+        
+        subjects_data.append(subject_info)
+        all_percentages.append(subject.percentage)
     
     # Calculate overall statistics
     if all_percentages:
@@ -100,9 +87,10 @@ def calculate_subject_performance_dashboard(cie_marks_records: Dict) -> Dict:
     }
 
 
-def calculate_attendance_marks_correlation(attendance_records: List, cie_marks_records: Dict) -> Dict:
+def calculate_attendance_marks_correlation(attendance_records: List, cie_marks_records: Union[Dict, MarksProfile]) -> Dict:
     """
     Analyze correlation between attendance and marks performance.
+    Accepts the raw CIE marks dict or a precomputed MarksProfile.
     
     Returns:
         dict: {
@@ -117,23 +105,17 @@ def calculate_attendance_marks_correlation(attendance_records: List, cie_marks_r
     # Create attendance lookup
     attendance_map = {record['subject']: record['percentage'] for record in attendance_records}
     
-    for subject_code, marks_dict in cie_marks_records.items():
-        if subject_code not in attendance_map:
+    profile = cgpa_calculator.as_marks_profile(cie_marks_records)
+    for subject in profile.graded_subjects():
+        if subject.code not in attendance_map:
             continue
         
-        result = cgpa_calculator.calculate_subject_total(marks_dict, subject_code)
-        if result == (None, None):
-            continue
-        
-        total_marks, max_marks = result
-        marks_percentage = (total_marks / max_marks) * 100 if max_marks > 0 else 0
-        attendance_percentage = attendance_map[subject_code]
-        
-        subject_name = config.SUBJECT_CODE_TO_NAME_MAP.get(subject_code, subject_code)
+        marks_percentage = subject.percentage
+        attendance_percentage = attendance_map[subject.code]
         
         subject_data.append({
-            'subject_code': subject_code,
-            'subject_name': subject_name,
+            'subject_code': subject.code,
+            'subject_name': subject.name,
             'attendance': attendance_percentage,
             'marks_percentage': round(marks_percentage, 2),
             'difference': round(marks_percentage - attendance_percentage, 2)
@@ -264,9 +246,10 @@ def compare_semesters(semester_records: List) -> Dict:
     }
 
 
-def predict_final_grades(cie_marks_records: Dict, semester_records: List = None) -> Dict:
+def predict_final_grades(cie_marks_records: Union[Dict, MarksProfile], semester_records: List = None) -> Dict:
     """
     Predict final grades and provide recommendations.
+    Accepts the raw CIE marks dict or a precomputed MarksProfile.
     
     Returns:
         dict: {
@@ -275,66 +258,65 @@ def predict_final_grades(cie_marks_records: Dict, semester_records: List = None)
             'recommendations': [list of actionable recommendations]
         }
     """
+    profile = cgpa_calculator.as_marks_profile(cie_marks_records)
     predictions = []
     
-    for subject_code, marks_dict in cie_marks_records.items():
-        result = cgpa_calculator.calculate_subject_total(marks_dict, subject_code)
+    for subject in profile.graded_subjects():
+        subject_code, marks_dict = subject.code, subject.marks
+        total_marks = subject.total_marks
+        current_percentage = subject.percentage
+        grade_point, grade = subject.grade_point, subject.grade
+        subject_name = subject.name
         
-        if result != (None, None):
-            total_marks, max_marks = result
-            current_percentage = (total_marks / max_marks) * 100 if max_marks > 0 else 0
-            grade_point, grade = cgpa_calculator.get_grade_point(total_marks, max_marks)
-            subject_name = config.SUBJECT_CODE_TO_NAME_MAP.get(subject_code, subject_code)
-            
-            # Check if ESE is pending
-            has_ese = isinstance(marks_dict.get('ESE'), (int, float))
+        # Check if ESE is pending
+        has_ese = isinstance(marks_dict.get('ESE'), (int, float))
+        
+        if not has_ese and (subject_code.startswith('CSC') or subject_code.startswith('CSDC')):
+            # Predict ESE needed for different grades
+            current_marks = total_marks
             
-            if not has_ese and (subject_code.startswith('CSC') or subject_code.startswith('CSDC')):
-                # Predict ESE needed for different grades
-                current_marks = total_marks
+            predictions_for_grades = {}
+            for target_grade, target_gp in [('O', 10), ('A+', 9), ('A', 8), ('B+', 7)]:
+                # Find minimum percentage for this grade
+                min_percentage = None
+                for min_p, max_p, gp, g in cgpa_calculator.GRADE_RANGES_PERCENTAGE:
+                    if g == target_grade:
+                        min_percentage = min_p
+                        break
                 
-                predictions_for_grades = {}
-                for target_grade, target_gp in [('O', 10), ('A+', 9), ('A', 8), ('B+', 7)]:
-                    # Find minimum percentage for this grade
-                    min_percentage = None
-                    for min_p, max_p, gp, g in cgpa_calculator.GRADE_RANGES_PERCENTAGE:
-                        if g == target_grade:
-                            min_percentage = min_p
-                            break
+                if min_percentage:
+                    required_total = (min_percentage / 100) * 100  # Out of 100
+                    ese_needed = required_total - current_marks
                     
-                    if min_percentage:
-                        required_total = (min_percentage / 100) * 100  # Out of 100
-                        ese_needed = required_total - current_marks
-                        
-                        if ese_needed <= 40:  # ESE is out of 40
-                            predictions_for_grades[target_grade] = {
-                                'ese_marks_needed': max(0, round(ese_needed, 1)),
-                                'achievable': ese_needed <= 40
-                            }
-                
-                predictions.append({
-                    'subject_code': subject_code,
-                    'subject_name': subject_name,
-                    'current_marks': round(current_marks, 2),
-                    'current_percentage': round(current_percentage, 2),
-                    'current_grade': grade,
-                    'ese_pending': True,
-                    'grade_predictions': predictions_for_grades
-                })
-            else:
-                # Already complete
-                predictions.append({
-                    'subject_code': subject_code,
-                    'subject_name': subject_name,
-                    'current_marks': round(total_marks, 2),
-                    'current_percentage': round(current_percentage, 2),
-                    'final_grade': grade,
-                    'grade_point': grade_point,
-                    'ese_pending': False
-                })
+                    if ese_needed <= 40:  # ESE is out of 40
+                        predictions_for_grades[target_grade] = {
+                            'ese_marks_needed': max(0, round(ese_needed, 1)),
+                            'achievable': ese_needed <= 40
+                        }
+            
+            predictions.append({
+                'subject_code': subject_code,
+                'subject_name': subject_name,
+                'current_marks': round(current_marks, 2),
+                'current_percentage': round(current_percentage, 2),
+                'current_grade': grade,
+                'ese_pending': True,
+                'grade_predictions': predictions_for_grades
+            })
+        else:
+            # Already complete
+            predictions.append({
+                'subject_code': subject_code,
+                'subject_name': subject_name,
+                'current_marks': round(total_marks, 2),
+                'current_percentage': round(current_percentage, 2),
+                'final_grade': grade,
+                'grade_point': grade_point,
+                'ese_pending': False
+            })
     
     # Overall prediction
-    current_sgpa = cgpa_calculator.calculate_sgpa(cie_marks_records)
+    current_sgpa = cgpa_calculator.calculate_sgpa(profile)
     
     # Generate recommendations
     recommendations = _generate_recommendations(predictions, current_sgpa)
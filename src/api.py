@@ -3,17 +3,28 @@ FastAPI Backend for Contineo Scraper
 REST API for Next.js frontend
 """
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+import asyncio
+import hashlib
 import pytz
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from src import web_scraper  # ✅ Correct
+from src import async_scraper
+from src import json_codec
+from src import portal_http
+from src import portal_rate_limit
+from src import scrape_jobs
+from src import scrape_metrics
+from src import scrape_progress
+from src import worker_pools
 from src import db_utils_neon as db_utils  # ✅ Correct
 from src import config       # ✅ Correct
 from src import analytics
@@ -26,7 +37,8 @@ from src import cgpa_calculator
 app = FastAPI(
     title="Contineo Scraper API",
     description="Backend API for student portal data scraping and analytics",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=json_codec.FastJSONResponse
 )
 
 # CORS middleware for Next.js frontend
@@ -62,10 +74,21 @@ class SemesterRecord(BaseModel):
     total_credits: int
     academic_year: Optional[str] = None
 
+class BulkRequest(BaseModel):
+    usernames: Optional[List[str]] = None
+    prn_prefix: Optional[str] = None  # Cohort filter, e.g. the batch/branch part of the PRN
+    limit: Optional[int] = None
+
 # Initialize database
 @app.on_event("startup")
 async def startup_event():
-    db_utils.create_db_and_table_pg()
+    await worker_pools.run_db(db_utils.create_db_and_table_pg)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await scrape_jobs.close()
+    await async_scraper.close()
+    worker_pools.shutdown()
 
 # Health check
 @app.get("/")
@@ -78,7 +101,159 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now(pytz.utc).isoformat()}
+    portal_breaker = portal_http.breaker.get_state()
+    return {
+        "status": "degraded" if portal_breaker["state"] == "open" else "healthy",
+        "timestamp": datetime.now(pytz.utc).isoformat(),
+        "portal_breaker": portal_breaker,
+        "parser_paths": web_scraper.get_parse_path_stats(),
+        "portal_pool": portal_http.get_pool_stats(),
+        "portal_rate_limit": portal_rate_limit.get_stats(),
+        "single_flight": async_scraper.get_single_flight_stats(),
+        "scrape_metrics": scrape_metrics.get_metrics(),
+        "worker_pools": worker_pools.get_stats(),
+        "scrape_jobs": scrape_jobs.get_stats(),
+        "user_cache": db_utils.get_user_cache_stats(),
+        "json": {**json_codec.get_stats(), "leaderboard_cache": leaderboard_bodies.get_stats()}
+    }
+
+def raise_if_portal_unavailable():
+    """Turns a failed portal fetch into a 503 (instead of a credentials error) while the breaker is open."""
+    portal_breaker = portal_http.breaker.get_state()
+    if portal_breaker["state"] == "open":
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Student portal is unavailable. Please try again shortly.",
+            headers={"Retry-After": str(int(portal_breaker.get("retry_after_seconds", 0)) + 1)}
+        )
+
+async def scrape_and_persist(user_details, set_stage=None):
+    """
+    Fetches the student's dashboard (shared with concurrent fetches for the same student) and
+    saves marks and attendance, skipping the rewrite when nothing changed.
+    set_stage(name), if given, is told which step is running (used by scrape jobs).
+    Returns (dashboard, scraped_at), or (None, None) if the portal fetch failed.
+    """
+    set_stage = set_stage or (lambda stage: None)
+    set_stage("portal")
+    stored_attendance = None
+    if config.PORTAL_FETCH_ATTENDANCE_DETAILS:
+        # Saved detail counts spare re-fetching pages whose gauge hasn't moved (and cover failed ones)
+        stored_attendance = await worker_pools.run_db(db_utils.get_user_attendance_pg, user_details["id"])
+    dashboard = await async_scraper.fetch_dashboard(
+        user_details["prn"],
+        user_details["dob_day"],
+        user_details["dob_month"],
+        user_details["dob_year"],
+        user_details["full_name"],
+        stored_attendance
+    )
+    if not dashboard:
+        return None, None
+
+    scraped_at = datetime.now(pytz.utc)
+    set_stage("saving")
+    # Fingerprint the payload as parsed, before callers add display fields. A dashboard without
+    # either chart still records scrape_state, so the staleness check doesn't scrape it again.
+    save_status = await worker_pools.run_db(db_utils.save_scrape_if_changed_pg,
+        user_details["id"],
+        dashboard.cie_marks,
+        dashboard.fingerprint(),
+        scraped_at,
+        dashboard.attendance
+    )
+    if save_status == "updated":
+        leaderboard_bodies.invalidate()
+    scrape_progress.publish(user_details["prn"], scrape_progress.DB_PERSISTED, {
+        "status": save_status, "scraped_at": scraped_at.isoformat()
+    })
+    return dashboard, scraped_at
+
+# user_id -> running background refresh task (also keeps the task referenced until it finishes)
+_background_refreshes = {}
+
+async def _refresh_in_background(user_details):
+    try:
+        with portal_rate_limit.lane(portal_rate_limit.BACKGROUND):
+            dashboard, _ = await scrape_and_persist(user_details)
+        if not dashboard:
+            print(f"⚠️ Background refresh for user_id {user_details['id']} could not fetch the dashboard.")
+    except Exception as e:
+        print(f"⚠️ Background refresh for user_id {user_details['id']} failed: {e}")
+    finally:
+        _background_refreshes.pop(user_details["id"], None)
+
+def schedule_background_refresh(user_details):
+    """Starts a background portal refresh for this user unless one is already running."""
+    if user_details["id"] in _background_refreshes:
+        return
+    _background_refreshes[user_details["id"]] = asyncio.create_task(_refresh_in_background(user_details))
+
+async def load_attendance(user_details):
+    """
+    Attendance for analytics, read from the database.
+    Returns (attendance_records, checked_at, refreshing). Stale data is returned as-is and a
+    background refresh is started; only a student who was never scraped waits for a live fetch.
+    A dashboard without an attendance chart gives [] (not None, which means the fetch failed).
+    """
+    attendance_records, scrape_state = await asyncio.gather(
+        worker_pools.run_db(db_utils.get_user_attendance_pg, user_details["id"]),
+        worker_pools.run_db(db_utils.get_scrape_state_pg, user_details["id"])
+    )
+    if not attendance_records and scrape_state is None:
+        dashboard, scraped_at = await scrape_and_persist(user_details)
+        if not dashboard:
+            return None, None, False
+        return dashboard.attendance or [], scraped_at, False
+
+    checked_at = scrape_state["last_checked_at"] if scrape_state else None
+    stale = is_stale(checked_at)
+    if stale:
+        schedule_background_refresh(user_details)
+    return attendance_records, checked_at, stale
+
+def is_stale(checked_at):
+    return checked_at is None or (
+        datetime.now(pytz.utc) - checked_at
+    ).total_seconds() > config.ATTENDANCE_STALE_AFTER_SECONDS
+
+# Conditional GETs: strong ETags derived from the user's data version
+def make_etag(kind, user_id, *version_parts):
+    """Strong ETag for one representation (kind) of a user's data at a given version."""
+    raw = "|".join([app.version, kind, str(user_id)] + [
+        part.isoformat() if isinstance(part, datetime) else str(part) for part in version_parts
+    ])
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match uses weak comparison, so W/"x" matches "x"."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def precomputed_response(request, body, cache_control):
+    """Serves a json_codec.PrecomputedBody as-is, or 304 if the client already holds these bytes."""
+    headers = {"Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), body.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": body.etag, **headers})
+    return body.response(headers)
+
+async def check_not_modified(request, response, kind, user_details, *version_keys):
+    """
+    Looks up the user's data version (one cheap query) and sets the ETag on response.
+    Returns (not_modified_response, version); not_modified_response is a 304 when the
+    client's If-None-Match already matches, else None. No ETag until marks are stored.
+    """
+    version = await worker_pools.run_db(db_utils.get_data_version_pg, user_details["id"])
+    if not version or version["marks_scraped_at"] is None:
+        return None, version
+    etag = make_etag(kind, user_details["id"], *(version[key] for key in version_keys))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers), version
+    response.headers.update(headers)
+    return None, version
 
 # User Management Endpoints
 @app.post("/api/users/register", status_code=status.HTTP_201_CREATED)
@@ -86,18 +261,19 @@ async def register_user(user: UserRegistration):
     """Register a new user with credential validation"""
     
     # Validate credentials by attempting login
-    _, validation_html = web_scraper.login_and_get_welcome_page(
+    _, validation_html = await async_scraper.login_and_get_welcome_page(
         user.prn, user.dob_day, user.dob_month, user.dob_year, user.full_name
     )
     
     if not validation_html:
+        raise_if_portal_unavailable()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid credentials. Please check PRN, DOB, and Full Name"
         )
     
     # Add to database
-    success = db_utils.add_user_to_db_pg(
+    success = await worker_pools.run_db(db_utils.add_user_to_db_pg,
         user.username, user.full_name, user.prn,
         user.dob_day, user.dob_month, user.dob_year
     )
@@ -117,7 +293,7 @@ async def register_user(user: UserRegistration):
 @app.get("/api/users/{username}")
 async def get_user(username: str):
     """Get user details by username"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     
     if not user_details:
         raise HTTPException(
@@ -134,55 +310,76 @@ async def get_user(username: str):
 
 # Data Fetching Endpoints
 @app.post("/api/data/fetch/{username}")
-async def fetch_student_data(username: str, force_refresh: bool = False):
-    """Fetch attendance and CIE marks for a user"""
+async def fetch_student_data(username: str, response: Response, force_refresh: bool = False, job: bool = False):
+    """
+    Fetch attendance and CIE marks for a user.
+    With job=true, enqueue the scrape and return 202 with a job id to poll at /api/data/jobs/{job_id}.
+    """
     
     # Get user details
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User '{username}' not found"
         )
     
-    # Login and scrape data
-    session, html = web_scraper.login_and_get_welcome_page(
-        user_details["prn"],
-        user_details["dob_day"],
-        user_details["dob_month"],
-        user_details["dob_year"],
-        user_details["full_name"]
-    )
+    if job:
+        async def run_job(scrape_job):
+            return await build_fetch_payload(username, user_details, scrape_job.set_stage)
+        
+        try:
+            scrape_job, created = scrape_jobs.submit(user_details["id"], run_job)
+        except scrape_jobs.QueueFullError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many scrapes are queued. Please try again shortly.",
+                headers={"Retry-After": "5"}
+            )
+        status_url = f"/api/data/jobs/{scrape_job.id}"
+        response.status_code = status.HTTP_202_ACCEPTED
+        response.headers["Location"] = status_url
+        return {
+            "job_id": scrape_job.id,
+            "status": scrape_job.status,
+            "deduplicated": not created,
+            "status_url": status_url
+        }
+    
+    return await build_fetch_payload(username, user_details)
+
+@app.get("/api/data/jobs/{job_id}")
+async def get_scrape_job(job_id: str):
+    """Status of an asynchronous scrape job; includes the fetch payload once it has succeeded"""
+    scrape_job = scrape_jobs.get_job(job_id)
+    if not scrape_job:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return scrape_job.to_dict()
+
+async def build_fetch_payload(username, user_details, set_stage=None):
+    """Scrapes, saves and returns the /api/data/fetch payload; raises HTTPException on failure."""
+    # Login, scrape and save (shared with any concurrent fetch for the same student)
+    dashboard, scraped_at = await scrape_and_persist(user_details, set_stage)
     
-    if not html:
+    if not dashboard:
+        raise_if_portal_unavailable()
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Failed to login to portal"
         )
     
     # Extract data
-    attendance_records = web_scraper.extract_attendance_from_welcome_page(html)
-    cie_marks_records = web_scraper.extract_cie_marks(html)
+    attendance_records = dashboard.attendance
+    cie_marks_records = dashboard.cie_marks
     
     # Add subject names to attendance records
     if attendance_records:
         for record in attendance_records:
             subject_code = record.get("subject", "")
             record["subject_name"] = config.SUBJECT_CODE_TO_NAME_MAP.get(subject_code, subject_code)
-            # Calculate present/absent/total from percentage
-            # This is approximate since we don't have exact numbers from the scraper
-            record["present"] = int(record["percentage"])
-            record["absent"] = 100 - int(record["percentage"])
-            record["total"] = 100
-    
-    # Update database
-    scraped_at = datetime.now(pytz.utc)
-    if cie_marks_records:
-        db_utils.update_student_marks_in_db_pg(
-            user_details["id"],
-            cie_marks_records,
-            scraped_at
-        )
+            # Lecture counts come from the subject's attendance page; None when it couldn't be read
+            for key in ("present", "absent", "total"):
+                record.setdefault(key, None)
     
     return {
         "user": {
@@ -195,27 +392,98 @@ async def fetch_student_data(username: str, force_refresh: bool = False):
         "scraped_at": scraped_at.isoformat()
     }
 
+_stream_scrapes = set()
+
+@app.get("/api/data/stream/{username}")
+async def stream_student_data(username: str):
+    """
+    Server-Sent Events for a live fetch: login_started, login_ok, attendance_parsed,
+    cie_parsed, attendance_details (lecture counts), db_persisted, analytics_ready, then done
+    (or error). Parsed data arrives as soon as it is available, before the DB write.
+    """
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
+    if not user_details:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    async def events():
+        seen = set()
+        with scrape_progress.subscribe(user_details["prn"], asyncio.Queue) as progress:
+            scrape = asyncio.create_task(scrape_and_persist(user_details))
+            # Keep the scrape referenced (and saving) even if the client disconnects
+            _stream_scrapes.add(scrape)
+            scrape.add_done_callback(_stream_scrapes.discard)
+            scrape.add_done_callback(lambda _: progress.put_nowait(None))
+            while (item := await progress.get()) is not None:
+                event, message = item
+                seen.add(event)
+                yield message
+        
+        try:
+            dashboard, scraped_at = scrape.result()
+        except Exception as e:
+            yield scrape_progress.format_event(scrape_progress.ERROR, {"status": 500, "detail": str(e)})
+            return
+        if not dashboard:
+            portal_breaker = portal_http.breaker.get_state()
+            unavailable = portal_breaker["state"] == "open"
+            yield scrape_progress.format_event(scrape_progress.ERROR, {
+                "status": 503 if unavailable else 401,
+                "detail": "Student portal is unavailable" if unavailable else "Failed to login to portal"
+            })
+            return
+        # A result reused from a just-finished fetch for this student publishes no parse events
+        if scrape_progress.ATTENDANCE_PARSED not in seen:
+            yield scrape_progress.format_event(scrape_progress.ATTENDANCE_PARSED, dashboard.attendance)
+        if scrape_progress.CIE_PARSED not in seen:
+            yield scrape_progress.format_event(scrape_progress.CIE_PARSED, dashboard.cie_marks)
+        
+        try:
+            yield scrape_progress.format_event(scrape_progress.ANALYTICS_READY, await build_combined_analytics(user_details))
+        except HTTPException as e:
+            yield scrape_progress.format_event(scrape_progress.ERROR, {"status": e.status_code, "detail": e.detail})
+            return
+        yield scrape_progress.format_event(scrape_progress.DONE, {"scraped_at": scraped_at.isoformat()})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/api/data/attendance/{username}")
 async def get_attendance(username: str):
     """Get attendance data for a user"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # This would need to be cached or fetched from DB
-    # For now, we'll return a message to use /fetch endpoint
+    attendance_records, checked_at, refreshing = await load_attendance(user_details)
+    if attendance_records is None:
+        raise_if_portal_unavailable()
+        raise HTTPException(status_code=401, detail="Failed to fetch data")
+    
+    for record in attendance_records:
+        record["subject_name"] = config.SUBJECT_CODE_TO_NAME_MAP.get(record["subject"], record["subject"])
+    
     return {
-        "message": "Use /api/data/fetch/{username} to get latest data"
+        "username": username,
+        "attendance": attendance_records,
+        "checked_at": checked_at.isoformat() if checked_at else None,
+        "refreshing": refreshing
     }
 
 @app.get("/api/data/marks/{username}")
-async def get_marks(username: str):
+async def get_marks(username: str, request: Request, response: Response):
     """Get CIE marks for a user"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    cie_marks = db_utils.get_user_current_cie_marks_pg(user_details["id"])
+    not_modified, _ = await check_not_modified(request, response, "marks", user_details, "marks_scraped_at")
+    if not_modified:
+        return not_modified
+    
+    cie_marks = await worker_pools.run_db(db_utils.get_user_current_cie_marks_pg, user_details["id"])
     
     return {
         "username": username,
@@ -224,13 +492,17 @@ async def get_marks(username: str):
 
 # CGPA/SGPA Endpoints
 @app.get("/api/cgpa/calculate/{username}")
-async def calculate_sgpa(username: str):
+async def calculate_sgpa(username: str, request: Request, response: Response):
     """Calculate SGPA from current CIE marks"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    cie_marks = db_utils.get_user_current_cie_marks_pg(user_details["id"])
+    not_modified, _ = await check_not_modified(request, response, "sgpa", user_details, "marks_scraped_at")
+    if not_modified:
+        return not_modified
+    
+    cie_marks = await worker_pools.run_db(db_utils.get_user_current_cie_marks_pg, user_details["id"])
     
     if not cie_marks:
         raise HTTPException(
@@ -245,11 +517,11 @@ async def calculate_sgpa(username: str):
 @app.post("/api/cgpa/save-semester/{username}")
 async def save_semester(username: str, semester: SemesterRecord):
     """Save semester record for CGPA tracking"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    success = db_utils.save_semester_record_pg(
+    success = await worker_pools.run_db(db_utils.save_semester_record_pg,
         user_details["id"],
         semester.semester_number,
         semester.semester_name,
@@ -269,11 +541,11 @@ async def save_semester(username: str, semester: SemesterRecord):
 @app.get("/api/cgpa/semesters/{username}")
 async def get_semesters(username: str):
     """Get all semester records for a user"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    semester_records = db_utils.get_user_semester_records_pg(user_details["id"])
+    semester_records = await worker_pools.run_db(db_utils.get_user_semester_records_pg, user_details["id"])
     
     # Calculate CGPA if records exist
     cgpa_data = None
@@ -298,11 +570,11 @@ async def get_semesters(username: str):
 @app.get("/api/cgpa/target/{username}")
 async def calculate_target(username: str, target_sgpa: float):
     """Calculate what's needed to achieve target SGPA"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    cie_marks = db_utils.get_user_current_cie_marks_pg(user_details["id"])
+    cie_marks = await worker_pools.run_db(db_utils.get_user_current_cie_marks_pg, user_details["id"])
     
     if not cie_marks:
         raise HTTPException(status_code=404, detail="No marks data available")
@@ -318,11 +590,11 @@ async def calculate_target(username: str, target_sgpa: float):
 @app.get("/api/analytics/performance/{username}")
 async def get_performance_dashboard(username: str):
     """Get comprehensive subject-wise performance analysis"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    cie_marks = db_utils.get_user_current_cie_marks_pg(user_details["id"])
+    cie_marks = await worker_pools.run_db(db_utils.get_user_current_cie_marks_pg, user_details["id"])
     
     if not cie_marks:
         raise HTTPException(status_code=404, detail="No marks data available")
@@ -334,25 +606,20 @@ async def get_performance_dashboard(username: str):
 @app.get("/api/analytics/correlation/{username}")
 async def get_attendance_correlation(username: str):
     """Analyze correlation between attendance and marks"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Need to fetch fresh data for attendance
-    session, html = web_scraper.login_and_get_welcome_page(
-        user_details["prn"],
-        user_details["dob_day"],
-        user_details["dob_month"],
-        user_details["dob_year"],
-        user_details["full_name"]
+    # Stored attendance; a stale copy triggers a background refresh instead of a live login
+    (attendance_records, _, _), cie_marks = await asyncio.gather(
+        load_attendance(user_details),
+        worker_pools.run_db(db_utils.get_user_current_cie_marks_pg, user_details["id"])
     )
     
-    if not html:
+    if attendance_records is None:
+        raise_if_portal_unavailable()
         raise HTTPException(status_code=401, detail="Failed to fetch data")
     
-    attendance_records = web_scraper.extract_attendance_from_welcome_page(html)
-    cie_marks = db_utils.get_user_current_cie_marks_pg(user_details["id"])
-    
     if not attendance_records or not cie_marks:
         raise HTTPException(status_code=404, detail="Insufficient data for correlation")
     
@@ -366,11 +633,11 @@ async def get_attendance_correlation(username: str):
 @app.get("/api/analytics/semester-comparison/{username}")
 async def compare_semesters(username: str):
     """Compare performance across semesters"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    semester_records = db_utils.get_user_semester_records_pg(user_details["id"])
+    semester_records = await worker_pools.run_db(db_utils.get_user_semester_records_pg, user_details["id"])
     
     if not semester_records:
         raise HTTPException(status_code=404, detail="No semester records available")
@@ -382,12 +649,14 @@ async def compare_semesters(username: str):
 @app.get("/api/analytics/predictions/{username}")
 async def get_grade_predictions(username: str):
     """Get predictive analytics for final grades"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    cie_marks = db_utils.get_user_current_cie_marks_pg(user_details["id"])
-    semester_records = db_utils.get_user_semester_records_pg(user_details["id"])
+    cie_marks, semester_records = await asyncio.gather(
+        worker_pools.run_db(db_utils.get_user_current_cie_marks_pg, user_details["id"]),
+        worker_pools.run_db(db_utils.get_user_semester_records_pg, user_details["id"])
+    )
     
     if not cie_marks:
         raise HTTPException(status_code=404, detail="No marks data available")
@@ -398,52 +667,66 @@ async def get_grade_predictions(username: str):
 
 # Combined Analytics Endpoint
 @app.get("/analytics/{username}")
-async def get_combined_analytics(username: str):
+async def get_combined_analytics(username: str, request: Request, response: Response):
     """Get all analytics data in one call"""
-    user_details = db_utils.get_user_from_db_pg(username)
+    user_details = await worker_pools.run_db(db_utils.get_user_from_db_pg, username)
     if not user_details:
         raise HTTPException(status_code=404, detail="User not found")
     
-    cie_marks = db_utils.get_user_current_cie_marks_pg(user_details["id"])
-    semester_records = db_utils.get_user_semester_records_pg(user_details["id"])
+    # Attendance changes move last_changed_at; semester saves move the semester version
+    not_modified, version = await check_not_modified(
+        request, response, "analytics", user_details,
+        "marks_scraped_at", "last_changed_at", "semester_count", "semester_updated_at"
+    )
+    if not_modified:
+        # The stored attendance still gets its background refresh when stale
+        if is_stale(version["last_checked_at"]):
+            schedule_background_refresh(user_details)
+        return not_modified
+    
+    return await build_combined_analytics(user_details)
+
+async def build_combined_analytics(user_details):
+    """The /analytics payload; raises HTTPException(404) when no marks are stored."""
+    # Attendance is read from the database too (refreshed in the background when stale)
+    cie_marks, semester_records, (attendance_records, _, _) = await asyncio.gather(
+        worker_pools.run_db(db_utils.get_user_current_cie_marks_pg, user_details["id"]),
+        worker_pools.run_db(db_utils.get_user_semester_records_pg, user_details["id"]),
+        load_attendance(user_details)
+    )
     
     if not cie_marks:
         raise HTTPException(status_code=404, detail="No marks data available")
     
+    return combined_analytics_payload(cie_marks, semester_records, attendance_records)
+
+def combined_analytics_payload(cie_marks, semester_records, attendance_records):
+    """Builds the /analytics body from already-loaded marks, semester records and attendance."""
+    # Per-subject totals, grades and credits, computed once and shared by every calculation below
+    marks_profile = cgpa_calculator.build_marks_profile(cie_marks)
+    
     # Calculate SGPA
-    sgpa_data = cgpa_calculator.calculate_sgpa(cie_marks)
+    sgpa_data = cgpa_calculator.calculate_sgpa(marks_profile)
     
     # Get subject performance
-    performance_data = analytics.calculate_subject_performance_dashboard(cie_marks)
-    
-    # Get attendance data
-    session, html = web_scraper.login_and_get_welcome_page(
-        user_details["prn"],
-        user_details["dob_day"],
-        user_details["dob_month"],
-        user_details["dob_year"],
-        user_details["full_name"]
-    )
+    performance_data = analytics.calculate_subject_performance_dashboard(marks_profile)
     
-    attendance_records = []
     attendance_marks_correlation = []
     avg_attendance = 0
     
-    if html:
-        attendance_records = web_scraper.extract_attendance_from_welcome_page(html)
-        if attendance_records:
-            avg_attendance = sum(r["percentage"] for r in attendance_records) / len(attendance_records)
-            correlation_data = analytics.calculate_attendance_marks_correlation(
-                attendance_records, cie_marks
-            )
-            # Transform to simple format for scatter plot
-            attendance_marks_correlation = [
-                {"attendance": s["attendance"], "marks": s["marks_percentage"]}
-                for s in correlation_data.get("subject_correlations", [])
-            ]
+    if attendance_records:
+        avg_attendance = sum(r["percentage"] for r in attendance_records) / len(attendance_records)
+        correlation_data = analytics.calculate_attendance_marks_correlation(
+            attendance_records, marks_profile
+        )
+        # Transform to simple format for scatter plot
+        attendance_marks_correlation = [
+            {"attendance": s["attendance"], "marks": s["marks_percentage"]}
+            for s in correlation_data.get("subject_correlations", [])
+        ]
     
     # Predictions
-    predictions = analytics.predict_final_grades(cie_marks, semester_records)
+    predictions = analytics.predict_final_grades(marks_profile, semester_records)
     
     return {
         "current_sgpa": sgpa_data["sgpa"],
@@ -455,36 +738,163 @@ async def get_combined_analytics(username: str):
         "grade_distribution": sgpa_data.get("grade_distribution", {})
     }
 
+# Bulk Endpoints
+async def resolve_bulk_users(bulk: BulkRequest):
+    """
+    Validates a bulk request and looks its users up in one query. Returns [(username, user or None)]:
+    in request order for usernames (None = not registered), by username for a cohort.
+    """
+    if bulk.usernames is None and not bulk.prn_prefix:
+        raise HTTPException(status_code=400, detail="Provide usernames and/or prn_prefix")
+    
+    usernames = None
+    if bulk.usernames is not None:
+        usernames = list(dict.fromkeys(name.lower().strip() for name in bulk.usernames if name.strip()))
+        if len(usernames) > config.BULK_MAX_USERS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"At most {config.BULK_MAX_USERS} usernames per request"
+            )
+    limit = min(bulk.limit or config.BULK_MAX_USERS, config.BULK_MAX_USERS)
+    
+    users = await worker_pools.run_db(db_utils.get_users_bulk_pg, usernames, bulk.prn_prefix, limit)
+    if users is None:
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    
+    if usernames is None:
+        return [(user["username"], user) for user in users]
+    users_by_name = {user["username"]: user for user in users}
+    return [(username, users_by_name.get(username)) for username in usernames]
+
+def bulk_item(kind, student_data):
+    """One user's result in a bulk response, the same body the single-user endpoint returns."""
+    cie_marks = student_data["cie_marks"]
+    if kind == "marks":
+        return {"cie_marks": cie_marks}
+    if not cie_marks:
+        raise HTTPException(status_code=404, detail="No marks data available")
+    if kind == "sgpa":
+        return cgpa_calculator.calculate_sgpa(cie_marks)
+    return combined_analytics_payload(cie_marks, student_data["semester_records"], student_data["attendance"])
+
+def ndjson_line(username, status_code, data=None, detail=None):
+    line = {"username": username, "status": status_code}
+    if data is not None:
+        line["data"] = data
+    else:
+        line["detail"] = detail
+    return json_codec.dumps(line, default=str) + b"\n"
+
+async def stream_bulk(kind, entries):
+    """
+    Yields one NDJSON line per requested user. Marks (plus semesters and attendance for
+    analytics) are loaded BULK_BATCH_SIZE users per query, the next batch while this one
+    is computed and sent. A failure for one user becomes that user's line, not a broken stream.
+    """
+    async def fetch(batch):
+        user_ids = [user["id"] for _, user in batch if user]
+        if not user_ids:
+            return {}
+        return await worker_pools.run_db(
+            db_utils.get_bulk_student_data_pg, user_ids,
+            with_semesters=kind == "analytics", with_attendance=kind == "analytics"
+        )
+    
+    size = max(1, config.BULK_BATCH_SIZE)
+    batches = [entries[i:i + size] for i in range(0, len(entries), size)]
+    pending = asyncio.create_task(fetch(batches[0])) if batches else None
+    try:
+        for index, batch in enumerate(batches):
+            batch_data = await pending
+            pending = asyncio.create_task(fetch(batches[index + 1])) if index + 1 < len(batches) else None
+            for username, user in batch:
+                if not user:
+                    yield ndjson_line(username, 404, detail="User not found")
+                elif batch_data is None:
+                    yield ndjson_line(username, 503, detail="Database unavailable")
+                else:
+                    try:
+                        yield ndjson_line(username, 200, bulk_item(kind, batch_data[user["id"]]))
+                    except HTTPException as e:
+                        yield ndjson_line(username, e.status_code, detail=e.detail)
+                    except Exception as e:
+                        print(f"❌ Bulk {kind} failed for {username}: {e}")
+                        yield ndjson_line(username, 500, detail=str(e))
+    finally:
+        # Client went away mid-stream: don't leave the prefetch running
+        if pending is not None:
+            pending.cancel()
+
+async def bulk_response(bulk: BulkRequest, kind):
+    entries = await resolve_bulk_users(bulk)
+    return StreamingResponse(
+        stream_bulk(kind, entries),
+        media_type="application/x-ndjson",
+        headers={"X-Bulk-Count": str(len(entries))}
+    )
+
+@app.post("/api/bulk/marks")
+async def bulk_marks(bulk: BulkRequest):
+    """CIE marks for many users, streamed as NDJSON (one line per user)"""
+    return await bulk_response(bulk, "marks")
+
+@app.post("/api/bulk/sgpa")
+async def bulk_sgpa(bulk: BulkRequest):
+    """SGPA from current CIE marks for many users, streamed as NDJSON (one line per user)"""
+    return await bulk_response(bulk, "sgpa")
+
+@app.post("/api/bulk/analytics")
+async def bulk_analytics(bulk: BulkRequest):
+    """
+    Combined analytics for many users, streamed as NDJSON (one line per user). Uses the
+    stored attendance as-is: a class-wide request never triggers portal refreshes.
+    """
+    return await bulk_response(bulk, "analytics")
+
 # Leaderboard Endpoints
+# Serialized leaderboard responses, reused until LEADERBOARD_CACHE_SECONDS pass or a scrape changes marks
+leaderboard_bodies = json_codec.BodyCache(config.LEADERBOARD_CACHE_SECONDS)
+
+def _query_overall_leaderboard(limit):
+    """Blocking query behind /leaderboard; runs on the DB pool."""
+    import db_utils_prisma
+    import psycopg2.extras
+    
+    # Get all users with their SGPA
+    conn = db_utils_prisma.get_db_connection()
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    
+    cursor.execute("""
+        SELECT 
+            u.first_name,
+            u.full_name,
+            u.prn,
+            COALESCE(AVG(cm.marks), 0) as avg_marks,
+            COUNT(DISTINCT cm.subject_code) as subject_count
+        FROM users u
+        LEFT JOIN cie_marks cm ON u.id = cm.user_id
+        GROUP BY u.id, u.first_name, u.full_name, u.prn
+        HAVING COUNT(DISTINCT cm.subject_code) > 0
+        ORDER BY avg_marks DESC
+        LIMIT %s
+    """, (limit,))
+    
+    results = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return results
+
 @app.get("/leaderboard")
-async def get_overall_leaderboard(limit: int = 50):
+async def get_overall_leaderboard(request: Request, limit: int = 50):
     """Get overall leaderboard ranked by SGPA"""
+    cache_key = ("overall", limit)
+    cached = leaderboard_bodies.get(cache_key)
+    if cached is not None:
+        return precomputed_response(request, cached, "public, no-cache")
+    generation = leaderboard_bodies.generation
+    
     try:
-        import db_utils_prisma
-        import psycopg2.extras
-        
-        # Get all users with their SGPA
-        conn = db_utils_prisma.get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        
-        cursor.execute("""
-            SELECT 
-                u.first_name,
-                u.full_name,
-                u.prn,
-                COALESCE(AVG(cm.marks), 0) as avg_marks,
-                COUNT(DISTINCT cm.subject_code) as subject_count
-            FROM users u
-            LEFT JOIN cie_marks cm ON u.id = cm.user_id
-            GROUP BY u.id, u.first_name, u.full_name, u.prn
-            HAVING COUNT(DISTINCT cm.subject_code) > 0
-            ORDER BY avg_marks DESC
-            LIMIT %s
-        """, (limit,))
-        
-        results = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        results = await worker_pools.run_db(_query_overall_leaderboard, limit)
         
         leaderboard = []
         for idx, row in enumerate(results):
@@ -502,15 +912,22 @@ async def get_overall_leaderboard(limit: int = 50):
                 "avg_attendance": 0  # TODO: Calculate from attendance records
             })
         
-        return leaderboard
+        body = leaderboard_bodies.put(cache_key, leaderboard, generation)
+        return precomputed_response(request, body, "public, no-cache")
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/leaderboard/{subject_code}/{exam_type}")
-async def get_subject_leaderboard(subject_code: str, exam_type: str, limit: int = 10):
+async def get_subject_leaderboard(request: Request, subject_code: str, exam_type: str, limit: int = 10):
     """Get leaderboard for a specific subject and exam type"""
-    leaderboard = db_utils.get_subject_leaderboard_pg(subject_code, exam_type, limit)
+    cache_key = (subject_code, exam_type, limit)
+    cached = leaderboard_bodies.get(cache_key)
+    if cached is not None:
+        return precomputed_response(request, cached, "public, no-cache")
+    generation = leaderboard_bodies.generation
+    
+    leaderboard = await worker_pools.run_db(db_utils.get_subject_leaderboard_pg, subject_code, exam_type, limit)
     
     if not leaderboard:
         raise HTTPException(
@@ -518,23 +935,27 @@ async def get_subject_leaderboard(subject_code: str, exam_type: str, limit: int
             detail=f"No leaderboard data for {subject_code} - {exam_type}"
         )
     
-    return {
+    body = leaderboard_bodies.put(cache_key, {
         "subject_code": subject_code,
         "exam_type": exam_type,
         "leaderboard": [
             {"rank": idx + 1, "name": name, "marks": marks}
             for idx, (name, marks) in enumerate(leaderboard)
         ]
-    }
+    }, generation)
+    return precomputed_response(request, body, "public, no-cache")
 
 # Subject Configuration
+# Fixed for the life of the process, so serialized once at startup
+subjects_body = json_codec.PrecomputedBody({
+    "subjects": config.SUBJECT_CODE_TO_NAME_MAP,
+    "credits": config.SUBJECT_CREDITS
+})
+
 @app.get("/api/config/subjects")
-async def get_subjects():
+async def get_subjects(request: Request):
     """Get all subject mappings"""
-    return {
-        "subjects": config.SUBJECT_CODE_TO_NAME_MAP,
-        "credits": config.SUBJECT_CREDITS
-    }
+    return precomputed_response(request, subjects_body, "public, max-age=300")
 
 if __name__ == "__main__":
     import uvicorn
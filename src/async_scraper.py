@@ -0,0 +1,249 @@
+# async_scraper.py
+"""
+Asyncio-native portal client for the FastAPI backend.
+Mirrors web_scraper.login_and_get_welcome_page without blocking the event loop.
+The sync functions in web_scraper remain the entry point for Streamlit and batch scripts.
+"""
+import asyncio
+import copy
+
+import httpx
+
+from src import config
+from src import dashboard_parser
+from src import html_archive
+from src import portal_http
+from src import portal_rate_limit
+from src import scrape_metrics
+from src import scrape_progress
+from src import single_flight
+from src import web_scraper
+from src import worker_pools
+
+PORTAL_TIMEOUT_SECONDS = 20
+
+def _new_client():
+    return httpx.AsyncClient(
+        transport=portal_http.get_async_transport(),
+        headers=web_scraper.PORTAL_HEADERS,
+        timeout=PORTAL_TIMEOUT_SECONDS,
+        follow_redirects=True
+    )
+
+async def _send_for_dashboard(client, phase, method, url, on_chart=None, **kwargs):
+    """
+    Async counterpart of web_scraper.read_dashboard_response. Returns (response, page_text).
+    The request up to the response headers is timed as `phase`, the body as "dashboard.download".
+    When streaming, on_chart gets each chart as it is parsed, and reading stops once both are in
+    unless web_scraper.needs_rest_of_dashboard().
+    """
+    if not config.PORTAL_STREAM_DASHBOARD:
+        with scrape_metrics.span(phase):
+            response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+        scrape_metrics.emit(scrape_metrics.Span("dashboard.download", bytes=len(response.content),
+                                                attributes={"streamed": False}))
+        return response, response.text
+    with scrape_metrics.span(phase):
+        request = client.build_request(method, url, **kwargs)
+        response = await client.send(request, stream=True)
+    with scrape_metrics.span("dashboard.download", streamed=True) as download_span:
+        scanner = dashboard_parser.IncrementalDashboardScanner(on_chart)
+        stopped_early = False
+        try:
+            if response.is_error:
+                await response.aread()
+                response.raise_for_status()
+            async for chunk in response.aiter_bytes(web_scraper.STREAM_CHUNK_SIZE):
+                charts_were_done = scanner.done
+                if scanner.feed(chunk) and not charts_were_done and not web_scraper.needs_rest_of_dashboard(scanner):
+                    stopped_early = True
+                    break
+        finally:
+            await response.aclose()
+        raw = scanner.getvalue()
+        download_span.bytes = len(raw)
+        download_span.attributes["charts_at_bytes"] = scanner.charts_at
+        download_span.attributes["stopped_early"] = stopped_early
+    return response, raw.decode(response.encoding or "utf-8", errors="replace")
+
+# Logged-in clients keyed by PRN; separate from the sync cache since it holds httpx clients
+_session_cache = web_scraper.PortalSessionCache(config.PORTAL_SESSION_TTL_SECONDS)
+
+async def _fetch_login_form(client):
+    with scrape_metrics.span("login.get_form") as form_span:
+        response_get = await client.get(config.LOGIN_URL)
+        response_get.raise_for_status()
+        form_span.bytes = len(response_get.content)
+        login_form = web_scraper.parse_login_form(response_get.content)
+        if not login_form:
+            form_span.outcome = "no_form"
+    if login_form:
+        web_scraper.login_form_cache.put(login_form)
+    return login_form
+
+async def _post_login(client, login_form, prn, dob_day, dob_month_val, dob_year, on_chart=None):
+    payload = web_scraper.build_login_payload(login_form, prn, dob_day, dob_month_val, dob_year)
+    response_post, welcome_page_html = await _send_for_dashboard(
+        client, "login.post", "POST", login_form.post_url, on_chart=on_chart, data=payload
+    )
+    return welcome_page_html, str(response_post.url)
+
+async def _login(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check, on_chart=None):
+    """
+    Performs the login POST, preceded by a GET of the login page unless the login form
+    is cached. Returns (client, welcome_page_html, dashboard_url).
+    """
+    client = _new_client()
+    with scrape_metrics.span("login") as login_span:
+        try:
+            login_form = web_scraper.login_form_cache.get()
+            login_span.attributes["cached_form"] = login_form is not None
+            if login_form:
+                welcome_page_html, dashboard_url = await _post_login(client, login_form, prn, dob_day, dob_month_val, dob_year, on_chart)
+                if web_scraper.should_retry_login_form(welcome_page_html):
+                    print("Cached login form was rejected. Retrying with a fresh form.")
+                    login_form = web_scraper.login_form_cache.discard(login_form)
+                    if login_form:
+                        welcome_page_html, dashboard_url = await _post_login(client, login_form, prn, dob_day, dob_month_val, dob_year, on_chart)
+            if not login_form:
+                login_form = await _fetch_login_form(client)
+                if not login_form:
+                    login_span.outcome = "no_form"
+                    return None, None, None
+                welcome_page_html, dashboard_url = await _post_login(client, login_form, prn, dob_day, dob_month_val, dob_year, on_chart)
+            if not web_scraper.check_login_success(welcome_page_html, user_full_name_for_check):
+                login_span.outcome = "rejected"
+                return None, None, None
+            return client, welcome_page_html, dashboard_url
+        except httpx.HTTPStatusError as e:
+            login_span.outcome = "http_error"
+            print(f"HTTP error occurred during login: {e}")
+            print(f"Response content (first 500 chars): {e.response.text[:500]}...")
+            return None, None, None
+        except httpx.RequestError as e:
+            login_span.outcome = "request_error"
+            print(f"A request error occurred during login: {e}")
+            return None, None, None
+        except Exception as e:
+            login_span.outcome = "error"
+            print(f"An unexpected error occurred during login: {e}")
+            return None, None, None
+
+async def login_and_get_welcome_page(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check):
+    """
+    Async variant of web_scraper.login_and_get_welcome_page. Always performs a fresh login.
+
+    Returns:
+        tuple: (client, welcome_page_html) or (None, None) if login failed
+    """
+    client, welcome_page_html, _ = await _login(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check)
+    return client, welcome_page_html
+
+async def get_welcome_page(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check, on_chart=None):
+    """
+    Async variant of web_scraper.get_welcome_page (reuses a cached session for this PRN).
+    on_chart(name, script_content) is called as each chart script streams in (see
+    IncrementalDashboardScanner); only for dashboard pages, which a chart implies.
+    """
+    creds_key = web_scraper.credentials_key(dob_day, dob_month_val, dob_year)
+    client, dashboard_url = _session_cache.get(prn, creds_key)
+    if client is not None:
+        try:
+            _, welcome_page_html = await _send_for_dashboard(client, "dashboard.get", "GET", dashboard_url, on_chart=on_chart)
+            if web_scraper.is_dashboard_page(welcome_page_html, user_full_name_for_check):
+                return client, welcome_page_html
+            print("Cached portal session expired on the portal side. Logging in again.")
+        except httpx.HTTPError as e:
+            print(f"Cached portal session failed ({e}). Logging in again.")
+        _session_cache.invalidate(prn)
+
+    client, welcome_page_html, dashboard_url = await _login(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check, on_chart)
+    if client is not None:
+        _session_cache.put(prn, creds_key, client, dashboard_url)
+    return client, welcome_page_html
+
+async def fetch_attendance_details(client, prn, attendance_records, welcome_page_html, stored_attendance=None):
+    """Async variant of web_scraper.fetch_attendance_details (bounded by a semaphore)."""
+    cached, to_fetch = web_scraper.plan_attendance_details(prn, attendance_records, welcome_page_html, stored_attendance)
+    semaphore = asyncio.Semaphore(config.PORTAL_ATTENDANCE_DETAIL_FANOUT)
+
+    async def fetch_one(url):
+        async with semaphore:
+            with scrape_metrics.span("attendance_detail.get") as detail_span:
+                response = await client.get(url)
+                response.raise_for_status()
+                detail_span.bytes = len(response.content)
+                counts = dashboard_parser.parse_attendance_detail(response.text)
+                if counts is None:
+                    detail_span.outcome = "unparsed"
+                return counts
+
+    results = await asyncio.gather(*(fetch_one(url) for url in to_fetch.values()), return_exceptions=True)
+    fetched = {}
+    for code, result in zip(to_fetch, results):
+        if isinstance(result, BaseException) and not isinstance(result, httpx.HTTPError):
+            raise result
+        fetched[code] = result
+    web_scraper.merge_attendance_details(prn, attendance_records, cached, fetched, stored_attendance)
+
+# An interactive caller joining a background refresh moves the shared fetch to its lane
+_dashboard_flight = single_flight.AsyncSingleFlight(config.PORTAL_SINGLE_FLIGHT_REUSE_SECONDS,
+                                                    on_join=portal_rate_limit.raise_lane)
+
+async def fetch_dashboard(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check, stored_attendance=None):
+    """Async variant of web_scraper.fetch_dashboard (one login+parse per PRN across concurrent callers)."""
+    async def fetch():
+        # Progress events go to anyone watching this PRN (see scrape_progress / the SSE endpoint).
+        # Each is published once: from the streamed charts as they arrive, else after the full parse.
+        published = set()
+        streamed = {}
+
+        def publish_once(event, data=None):
+            if event not in published:
+                published.add(event)
+                scrape_progress.publish(prn, event, data)
+
+        def on_chart(name, data):
+            streamed[name] = data
+            # A chart is only served on the dashboard, so the login has succeeded
+            publish_once(scrape_progress.LOGIN_OK)
+            publish_once(scrape_progress.ATTENDANCE_PARSED if name == "attendance" else scrape_progress.CIE_PARSED, data)
+
+        publish_once(scrape_progress.LOGIN_STARTED)
+        client, welcome_page_html = await get_welcome_page(prn, dob_day, dob_month_val, dob_year,
+                                                           user_full_name_for_check, on_chart)
+        if not welcome_page_html:
+            return None
+        publish_once(scrape_progress.LOGIN_OK)
+        if len(streamed) == 2:
+            # Both charts were parsed from the stream; the page isn't searched again
+            dashboard = dashboard_parser.streamed_dashboard(streamed["attendance"], streamed["cie"])
+        else:
+            dashboard = await worker_pools.run_scraper(web_scraper.parse_dashboard, welcome_page_html)
+        publish_once(scrape_progress.ATTENDANCE_PARSED, dashboard.attendance)
+        publish_once(scrape_progress.CIE_PARSED, dashboard.cie_marks)
+        archiving = None
+        if html_archive.get_archive() is not None:
+            # Compression and file I/O run on the pool while the detail pages download
+            archiving = asyncio.ensure_future(worker_pools.run_scraper(html_archive.archive_page, prn, welcome_page_html))
+        try:
+            if config.PORTAL_FETCH_ATTENDANCE_DETAILS and dashboard.attendance:
+                await fetch_attendance_details(client, prn, dashboard.attendance, welcome_page_html, stored_attendance)
+                publish_once(scrape_progress.ATTENDANCE_DETAILS, dashboard.attendance)
+        finally:
+            if archiving is not None:
+                await archiving
+        return dashboard
+
+    key = (prn, web_scraper.credentials_key(dob_day, dob_month_val, dob_year))
+    dashboard = await _dashboard_flight.do(key, fetch)
+    return copy.deepcopy(dashboard) if dashboard is not None else None
+
+def get_single_flight_stats():
+    return _dashboard_flight.get_stats()
+
+async def close():
+    """Drops cached sessions and closes the shared async pool. Call on application shutdown."""
+    _session_cache.clear()
+    await portal_http.close_async_transport()
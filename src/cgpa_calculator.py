@@ -5,6 +5,9 @@ Handles grade point calculations, CGPA/SGPA computation, and target grade predic
 Uses percentage-based pointer system.
 """
 
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
 from . import config
 from . import exam_max_marks
 
@@ -96,13 +99,83 @@ def calculate_subject_total(marks_dict, subject_code):
     return (total, max_total) if has_marks else (None, None)
 
 
+def get_subject_type(subject_code):
+    """Returns "Lab", "Theory" or "Other" from the subject code prefix."""
+    if subject_code.startswith("CSL") or subject_code.startswith("CSDL"):
+        return "Lab"
+    if subject_code.startswith("CSC") or subject_code.startswith("CSDC"):
+        return "Theory"
+    return "Other"
+
+
+@dataclass
+class SubjectProfile:
+    """Per-subject figures derived once from the subject's marks."""
+    code: str
+    name: str
+    marks: Dict
+    credits: int
+    subject_type: str
+    total_marks: Optional[float] = None
+    max_marks: Optional[float] = None
+    percentage: Optional[float] = None
+    grade_point: Optional[int] = None
+    grade: Optional[str] = None
+
+    @property
+    def has_marks(self):
+        return self.total_marks is not None
+
+
+@dataclass
+class MarksProfile:
+    """
+    A student's CIE marks with every subject's total, max marks, percentage, grade and
+    credits computed once. Build it per request with build_marks_profile() and pass it to
+    the cgpa_calculator and analytics functions instead of the raw marks dict.
+    """
+    cie_marks: Dict
+    subjects: Dict[str, SubjectProfile] = field(default_factory=dict)
+
+    def graded_subjects(self):
+        """Subjects with at least one numeric mark, in the order of cie_marks."""
+        return [subject for subject in self.subjects.values() if subject.has_marks]
+
+
+def build_marks_profile(cie_marks_data):
+    """Computes the MarksProfile for a {subject_code: {exam_type: marks}} dict."""
+    profile = MarksProfile(cie_marks=cie_marks_data)
+    for subject_code, marks_dict in cie_marks_data.items():
+        subject = SubjectProfile(
+            code=subject_code,
+            name=config.SUBJECT_CODE_TO_NAME_MAP.get(subject_code, subject_code),
+            marks=marks_dict,
+            credits=get_subject_credits(subject_code),
+            subject_type=get_subject_type(subject_code)
+        )
+        total_marks, max_marks = calculate_subject_total(marks_dict, subject_code)
+        if total_marks is not None:
+            subject.total_marks = total_marks
+            subject.max_marks = max_marks
+            subject.percentage = (total_marks / max_marks) * 100 if max_marks > 0 else 0
+            subject.grade_point, subject.grade = get_grade_point(total_marks, max_marks=max_marks)
+        profile.subjects[subject_code] = subject
+    return profile
+
+
+def as_marks_profile(marks):
+    """Accepts either a MarksProfile or a raw CIE marks dict."""
+    return marks if isinstance(marks, MarksProfile) else build_marks_profile(marks)
+
+
 def calculate_sgpa(cie_marks_data):
     """
     Calculate SGPA (Semester Grade Point Average) from CIE marks.
     Uses the formula: (totalPoints / (totalCredits * 10)) * 10
     
     Args:
-        cie_marks_data (dict): Dictionary of subject codes to marks dictionaries
+        cie_marks_data (dict | MarksProfile): Dictionary of subject codes to marks dictionaries,
+            or its precomputed MarksProfile
     
     Returns:
         dict: {
@@ -112,42 +185,31 @@ def calculate_sgpa(cie_marks_data):
             'grade_distribution': dict of grade counts
         }
     """
+    profile = as_marks_profile(cie_marks_data)
     total_points = 0.0  # Sum of (grade_point * credits)
     total_credits = 0
     subjects_info = []
     grade_distribution = {}
     
-    for subject_code, marks_dict in cie_marks_data.items():
-        # Calculate total marks for the subject
-        result = calculate_subject_total(marks_dict, subject_code)
+    for subject in profile.graded_subjects():
+        # Add to total points (pointer * credits)
+        total_points += subject.grade_point * subject.credits
+        total_credits += subject.credits
         
-        if result != (None, None):
-            total_marks, max_marks = result
-            
-            # Get grade point (out of 10) based on percentage
-            grade_point, grade_letter = get_grade_point(total_marks, max_marks=max_marks)
-            subject_credits = get_subject_credits(subject_code)
-            
-            # Add to total points (pointer * credits)
-            total_points += grade_point * subject_credits
-            total_credits += subject_credits
-            
-            # Track grade distribution
-            grade_distribution[grade_letter] = grade_distribution.get(grade_letter, 0) + 1
-            
-            # Store subject info
-            subject_name = config.SUBJECT_CODE_TO_NAME_MAP.get(subject_code, subject_code)
-            percentage = round((total_marks / max_marks) * 100, 2) if max_marks > 0 else 0
-            subjects_info.append({
-                'code': subject_code,
-                'name': subject_name,
-                'credits': subject_credits,
-                'marks': total_marks,
-                'max_marks': max_marks,
-                'percentage': percentage,
-                'grade_point': grade_point,
-                'grade': grade_letter
-            })
+        # Track grade distribution
+        grade_distribution[subject.grade] = grade_distribution.get(subject.grade, 0) + 1
+        
+        # Store subject info
+        subjects_info.append({
+            'code': subject.code,
+            'name': subject.name,
+            'credits': subject.credits,
+            'marks': subject.total_marks,
+            'max_marks': subject.max_marks,
+            'percentage': round(subject.percentage, 2) if subject.max_marks > 0 else 0,
+            'grade_point': subject.grade_point,
+            'grade': subject.grade
+        })
     
     # Calculate SGPA using formula: (totalPoints / (totalCredits * 10)) * 10
     # This simplifies to: totalPoints / totalCredits
@@ -206,26 +268,27 @@ def calculate_required_marks_for_target(current_cie_marks, target_sgpa, subject_
     Calculate how much marks needed in remaining subjects to achieve target SGPA.
     
     Args:
-        current_cie_marks (dict): Current CIE marks data
+        current_cie_marks (dict | MarksProfile): Current CIE marks data, or its MarksProfile
         target_sgpa (float): Desired SGPA to achieve
         subject_priorities (list): Optional list of subject codes to focus on
     
     Returns:
         dict: Analysis of what's needed to achieve target SGPA
     """
+    profile = as_marks_profile(current_cie_marks)
     # First, calculate current state
-    current_stats = calculate_sgpa(current_cie_marks)
+    current_stats = calculate_sgpa(profile)
     
     # Identify subjects with incomplete marks
     incomplete_subjects = []
     complete_subjects = []
     
-    for subject_code, marks_dict in current_cie_marks.items():
-        result = calculate_subject_total(marks_dict, subject_code)
-        subject_name = config.SUBJECT_CODE_TO_NAME_MAP.get(subject_code, subject_code)
-        credits = get_subject_credits(subject_code)
+    for subject_code, subject in profile.subjects.items():
+        marks_dict = subject.marks
+        subject_name = subject.name
+        credits = subject.credits
         
-        if result == (None, None):
+        if not subject.has_marks:
             # Check what's missing
             missing_exams = []
             if subject_code.startswith("CSC") or subject_code.startswith("CSDC") or \
@@ -246,13 +309,12 @@ def calculate_required_marks_for_target(current_cie_marks, target_sgpa, subject_
                 'missing_exams': missing_exams
             })
         else:
-            total_marks, max_marks = result
             complete_subjects.append({
                 'code': subject_code,
                 'name': subject_name,
                 'credits': credits,
-                'marks': total_marks,
-                'max_marks': max_marks
+                'marks': subject.total_marks,
+                'max_marks': subject.max_marks
             })
     
     if not incomplete_subjects:
@@ -0,0 +1,115 @@
+# circuit_breaker.py
+"""
+Circuit breaker and jittered backoff for calls to a flaky upstream (the portal).
+
+closed     -> calls go through; `failure_threshold` consecutive failures open the circuit
+open       -> calls fail fast with CircuitOpenError until `recovery_seconds` have passed
+half_open  -> up to `half_open_max_calls` trial calls go through; a success closes the
+              circuit, a failure opens it again
+"""
+import random
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def backoff_delay(attempt, base_seconds, max_seconds):
+    """Full-jitter exponential backoff: uniform(0, min(max, base * 2**attempt))."""
+    return random.uniform(0, min(max_seconds, base_seconds * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, recovery_seconds, half_open_max_calls=1):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_seconds = recovery_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._counts = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _refresh(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.recovery_seconds:
+            self._state = HALF_OPEN
+            self._half_open_in_flight = 0
+
+    def before_call(self):
+        """Reserves a slot for one call or raises CircuitOpenError. Pair with exactly one record_* call."""
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return
+            self._counts["rejected"] += 1
+            retry_after = max(0.0, self.recovery_seconds - (now - self._opened_at))
+        raise CircuitOpenError(self.name, retry_after)
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._counts["opened"] += 1
+        print(f"⚠️ Circuit '{self.name}' opened after {self._consecutive_failures} consecutive failures.")
+
+    def record_success(self):
+        with self._lock:
+            self._counts["successes"] += 1
+            self._consecutive_failures = 0
+            if self._state == HALF_OPEN:
+                print(f"✅ Circuit '{self.name}' closed again.")
+            self._state = CLOSED
+            self._half_open_in_flight = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._counts["failures"] += 1
+            self._consecutive_failures += 1
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+                self._open()
+            elif self._state == CLOSED and self._consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def release(self):
+        """Gives back a slot from before_call() for a call that says nothing about upstream health."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    def is_open(self):
+        return self.state == OPEN
+
+    def get_state(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refresh(now)
+            state = {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                **self._counts
+            }
+            if self._state == OPEN:
+                state["retry_after_seconds"] = round(max(0.0, self.recovery_seconds - (now - self._opened_at)), 1)
+            return state
@@ -1,5 +1,6 @@
 # config.py
 import os
+import tempfile
 
 # --- Neon PostgreSQL Configuration (Active) ---
 NEON_PASSWORDLESS_AUTH = os.environ.get("NEON_PASSWORDLESS_AUTH", "false").lower() == "true"
@@ -32,9 +33,88 @@ MCP_SERVER_CONFIG = {
 }
 
 # --- Portal Configuration ---
-LOGIN_URL = "https://crce-students.contineo.in/parents/index.php?option=com_studentdashboard&controller=studentdashboard&task=dashboard"
+LOGIN_URL = os.environ.get("PORTAL_LOGIN_URL", "https://crce-students.contineo.in/parents/index.php?option=com_studentdashboard&controller=studentdashboard&task=dashboard")
 FORM_ACTION_URL = LOGIN_URL
 
+# How long a logged-in portal session is reused for repeat fetches (0 disables the cache)
+PORTAL_SESSION_TTL_SECONDS = int(os.environ.get("PORTAL_SESSION_TTL_SECONDS", "600"))
+
+# How long the login form (action URL + hidden inputs) is reused before re-fetching the login page
+PORTAL_LOGIN_FORM_TTL_SECONDS = int(os.environ.get("PORTAL_LOGIN_FORM_TTL_SECONDS", "300"))
+
+# Shared connection pool for portal traffic (HTTP/2 needs the optional 'h2' package, async client only).
+# The idle keep-alive expiry applies to the async (httpx) pool only: urllib3 has no idle timeout, so
+# the sync pool keeps connections until the portal closes them and reconnects transparently.
+PORTAL_POOL_MAXSIZE = int(os.environ.get("PORTAL_POOL_MAXSIZE", "10"))
+PORTAL_KEEPALIVE_SECONDS = float(os.environ.get("PORTAL_KEEPALIVE_SECONDS", "30"))
+PORTAL_HTTP2 = os.environ.get("PORTAL_HTTP2", "false").lower() == "true"
+
+# Stream the dashboard response and scan for the chart scripts as they arrive. The rest of the
+# page is still read, so the connection is reused and link discovery/the archive see the whole page.
+PORTAL_STREAM_DASHBOARD = os.environ.get("PORTAL_STREAM_DASHBOARD", "true").lower() == "true"
+
+# Concurrent fetches for the same PRN share one login+parse; a finished result is reused this long
+PORTAL_SINGLE_FLIGHT_REUSE_SECONDS = float(os.environ.get("PORTAL_SINGLE_FLIGHT_REUSE_SECONDS", "5"))
+
+# Retries for transient portal errors (connection errors, connect timeouts, 429/5xx) with jittered backoff.
+# Read timeouts are not retried: each attempt would wait the full timeout again.
+PORTAL_RETRY_ATTEMPTS = int(os.environ.get("PORTAL_RETRY_ATTEMPTS", "2"))
+PORTAL_RETRY_BASE_SECONDS = float(os.environ.get("PORTAL_RETRY_BASE_SECONDS", "0.5"))
+PORTAL_RETRY_MAX_SECONDS = float(os.environ.get("PORTAL_RETRY_MAX_SECONDS", "5"))
+
+# Circuit breaker: fail fast after this many consecutive failures, probe again after the recovery time
+PORTAL_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("PORTAL_BREAKER_FAILURE_THRESHOLD", "5"))
+PORTAL_BREAKER_RECOVERY_SECONDS = float(os.environ.get("PORTAL_BREAKER_RECOVERY_SECONDS", "30"))
+PORTAL_BREAKER_HALF_OPEN_CALLS = int(os.environ.get("PORTAL_BREAKER_HALF_OPEN_CALLS", "1"))
+
+# Follow each subject's attendance detail page for real attended/conducted counts.
+# Pages are fetched PORTAL_ATTENDANCE_DETAIL_FANOUT at a time and re-fetched only when the gauge value moves.
+PORTAL_FETCH_ATTENDANCE_DETAILS = os.environ.get("PORTAL_FETCH_ATTENDANCE_DETAILS", "true").lower() == "true"
+PORTAL_ATTENDANCE_DETAIL_FANOUT = int(os.environ.get("PORTAL_ATTENDANCE_DETAIL_FANOUT", "4"))
+PORTAL_ATTENDANCE_DETAIL_TTL_SECONDS = int(os.environ.get("PORTAL_ATTENDANCE_DETAIL_TTL_SECONDS", "86400"))
+
+# Archive every fetched dashboard page (compressed, deduplicated) under this directory; empty disables it
+PORTAL_ARCHIVE_DIR = os.environ.get("PORTAL_ARCHIVE_DIR", "")
+PORTAL_ARCHIVE_RETENTION_DAYS = int(os.environ.get("PORTAL_ARCHIVE_RETENTION_DAYS", "30"))
+
+# Token bucket shared by every process talking to the portal (0 disables rate limiting).
+# One student fetch is about 10 requests (login, dashboard, detail pages), so the burst covers two
+# back to back and the reserve keeps one whole fetch for interactive requests during batch refreshes.
+PORTAL_RATE_LIMIT_PER_SECOND = float(os.environ.get("PORTAL_RATE_LIMIT_PER_SECOND", "5.0"))
+PORTAL_RATE_BURST = int(os.environ.get("PORTAL_RATE_BURST", "20"))
+PORTAL_RATE_BACKGROUND_RESERVE = int(os.environ.get("PORTAL_RATE_BACKGROUND_RESERVE", "10"))
+PORTAL_RATE_LIMIT_DB = os.environ.get(
+    "PORTAL_RATE_LIMIT_DB", os.path.join(tempfile.gettempdir(), "contineo_portal_rate_limit.sqlite3")
+)
+
+# Print one JSON line per scrape phase span (login, download, parse...) in addition to the /health histograms
+SCRAPE_METRICS_LOG = os.environ.get("SCRAPE_METRICS_LOG", "false").lower() == "true"
+
+# Stored attendance older than this (since the last successful scrape) is served as-is
+# while a background portal refresh runs
+ATTENDANCE_STALE_AFTER_SECONDS = int(os.environ.get("ATTENDANCE_STALE_AFTER_SECONDS", "21600"))
+
+# Asynchronous scrape jobs (POST /api/data/fetch/{username}?job=true): concurrent jobs,
+# queue bound (0 = unbounded) and how long finished jobs stay pollable
+SCRAPE_JOB_WORKERS = int(os.environ.get("SCRAPE_JOB_WORKERS", "4"))
+SCRAPE_JOB_MAX_QUEUED = int(os.environ.get("SCRAPE_JOB_MAX_QUEUED", "200"))
+SCRAPE_JOB_RETENTION_SECONDS = int(os.environ.get("SCRAPE_JOB_RETENTION_SECONDS", "600"))
+
+# Threads for blocking work in the API: psycopg2 queries, and parsing/archiving of portal pages.
+# Kept separate so slow scraper work can't starve quick DB reads.
+API_DB_POOL_SIZE = int(os.environ.get("API_DB_POOL_SIZE", "8"))
+API_SCRAPER_POOL_SIZE = int(os.environ.get("API_SCRAPER_POOL_SIZE", "4"))
+
+# Bulk endpoints (POST /api/bulk/...): most users one request may cover, and how many
+# users' rows are loaded per set-based query while the NDJSON response streams
+BULK_MAX_USERS = int(os.environ.get("BULK_MAX_USERS", "500"))
+BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", "100"))
+
+# JSON encoder for API responses: "auto" (orjson when installed), "orjson" or "json"
+API_JSON_ENCODER = os.environ.get("API_JSON_ENCODER", "auto").lower()
+# Serialized leaderboard responses are reused for this long (0 disables); a changed scrape clears them
+LEADERBOARD_CACHE_SECONDS = int(os.environ.get("LEADERBOARD_CACHE_SECONDS", "60"))
+
 # --- Form Field Names ---
 PRN_FIELD_NAME = "username"
 DAY_FIELD_NAME = "dd"
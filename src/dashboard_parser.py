@@ -0,0 +1,404 @@
+# dashboard_parser.py
+"""
+Parsing of the student dashboard page returned after login.
+The attendance gauge (#gaugeTypeMulti) and the CIE bar chart (#stackedBarChart_1)
+are both billboard.js configs embedded in <script> tags.
+"""
+import hashlib
+import html
+import json
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from src import scrape_metrics
+
+
+# Lazy "anything up to X" scans are tempered so they can't run past the start of the next block
+# of the same kind. An unterminated block then fails after scanning up to its neighbour instead of
+# to the end of the script, which kept the old [\s\S]*? patterns quadratic on malformed pages.
+def _until_next(opening):
+    return r"(?:(?!" + opening + r")[\s\S])*?"
+
+
+# --- Attendance gauge patterns ---
+ATTENDANCE_DATA_BLOCK_RE = re.compile(
+    r"data\s*:\s*(\{" + _until_next(r"data\s*:") + r"type\s*:\s*\"gauge\"" + _until_next(r"data\s*:") + r"\})"
+)
+ATTENDANCE_COLUMNS_RE = re.compile(r"columns\s*:\s*(\[" + _until_next(r"columns\s*:") + r"\])\s*,\s*type\s*:\s*\"gauge\"")
+ATTENDANCE_PAIR_RE = re.compile(r"\[\s*['\"]([^'\"]+)['\"]\s*,\s*(\d+)\s*\]")
+
+# --- CIE bar chart patterns ---
+CIE_CHART_CONFIG_RE = re.compile(
+    r"bb\.generate\s*\(\s*(\{" + _until_next(r"bb\.generate") + r"bindto\s*:\s*[\"']#stackedBarChart_1[\"']"
+    + _until_next(r"bb\.generate") + r"\}\s*)\s*\)\s*;"
+)
+CIE_CATEGORIES_RE = re.compile(r"categories\s*:\s*(\[[\s\S]*?\])", re.DOTALL)
+CIE_CATEGORY_NAME_RE = re.compile(r"['\"]([^'\"]+)['\"]")
+CIE_COLUMNS_RE = re.compile(r"columns\s*:\s*(\[" + _until_next(r"columns\s*:") + r"\])\s*,\s*type\s*:\s*\"bar\"")
+CIE_SERIES_RE = re.compile(r"\[\s*['\"]([^'\"]+)['\"]\s*([^\]]*)?\s*\]")
+
+# --- Per-subject attendance detail pages (the portal spells it "attendencelist") ---
+ATTENDANCE_LINK_RE = re.compile(r"<a\s[^>]*?href\s*=\s*[\"']([^\"']*attend[a-z]*list[^\"']*)[\"'][^>]*>(.*?)</a>", re.IGNORECASE | re.DOTALL)
+ATTENDANCE_STATUS_CELL_RE = re.compile(r"<td[^>]*>\s*(P|A|Present|Absent)\s*</td>", re.IGNORECASE)
+ATTENDANCE_SUMMARY_RE = {
+    "present": re.compile(r"(?:Present|Attended)\s*(?:Lectures|Classes)?\s*[:\-]?(?:\s*<[^>]+>)*\s*(\d+)", re.IGNORECASE),
+    "total": re.compile(r"(?:Total|Conducted)\s*(?:Lectures|Classes)?\s*[:\-]?(?:\s*<[^>]+>)*\s*(\d+)", re.IGNORECASE),
+}
+TAG_RE = re.compile(r"<[^>]+>")
+
+# --- Fast-path anchors, matched directly against the raw response bytes ---
+FAST_GAUGE_ANCHOR_RE = re.compile(rb"type\s*:\s*\"gauge\"")
+FAST_CIE_ANCHOR_RE = re.compile(rb"bindto\s*:\s*[\"']#stackedBarChart_1[\"']")
+SCRIPT_OPEN = b"<script"
+SCRIPT_CLOSE = b"</script"
+
+# How often each chart was extracted by the fast path, the BeautifulSoup fallback, or not at all.
+# A rising fallback count means the portal markup drifted away from the fast-path anchors.
+_path_counts = Counter()
+_path_counts_lock = threading.Lock()
+
+
+@dataclass
+class DashboardData:
+    """Everything we extract from one dashboard page."""
+    attendance: Optional[List[Dict]] = None
+    cie_marks: Optional[Dict[str, Dict]] = None
+
+    def fingerprint(self) -> str:
+        """Stable sha256 of the parsed payload, used to skip DB writes when nothing changed."""
+        return payload_fingerprint(self.attendance, self.cie_marks)
+
+
+def payload_fingerprint(attendance, cie_marks) -> str:
+    canonical = json.dumps({"attendance": attendance, "cie_marks": cie_marks},
+                           sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_attendance_script(script_content: str) -> bool:
+    return "gaugeTypeMulti" in script_content and "type: \"gauge\"" in script_content and "columns:" in script_content
+
+
+def is_cie_script(script_content: str) -> bool:
+    return "stackedBarChart_1" in script_content and "type: \"bar\"" in script_content and "categories:" in script_content
+
+
+def parse_attendance_script(script_content: str) -> Optional[List[Dict]]:
+    """
+    Extracts [{"subject": ..., "percentage": ...}] from the gauge chart script.
+    Returns None if the script does not contain a usable columns array.
+    """
+    data_block_match = ATTENDANCE_DATA_BLOCK_RE.search(script_content)
+    if not data_block_match:
+        return None
+    columns_match = ATTENDANCE_COLUMNS_RE.search(data_block_match.group(1))
+    if not columns_match:
+        return None
+    subject_value_pairs = ATTENDANCE_PAIR_RE.findall(columns_match.group(1).strip())
+    if not subject_value_pairs:
+        return None
+    return [{"subject": subject.strip(), "percentage": int(value)} for subject, value in subject_value_pairs]
+
+
+def _parse_mark_value(mark_val_raw):
+    mark_val = mark_val_raw.strip()
+    if mark_val.lower() == 'null': return None
+    if mark_val.startswith('"') and mark_val.endswith('"'):
+        val_inside_quotes = mark_val[1:-1]
+        if val_inside_quotes.lower() == 'null' or not val_inside_quotes: return None
+        try: return float(val_inside_quotes)
+        except ValueError: return val_inside_quotes
+    if not mark_val: return None
+    try: return float(mark_val)
+    except ValueError: return mark_val
+
+
+def parse_cie_script(script_content: str) -> Optional[Dict[str, Dict]]:
+    """
+    Extracts {subject_code: {exam_type: marks}} from the stacked bar chart script.
+    Returns None if the chart config, its categories, or its columns can't be found.
+    """
+    bb_generate_match = CIE_CHART_CONFIG_RE.search(script_content)
+    if not bb_generate_match:
+        return None
+    chart_config_str = bb_generate_match.group(1)
+    categories_match = CIE_CATEGORIES_RE.search(chart_config_str)
+    if not categories_match:
+        return None
+    subjects = CIE_CATEGORY_NAME_RE.findall(categories_match.group(1))
+    if not subjects:
+        return None
+    columns_data_match = CIE_COLUMNS_RE.search(chart_config_str)
+    if not columns_data_match:
+        return None
+    cie_data = {}
+    all_series_matches = CIE_SERIES_RE.findall(columns_data_match.group(1))
+    for exam_type, marks_values_str in all_series_matches:
+        parsed_marks = []
+        if marks_values_str:
+            parsed_marks = [_parse_mark_value(item) for item in marks_values_str.strip(',').split(',')]
+        for idx, subject_code in enumerate(subjects):
+            if subject_code not in cie_data: cie_data[subject_code] = {}
+            cie_data[subject_code][exam_type] = parsed_marks[idx] if idx < len(parsed_marks) else None
+    print(f"  Successfully parsed CIE marks for {len(subjects)} subjects and {len(all_series_matches)} exam types.")
+    return cie_data
+
+
+def _count_path(chart, path):
+    with _path_counts_lock:
+        _path_counts[f"{chart}.{path}"] += 1
+
+
+def get_parse_path_stats() -> Dict[str, int]:
+    """Returns counters like {"attendance.streamed": 8, "attendance.fast": 2, "cie.fallback": 1, "cie.missing": 0}."""
+    with _path_counts_lock:
+        return dict(_path_counts)
+
+
+def _to_bytes(page):
+    return page.encode("utf-8") if isinstance(page, str) else page
+
+
+def _enclosing_script(raw: bytes, pos: int) -> Optional[str]:
+    """Returns the text of the <script> element containing byte offset pos, or None."""
+    start = raw.rfind(SCRIPT_OPEN, 0, pos)
+    if start == -1 or raw.find(SCRIPT_CLOSE, start, pos) != -1:
+        return None
+    content_start = raw.find(b">", start, pos)
+    end = raw.find(SCRIPT_CLOSE, pos)
+    if content_start == -1 or end == -1:
+        return None
+    return raw[content_start + 1:end].decode("utf-8", errors="replace").strip()
+
+
+def find_attendance_fast(page) -> Optional[List[Dict]]:
+    """Finds the gauge chart script by its anchor in the raw page, without building a DOM."""
+    raw = _to_bytes(page)
+    for anchor in FAST_GAUGE_ANCHOR_RE.finditer(raw):
+        script_content = _enclosing_script(raw, anchor.start())
+        if script_content and is_attendance_script(script_content):
+            attendance = parse_attendance_script(script_content)
+            if attendance is not None:
+                return attendance
+    return None
+
+
+def find_cie_fast(page) -> Optional[Dict[str, Dict]]:
+    """Finds the CIE bar chart script by its bindto anchor in the raw page, without building a DOM."""
+    raw = _to_bytes(page)
+    for anchor in FAST_CIE_ANCHOR_RE.finditer(raw):
+        script_content = _enclosing_script(raw, anchor.start())
+        if script_content and is_cie_script(script_content):
+            cie_marks = parse_cie_script(script_content)
+            if cie_marks is not None:
+                return cie_marks
+    return None
+
+
+class _ChartWatch:
+    """Tracks one chart while the page streams in: its anchor, then the closing </script>."""
+
+    def __init__(self, anchor_re, is_chart_script, parse_script):
+        self.anchor_re = anchor_re
+        self.is_chart_script = is_chart_script
+        self.parse_script = parse_script
+        self.scan_from = 0
+        self.anchor_pos = None
+        self.complete = False
+        self.data = None
+
+    def update(self, buffer):
+        while not self.complete:
+            if self.anchor_pos is None:
+                anchor = self.anchor_re.search(buffer, self.scan_from)
+                if not anchor:
+                    # Keep a small overlap so an anchor split across chunks is still found
+                    self.scan_from = max(0, len(buffer) - 64)
+                    return
+                self.anchor_pos = anchor.start()
+            end = buffer.find(SCRIPT_CLOSE, self.anchor_pos)
+            if end == -1:
+                return
+            script_content = _enclosing_script(bytes(buffer[:end + len(SCRIPT_CLOSE)]), self.anchor_pos)
+            if script_content and self.is_chart_script(script_content):
+                self.complete = True
+                self.data = self.parse_script(script_content)
+            else:
+                self.scan_from = end
+                self.anchor_pos = None
+
+
+class IncrementalDashboardScanner:
+    """
+    Consumes the dashboard response chunk by chunk and parses the attendance gauge and
+    the CIE bar chart scripts as soon as each has fully arrived, so callers can stop
+    reading once done is True; charts_at records how many bytes had arrived by then.
+    on_chart(name, data), if given, is called with each chart's parsed data ("attendance"
+    records or "cie" marks) as soon as it is available.
+    """
+
+    def __init__(self, on_chart=None):
+        self.buffer = bytearray()
+        self.charts_at = None
+        self.on_chart = on_chart
+        self._attendance = _ChartWatch(FAST_GAUGE_ANCHOR_RE, is_attendance_script, parse_attendance_script)
+        self._cie = _ChartWatch(FAST_CIE_ANCHOR_RE, is_cie_script, parse_cie_script)
+
+    @property
+    def done(self):
+        return self._attendance.complete and self._cie.complete
+
+    @property
+    def attendance(self):
+        return self._attendance.data
+
+    @property
+    def cie_marks(self):
+        return self._cie.data
+
+    def feed(self, chunk: bytes) -> bool:
+        """Adds a chunk; returns True once both chart scripts are complete."""
+        if not chunk:
+            return self.done
+        self.buffer += chunk
+        if not self.done:
+            for name, watch in (("attendance", self._attendance), ("cie", self._cie)):
+                if not watch.complete:
+                    watch.update(self.buffer)
+                    if watch.complete and watch.data is not None and self.on_chart is not None:
+                        self.on_chart(name, watch.data)
+            if self.done:
+                self.charts_at = len(self.buffer)
+        return self.done
+
+    def getvalue(self) -> bytes:
+        return bytes(self.buffer)
+
+
+def iter_script_contents(welcome_page_html):
+    """Yields the stripped text of every inline <script> in the page, tokenizing it once."""
+    soup = BeautifulSoup(welcome_page_html, "html.parser", parse_only=SoupStrainer("script"))
+    for script in soup.find_all("script"):
+        if script.string:
+            yield script.string.strip()
+
+
+def parse_dashboard_soup(welcome_page_html, want_attendance=True, want_cie=True) -> DashboardData:
+    """BeautifulSoup path: a single scan over the page's scripts for the requested charts."""
+    result = DashboardData()
+    if not welcome_page_html:
+        return result
+    for script_content in iter_script_contents(welcome_page_html):
+        if want_attendance and result.attendance is None and is_attendance_script(script_content):
+            result.attendance = parse_attendance_script(script_content)
+        if want_cie and result.cie_marks is None and is_cie_script(script_content):
+            result.cie_marks = parse_cie_script(script_content)
+        if (not want_attendance or result.attendance is not None) and (not want_cie or result.cie_marks is not None):
+            break
+    return result
+
+
+def streamed_dashboard(attendance, cie_marks) -> DashboardData:
+    """
+    DashboardData for charts already parsed while the page streamed in (see
+    IncrementalDashboardScanner), so the page isn't searched again.
+    """
+    _count_path("attendance", "streamed")
+    _count_path("cie", "streamed")
+    print("  Successfully parsed attendance data.")
+    return DashboardData(attendance=attendance, cie_marks=cie_marks)
+
+
+def parse_dashboard(welcome_page_html, want_attendance=True, want_cie=True) -> DashboardData:
+    """
+    Extracts attendance and CIE marks from the dashboard (str or raw bytes).
+    Tries the anchored fast path first and only builds a BeautifulSoup tree for
+    charts the fast path could not find. Charts that can't be found are left as None.
+    """
+    result = DashboardData()
+    if not welcome_page_html:
+        return result
+    with scrape_metrics.span("parse.fast") as fast_span:
+        # Encode once for both charts; the span reports bytes, not str characters
+        raw = _to_bytes(welcome_page_html)
+        fast_span.bytes = len(raw)
+        if want_attendance:
+            result.attendance = find_attendance_fast(raw)
+        if want_cie:
+            result.cie_marks = find_cie_fast(raw)
+
+        need_attendance = want_attendance and result.attendance is None
+        need_cie = want_cie and result.cie_marks is None
+        if need_attendance or need_cie:
+            fast_span.outcome = "partial"
+    if need_attendance or need_cie:
+        with scrape_metrics.span("parse.soup") as soup_span:
+            fallback = parse_dashboard_soup(welcome_page_html, need_attendance, need_cie)
+            if need_attendance:
+                result.attendance = fallback.attendance
+            if need_cie:
+                result.cie_marks = fallback.cie_marks
+            if (need_attendance and result.attendance is None) or (need_cie and result.cie_marks is None):
+                soup_span.outcome = "missing"
+
+    if want_attendance:
+        _count_path("attendance", "missing" if result.attendance is None else "fallback" if need_attendance else "fast")
+        if result.attendance is None:
+            print("\nCould not find or parse the specific attendance chart data.")
+        else:
+            print("  Successfully parsed attendance data.")
+    if want_cie:
+        _count_path("cie", "missing" if result.cie_marks is None else "fallback" if need_cie else "fast")
+        if result.cie_marks is None:
+            print("\nCould not find or parse the CIE marks data from any script tag.")
+    if (need_attendance and result.attendance is not None) or (need_cie and result.cie_marks is not None):
+        print("  Note: dashboard parsed via the BeautifulSoup fallback; portal markup may have changed.")
+    return result
+
+
+def find_attendance_links(welcome_page_html, subject_codes) -> Dict[str, str]:
+    """
+    Maps subject code -> href of its attendance detail page, for the codes in subject_codes.
+    A link belongs to a subject when the code appears in its href or its link text.
+    """
+    if not welcome_page_html or not subject_codes:
+        return {}
+    if isinstance(welcome_page_html, bytes):
+        welcome_page_html = welcome_page_html.decode("utf-8", errors="replace")
+    links = {}
+    for match in ATTENDANCE_LINK_RE.finditer(welcome_page_html):
+        href = html.unescape(match.group(1))
+        text = TAG_RE.sub(" ", match.group(2))
+        for code in subject_codes:
+            if code not in links and (code in href or code in text):
+                links[code] = href
+                break
+    return links
+
+
+def parse_attendance_detail(detail_html) -> Optional[Dict[str, int]]:
+    """
+    Attended/conducted lecture counts from one subject's attendance page.
+    Counts the per-lecture P/A cells; falls back to the page's summary labels.
+    Returns {"present", "absent", "total"} or None.
+    """
+    if not detail_html:
+        return None
+    statuses = [s[0].upper() for s in ATTENDANCE_STATUS_CELL_RE.findall(detail_html)]
+    if statuses:
+        present = statuses.count("P")
+        return {"present": present, "absent": len(statuses) - present, "total": len(statuses)}
+
+    present_match = ATTENDANCE_SUMMARY_RE["present"].search(detail_html)
+    total_match = ATTENDANCE_SUMMARY_RE["total"].search(detail_html)
+    if not present_match or not total_match:
+        return None
+    present, total = int(present_match.group(1)), int(total_match.group(1))
+    if present > total:
+        return None
+    return {"present": present, "absent": total - present, "total": total}
@@ -0,0 +1,351 @@
+# db_queries.py
+"""
+Queries shared by the Postgres backends (db_utils_neon, db_utils_prisma).
+Both databases use the same schema, so the SQL and row shaping live here once;
+a backend only supplies its connection factory and the name used in messages,
+and exposes the bound methods under its usual *_pg names.
+"""
+from datetime import datetime
+
+import psycopg2
+import pytz
+
+
+def as_utc_timestamp(scraped_timestamp):
+    """Returns scraped_timestamp as a timezone-aware datetime (now, if it isn't a datetime)."""
+    if isinstance(scraped_timestamp, datetime):
+        if scraped_timestamp.tzinfo is None:
+            return scraped_timestamp.replace(tzinfo=pytz.UTC)
+        return scraped_timestamp
+    return datetime.now(pytz.UTC)
+
+
+def normalize_first_name(first_name):
+    """Usernames are stored lower-cased and stripped."""
+    return first_name.lower().strip()
+
+
+def replace_cie_marks(cursor, user_id, cie_marks_data, timestamp_with_tz):
+    """Deletes a user's marks and inserts the new ones. Returns the number of rows inserted."""
+    # Delete all existing marks for this user
+    cursor.execute("DELETE FROM cie_marks WHERE user_id = %s", (user_id,))
+
+    insert_sql = """
+        INSERT INTO cie_marks (user_id, subject_code, exam_type, marks, scraped_at)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    records_to_insert = []
+    for subject_code, marks_dict in cie_marks_data.items():
+        for exam_type, mark_value in marks_dict.items():
+            # Only insert if mark is a valid number
+            if isinstance(mark_value, (int, float)):
+                records_to_insert.append((user_id, subject_code, exam_type, mark_value, timestamp_with_tz))
+
+    if records_to_insert:
+        cursor.executemany(insert_sql, records_to_insert)
+    return len(records_to_insert)
+
+
+def replace_attendance(cursor, user_id, attendance_data, timestamp_with_tz):
+    """Deletes a user's attendance and inserts the new records. Returns the number of rows inserted."""
+    cursor.execute("DELETE FROM attendance WHERE user_id = %s", (user_id,))
+
+    insert_sql = """
+        INSERT INTO attendance (user_id, subject_code, percentage, present, absent, total, scraped_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """
+    records_to_insert = [
+        (user_id, record["subject"], record.get("percentage"), record.get("present"),
+         record.get("absent"), record.get("total"), timestamp_with_tz)
+        for record in attendance_data if record.get("subject")
+    ]
+    if records_to_insert:
+        cursor.executemany(insert_sql, records_to_insert)
+    return len(records_to_insert)
+
+
+def _attendance_record(record):
+    return {
+        "subject": record["subject_code"],
+        "percentage": float(record["percentage"]) if record["percentage"] is not None else None,
+        "present": record["present"],
+        "absent": record["absent"],
+        "total": record["total"]
+    }
+
+
+def _semester_record(record):
+    return {
+        "semester_number": record["semester_number"],
+        "semester_name": record["semester_name"],
+        "sgpa": float(record["sgpa"]) if record["sgpa"] else None,
+        "total_credits": record["total_credits"],
+        "academic_year": record["academic_year"],
+        "created_at": record["created_at"].isoformat() if record["created_at"] else None
+    }
+
+
+class PostgresQueries:
+    """
+    The scrape-state, attendance and bulk queries over connections from get_connection()
+    (a RealDictCursor connection, or None when it can't connect). Each call opens and
+    closes its own connection, like the rest of the db_utils functions.
+    """
+
+    def __init__(self, get_connection, db_name):
+        self.get_connection = get_connection
+        self.db_name = db_name
+
+    def update_student_marks(self, user_id, cie_marks_data, scraped_timestamp):
+        """
+        Deletes old marks and inserts the latest scraped marks for a user.
+        This is an 'upsert' (update/insert) operation.
+        """
+        if not cie_marks_data:
+            print("No CIE marks data provided to update in DB.")
+            return False
+
+        conn = self.get_connection()
+        if not conn: return False
+
+        cursor = conn.cursor()
+        try:
+            inserted = replace_cie_marks(cursor, user_id, cie_marks_data, as_utc_timestamp(scraped_timestamp))
+            if inserted:
+                print(f"Successfully updated {inserted} mark entries for user_id {user_id}.")
+
+            conn.commit()
+            return True
+        except psycopg2.Error as e:
+            print(f"Database error during marks update for user_id {user_id}: {e}")
+            conn.rollback()
+            return False
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+
+    def save_scrape_if_changed(self, user_id, cie_marks_data, payload_hash, scraped_timestamp, attendance_data=None):
+        """
+        Writes the scraped marks and attendance only if payload_hash differs from the last stored one.
+        An unchanged payload just bumps scrape_state.last_checked_at (a single-row UPDATE).
+        A part that failed to parse (None/empty) keeps its previously stored rows; with neither
+        part, only scrape_state is recorded, so the user counts as checked.
+        Returns "unchanged", "updated", or None on failure.
+        """
+        conn = self.get_connection()
+        if not conn: return None
+
+        cursor = conn.cursor()
+        timestamp_with_tz = as_utc_timestamp(scraped_timestamp)
+        try:
+            if not cie_marks_data and not attendance_data:
+                # Keeps an existing row's fingerprint (stored data is untouched); a first check stores this one
+                cursor.execute("""
+                    INSERT INTO scrape_state (user_id, payload_hash, last_checked_at, last_changed_at)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (user_id) DO UPDATE SET last_checked_at = EXCLUDED.last_checked_at
+                """, (user_id, payload_hash, timestamp_with_tz, timestamp_with_tz))
+                conn.commit()
+                print(f"No CIE marks or attendance scraped for user_id {user_id}; recorded the check only.")
+                return "unchanged"
+
+            cursor.execute(
+                "UPDATE scrape_state SET last_checked_at = %s WHERE user_id = %s AND payload_hash = %s",
+                (timestamp_with_tz, user_id, payload_hash)
+            )
+            if cursor.rowcount:
+                conn.commit()
+                print(f"Marks unchanged for user_id {user_id}; skipped rewrite.")
+                return "unchanged"
+
+            inserted = replace_cie_marks(cursor, user_id, cie_marks_data, timestamp_with_tz) if cie_marks_data else 0
+            attendance_inserted = replace_attendance(cursor, user_id, attendance_data, timestamp_with_tz) if attendance_data else 0
+            cursor.execute("""
+                INSERT INTO scrape_state (user_id, payload_hash, last_checked_at, last_changed_at)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    payload_hash = EXCLUDED.payload_hash,
+                    last_checked_at = EXCLUDED.last_checked_at,
+                    last_changed_at = EXCLUDED.last_changed_at
+            """, (user_id, payload_hash, timestamp_with_tz, timestamp_with_tz))
+            conn.commit()
+            print(f"Successfully updated {inserted} mark entries and {attendance_inserted} attendance records for user_id {user_id}.")
+            return "updated"
+        except psycopg2.Error as e:
+            print(f"Database error during marks update for user_id {user_id}: {e}")
+            conn.rollback()
+            return None
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+
+    def get_user_attendance(self, user_id):
+        """Returns the stored attendance records for a user, in the order they were scraped."""
+        conn = self.get_connection()
+        if not conn: return []
+
+        cursor = conn.cursor()
+        sql = '''
+            SELECT subject_code, percentage, present, absent, total
+            FROM attendance
+            WHERE user_id = %s
+            ORDER BY id
+        '''
+        try:
+            cursor.execute(sql, (user_id,))
+            return [_attendance_record(record) for record in cursor.fetchall()]
+        except psycopg2.Error as e:
+            print(f"Error fetching attendance: {e}")
+            return []
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+
+    def get_scrape_state(self, user_id):
+        """Returns {"payload_hash", "last_checked_at", "last_changed_at"} for a user, or None if never scraped."""
+        conn = self.get_connection()
+        if not conn: return None
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT payload_hash, last_checked_at, last_changed_at FROM scrape_state WHERE user_id = %s",
+                (user_id,)
+            )
+            state = cursor.fetchone()
+            return dict(state) if state else None
+        except psycopg2.Error as e:
+            print(f"Error fetching scrape state: {e}")
+            return None
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+
+    def get_data_version(self, user_id):
+        """
+        Cheap version lookup for conditional GETs: one round trip, no marks rows loaded.
+        Returns {"marks_scraped_at", "last_changed_at", "last_checked_at", "semester_count",
+        "semester_updated_at"} (timestamps are None when nothing is stored), or None on failure.
+        """
+        conn = self.get_connection()
+        if not conn: return None
+
+        cursor = conn.cursor()
+        sql = '''
+            SELECT
+                (SELECT MAX(scraped_at) FROM cie_marks WHERE user_id = %(user_id)s) AS marks_scraped_at,
+                ss.last_changed_at,
+                ss.last_checked_at,
+                (SELECT COUNT(*) FROM semester_records WHERE user_id = %(user_id)s) AS semester_count,
+                (SELECT MAX(created_at) FROM semester_records WHERE user_id = %(user_id)s) AS semester_updated_at
+            FROM (SELECT 1) AS one
+            LEFT JOIN scrape_state ss ON ss.user_id = %(user_id)s
+        '''
+        try:
+            cursor.execute(sql, {"user_id": user_id})
+            return dict(cursor.fetchone())
+        except psycopg2.Error as e:
+            print(f"Error fetching data version: {e}")
+            return None
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+
+    def get_users_bulk(self, first_names=None, prn_prefix=None, limit=None):
+        """
+        Looks up many users in one query: those named in first_names and/or whose PRN starts
+        with prn_prefix (a cohort), ordered by username. Records are shaped like
+        get_user_from_db_pg's plus "username". Returns None if the query fails.
+        """
+        conn = self.get_connection()
+        if not conn: return None
+        cursor = conn.cursor()
+        conditions, params = [], []
+        if first_names is not None:
+            conditions.append("first_name = ANY(%s)")
+            params.append([normalize_first_name(name) for name in first_names])
+        if prn_prefix:
+            conditions.append("prn LIKE %s")
+            params.append(prn_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        sql = f'''
+            SELECT id, first_name, full_name, prn, dob_day, dob_month, dob_year
+            FROM users
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            ORDER BY first_name
+            LIMIT %s
+        '''
+        try:
+            cursor.execute(sql, (*params, limit))
+            return [
+                {
+                    "id": user_data["id"],
+                    "username": user_data["first_name"],
+                    "full_name": user_data["full_name"],
+                    "prn": user_data["prn"],
+                    "dob_day": user_data["dob_day"],
+                    "dob_month": user_data["dob_month"],
+                    "dob_year": user_data["dob_year"]
+                }
+                for user_data in cursor.fetchall()
+            ]
+        except psycopg2.Error as e:
+            print(f"Error fetching users in bulk from {self.db_name}: {e}")
+            return None
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
+
+    def get_bulk_student_data(self, user_ids, with_semesters=False, with_attendance=False):
+        """
+        Loads CIE marks (and optionally semester records and attendance) for many users over one
+        connection, one query per table. Returns {user_id: {"cie_marks": {...}, "semester_records": [...],
+        "attendance": [...]}} with the same per-user shapes as the single-user getters, or None on failure.
+        """
+        conn = self.get_connection()
+        if not conn: return None
+        user_ids = list(user_ids)
+        data = {user_id: {"cie_marks": {}} for user_id in user_ids}
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT user_id, subject_code, exam_type, marks
+                FROM cie_marks
+                WHERE user_id = ANY(%s)
+                ORDER BY user_id, subject_code, exam_type
+            ''', (user_ids,))
+            for record in cursor.fetchall():
+                marks = record["marks"]
+                data[record["user_id"]]["cie_marks"].setdefault(record["subject_code"], {})[record["exam_type"]] = (
+                    float(marks) if marks else None
+                )
+
+            if with_semesters:
+                for user_data in data.values():
+                    user_data["semester_records"] = []
+                cursor.execute('''
+                    SELECT user_id, semester_number, semester_name, sgpa, total_credits, academic_year, created_at
+                    FROM semester_records
+                    WHERE user_id = ANY(%s)
+                    ORDER BY user_id, semester_number ASC
+                ''', (user_ids,))
+                for record in cursor.fetchall():
+                    data[record["user_id"]]["semester_records"].append(_semester_record(record))
+
+            if with_attendance:
+                for user_data in data.values():
+                    user_data["attendance"] = []
+                cursor.execute('''
+                    SELECT user_id, subject_code, percentage, present, absent, total
+                    FROM attendance
+                    WHERE user_id = ANY(%s)
+                    ORDER BY user_id, id
+                ''', (user_ids,))
+                for record in cursor.fetchall():
+                    data[record["user_id"]]["attendance"].append(_attendance_record(record))
+            return data
+        except psycopg2.Error as e:
+            print(f"Error fetching bulk student data: {e}")
+            return None
+        finally:
+            if cursor: cursor.close()
+            if conn: conn.close()
@@ -54,6 +54,13 @@ def get_user_from_db_pg(first_name_query):
     # Fallback to Prisma
     return db_utils_prisma.get_user_from_db_pg(first_name_query)
 
+def invalidate_user_cache(*first_names):
+    """User records are cached in front of Neon only"""
+    db_utils_neon.invalidate_user_cache(*first_names)
+
+def get_user_cache_stats():
+    return db_utils_neon.get_user_cache_stats()
+
 def update_student_marks_in_db_pg(user_id, cie_marks_data, scraped_timestamp):
     """Updates marks in both databases"""
     # Update in Neon
@@ -68,6 +75,19 @@ def update_student_marks_in_db_pg(user_id, cie_marks_data, scraped_timestamp):
     
     return neon_success or prisma_success
 
+def save_scrape_if_changed_pg(user_id, cie_marks_data, payload_hash, scraped_timestamp, attendance_data=None):
+    """Writes marks and attendance to both databases, skipping each one whose stored fingerprint matches"""
+    neon_status = db_utils_neon.save_scrape_if_changed_pg(
+        user_id, cie_marks_data, payload_hash, scraped_timestamp, attendance_data
+    )
+    prisma_status = db_utils_prisma.save_scrape_if_changed_pg(
+        user_id, cie_marks_data, payload_hash, scraped_timestamp, attendance_data
+    )
+    
+    if "updated" in (neon_status, prisma_status):
+        return "updated"
+    return neon_status or prisma_status
+
 def get_subject_leaderboard_pg(subject_code, exam_type, limit=3):
     """Gets leaderboard from Neon (primary database)"""
     return db_utils_neon.get_subject_leaderboard_pg(subject_code, exam_type, limit)
@@ -97,3 +117,23 @@ def get_user_semester_records_pg(user_id):
 def get_user_current_cie_marks_pg(user_id):
     """Gets CIE marks from Neon (primary database)"""
     return db_utils_neon.get_user_current_cie_marks_pg(user_id)
+
+def get_user_attendance_pg(user_id):
+    """Gets stored attendance from Neon (primary database)"""
+    return db_utils_neon.get_user_attendance_pg(user_id)
+
+def get_scrape_state_pg(user_id):
+    """Gets scrape freshness from Neon (primary database)"""
+    return db_utils_neon.get_scrape_state_pg(user_id)
+
+def get_data_version_pg(user_id):
+    """Gets the data version for conditional GETs from Neon (primary database)"""
+    return db_utils_neon.get_data_version_pg(user_id)
+
+def get_users_bulk_pg(first_names=None, prn_prefix=None, limit=None):
+    """Looks up many users at once in Neon (primary database)"""
+    return db_utils_neon.get_users_bulk_pg(first_names, prn_prefix, limit)
+
+def get_bulk_student_data_pg(user_ids, with_semesters=False, with_attendance=False):
+    """Loads marks (and semesters/attendance) for many users from Neon (primary database)"""
+    return db_utils_neon.get_bulk_student_data_pg(user_ids, with_semesters, with_attendance)
@@ -5,12 +5,15 @@ Using Neon PostgreSQL with MCP server connection
 """
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from datetime import datetime
-import pytz
 import os
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, List, Optional, Any
 import json
 
+from src import db_queries
+
 # Try to import streamlit for secrets support
 try:
     import streamlit as st
@@ -49,6 +52,88 @@ MCP_SERVER_CONFIG = {
 
 DB_NAME_FOR_MESSAGES = "Neon PostgreSQL (Cloud Database)"
 
+# In-process cache of user records in front of get_user_from_db_pg (0 disables it)
+USER_CACHE_TTL_SECONDS = float(get_config_value("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_MAX_ENTRIES = int(get_config_value("USER_CACHE_MAX_ENTRIES", "2048"))
+
+class UserRecordCache:
+    """
+    Bounded LRU + TTL cache of user records keyed by normalized first_name.
+    Writes in this process invalidate explicitly; the TTL bounds staleness from
+    writes made by other processes (scripts, the Streamlit app).
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key):
+        """Returns a copy of the cached record, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self._counts["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counts["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counts["hits"] += 1
+            return dict(entry[1])
+
+    def put(self, key, record):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(record))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counts["evictions"] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._counts["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                **self._counts,
+                "hit_rate": round(self._counts["hits"] / lookups, 4) if lookups else 0.0
+            }
+
+user_cache = UserRecordCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+
+def _user_cache_key(first_name):
+    return db_queries.normalize_first_name(first_name)
+
+def invalidate_user_cache(*first_names):
+    """Drops cached records for these usernames. Call after any write to the users table."""
+    for first_name in first_names:
+        if first_name:
+            user_cache.invalidate(_user_cache_key(first_name))
+
+def get_user_cache_stats():
+    return user_cache.get_stats()
+
 def get_db_connection():
     """Establishes a connection to the Neon PostgreSQL database."""
     try:
@@ -106,6 +191,35 @@ def create_db_and_table_pg():
         ''')
         print("Table 'cie_marks' for leaderboards checked/created successfully.")
 
+        # Create scrape_state table (fingerprint of the last scraped payload per user)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scrape_state (
+                user_id INTEGER PRIMARY KEY,
+                payload_hash TEXT NOT NULL,
+                last_checked_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                last_changed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        ''')
+        print("Table 'scrape_state' for change detection checked/created successfully.")
+
+        # Create attendance table (latest scraped attendance per subject)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS attendance (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                subject_code TEXT NOT NULL,
+                percentage REAL,
+                present INTEGER,
+                absent INTEGER,
+                total INTEGER,
+                scraped_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                UNIQUE (user_id, subject_code),
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        ''')
+        print("Table 'attendance' checked/created successfully.")
+
         # Create semester_records table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS semester_records (
@@ -149,6 +263,7 @@ def add_user_to_db_pg(first_name, full_name, prn, dob_day, dob_month, dob_year):
         cursor.execute(sql, (first_name.lower().strip(), full_name.strip(), prn.strip(), 
                               dob_day.strip(), dob_month.strip(), dob_year.strip()))
         conn.commit()
+        invalidate_user_cache(first_name)
         print(f"User '{full_name}' added/updated in the {DB_NAME_FOR_MESSAGES} database.")
         return True
     except psycopg2.IntegrityError as e:
@@ -166,8 +281,12 @@ def add_user_to_db_pg(first_name, full_name, prn, dob_day, dob_month, dob_year):
 def get_user_from_db_pg(first_name_query):
     """
     Retrieves user details from the Neon PostgreSQL database by first name (case-insensitive).
-    Also returns the user's primary key 'id'.
+    Also returns the user's primary key 'id'. Served from user_cache when possible.
     """
+    cache_key = _user_cache_key(first_name_query)
+    cached = user_cache.get(cache_key)
+    if cached is not None:
+        return cached
     conn = get_db_connection()
     if not conn: return None
     cursor = conn.cursor()
@@ -177,10 +296,10 @@ def get_user_from_db_pg(first_name_query):
         WHERE first_name = %s
     '''
     try:
-        cursor.execute(sql, (first_name_query.lower().strip(),))
+        cursor.execute(sql, (cache_key,))
         user_data = cursor.fetchone()
         if user_data:
-            return {
+            user_record = {
                 "id": user_data["id"],
                 "full_name": user_data["full_name"],
                 "prn": user_data["prn"],
@@ -188,6 +307,8 @@ def get_user_from_db_pg(first_name_query):
                 "dob_month": user_data["dob_month"],
                 "dob_year": user_data["dob_year"]
             }
+            user_cache.put(cache_key, user_record)
+            return user_record
         return None
     except psycopg2.Error as e:
         print(f"Error fetching user from {DB_NAME_FOR_MESSAGES}: {e}")
@@ -196,58 +317,15 @@ def get_user_from_db_pg(first_name_query):
         if cursor: cursor.close()
         if conn: conn.close()
 
-def update_student_marks_in_db_pg(user_id, cie_marks_data, scraped_timestamp):
-    """
-    Deletes old marks and inserts the latest scraped marks for a user.
-    This is an 'upsert' (update/insert) operation.
-    """
-    if not cie_marks_data:
-        print("No CIE marks data provided to update in DB.")
-        return False
-
-    conn = get_db_connection()
-    if not conn: return False
-    
-    cursor = conn.cursor()
-    try:
-        # Delete all existing marks for this user
-        delete_sql = "DELETE FROM cie_marks WHERE user_id = %s"
-        cursor.execute(delete_sql, (user_id,))
-        
-        # Prepare and insert the new data
-        insert_sql = """
-            INSERT INTO cie_marks (user_id, subject_code, exam_type, marks, scraped_at)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        records_to_insert = []
-        # Convert timestamp to datetime with timezone
-        if isinstance(scraped_timestamp, datetime):
-            if scraped_timestamp.tzinfo is None:
-                timestamp_with_tz = scraped_timestamp.replace(tzinfo=pytz.UTC)
-            else:
-                timestamp_with_tz = scraped_timestamp
-        else:
-            timestamp_with_tz = datetime.now(pytz.UTC)
-        
-        for subject_code, marks_dict in cie_marks_data.items():
-            for exam_type, mark_value in marks_dict.items():
-                # Only insert if mark is a valid number
-                if isinstance(mark_value, (int, float)):
-                    records_to_insert.append((user_id, subject_code, exam_type, mark_value, timestamp_with_tz))
-
-        if records_to_insert:
-            cursor.executemany(insert_sql, records_to_insert)
-            print(f"Successfully updated {len(records_to_insert)} mark entries for user_id {user_id}.")
-        
-        conn.commit()
-        return True
-    except psycopg2.Error as e:
-        print(f"Database error during marks update for user_id {user_id}: {e}")
-        conn.rollback()
-        return False
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+# Scrape state, attendance and bulk reads share their SQL with the other Postgres backend
+_queries = db_queries.PostgresQueries(get_db_connection, DB_NAME_FOR_MESSAGES)
+update_student_marks_in_db_pg = _queries.update_student_marks
+save_scrape_if_changed_pg = _queries.save_scrape_if_changed
+get_user_attendance_pg = _queries.get_user_attendance
+get_scrape_state_pg = _queries.get_scrape_state
+get_data_version_pg = _queries.get_data_version
+get_users_bulk_pg = _queries.get_users_bulk
+get_bulk_student_data_pg = _queries.get_bulk_student_data
 
 def get_subject_leaderboard_pg(subject_code, exam_type, limit=3):
     """
@@ -406,4 +484,4 @@ def get_user_current_cie_marks_pg(user_id):
         return {}
     finally:
         if cursor: cursor.close()
-        if conn: conn.close()
\ No newline at end of file
+        if conn: conn.close()
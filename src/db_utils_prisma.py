@@ -4,11 +4,11 @@ Alternative to db_utils_neon.py for Prisma Postgres
 """
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from datetime import datetime
-import pytz
 import os
 from typing import Dict, List, Optional
 
+from src import db_queries
+
 # Try to import streamlit for secrets support
 try:
     import streamlit as st
@@ -83,6 +83,35 @@ def create_db_and_table_pg():
         ''')
         print("Table 'cie_marks' for leaderboards checked/created successfully.")
 
+        # Create scrape_state table (fingerprint of the last scraped payload per user)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scrape_state (
+                user_id INTEGER PRIMARY KEY,
+                payload_hash TEXT NOT NULL,
+                last_checked_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                last_changed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        ''')
+        print("Table 'scrape_state' for change detection checked/created successfully.")
+
+        # Create attendance table (latest scraped attendance per subject)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS attendance (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                subject_code TEXT NOT NULL,
+                percentage REAL,
+                present INTEGER,
+                absent INTEGER,
+                total INTEGER,
+                scraped_at TIMESTAMP WITH TIME ZONE NOT NULL,
+                UNIQUE (user_id, subject_code),
+                FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+        ''')
+        print("Table 'attendance' checked/created successfully.")
+
         # Create semester_records table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS semester_records (
@@ -170,54 +199,15 @@ def get_user_from_db_pg(first_name_query):
         if cursor: cursor.close()
         if conn: conn.close()
 
-def update_student_marks_in_db_pg(user_id, cie_marks_data, scraped_timestamp):
-    """Updates CIE marks for a user in Prisma Postgres."""
-    if not cie_marks_data:
-        print("No CIE marks data provided to update in DB.")
-        return False
-
-    conn = get_db_connection()
-    if not conn: return False
-    
-    cursor = conn.cursor()
-    try:
-        # Delete all existing marks for this user
-        delete_sql = "DELETE FROM cie_marks WHERE user_id = %s"
-        cursor.execute(delete_sql, (user_id,))
-        
-        # Prepare and insert the new data
-        insert_sql = """
-            INSERT INTO cie_marks (user_id, subject_code, exam_type, marks, scraped_at)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        records_to_insert = []
-        
-        if isinstance(scraped_timestamp, datetime):
-            if scraped_timestamp.tzinfo is None:
-                timestamp_with_tz = scraped_timestamp.replace(tzinfo=pytz.UTC)
-            else:
-                timestamp_with_tz = scraped_timestamp
-        else:
-            timestamp_with_tz = datetime.now(pytz.UTC)
-        
-        for subject_code, marks_dict in cie_marks_data.items():
-            for exam_type, mark_value in marks_dict.items():
-                if isinstance(mark_value, (int, float)):
-                    records_to_insert.append((user_id, subject_code, exam_type, mark_value, timestamp_with_tz))
-
-        if records_to_insert:
-            cursor.executemany(insert_sql, records_to_insert)
-            print(f"Successfully updated {len(records_to_insert)} mark entries for user_id {user_id}.")
-        
-        conn.commit()
-        return True
-    except psycopg2.Error as e:
-        print(f"Database error during marks update for user_id {user_id}: {e}")
-        conn.rollback()
-        return False
-    finally:
-        if cursor: cursor.close()
-        if conn: conn.close()
+# Scrape state, attendance and bulk reads share their SQL with the other Postgres backend
+_queries = db_queries.PostgresQueries(get_db_connection, DB_NAME_FOR_MESSAGES)
+update_student_marks_in_db_pg = _queries.update_student_marks
+save_scrape_if_changed_pg = _queries.save_scrape_if_changed
+get_user_attendance_pg = _queries.get_user_attendance
+get_scrape_state_pg = _queries.get_scrape_state
+get_data_version_pg = _queries.get_data_version
+get_users_bulk_pg = _queries.get_users_bulk
+get_bulk_student_data_pg = _queries.get_bulk_student_data
 
 def get_subject_leaderboard_pg(subject_code, exam_type, limit=3):
     """Retrieves the top students for a given subject and exam type."""
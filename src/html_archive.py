@@ -0,0 +1,215 @@
+# html_archive.py
+"""
+Optional archive of every dashboard page fetched from the portal.
+
+Pages are stored compressed (zstd when the 'zstandard' package is installed, gzip otherwise)
+under their sha256, so identical pages are kept once. A small SQLite index records which
+student's page was fetched when. With the raw pages on disk, a markup change on the portal
+no longer loses data: fix the extractors, then re-parse the archive offline
+(docs/scripts/reparse_archive.py) and backfill the database.
+
+Enable by setting PORTAL_ARCHIVE_DIR. Entries older than PORTAL_ARCHIVE_RETENTION_DAYS are
+pruned along with blobs nothing references any more, on a background thread at most hourly.
+"""
+import gzip
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from src import config
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+GZIP_SUFFIX = ".html.gz"
+ZSTD_SUFFIX = ".html.zst"
+# add() starts a background prune at most this often
+AUTO_PRUNE_INTERVAL_SECONDS = 3600
+
+
+def _compress(data):
+    if HAS_ZSTD:
+        return zstandard.ZstdCompressor(level=10).compress(data), ZSTD_SUFFIX
+    return gzip.compress(data, compresslevel=6), GZIP_SUFFIX
+
+
+def _decompress(data, suffix):
+    if suffix == ZSTD_SUFFIX:
+        if not HAS_ZSTD:
+            raise RuntimeError("Archive blob is zstd-compressed but the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class HtmlArchive:
+    def __init__(self, root, retention_days):
+        self.root = root
+        self.retention_days = retention_days
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._local = threading.local()
+        self._prune_lock = threading.Lock()
+        self._last_prune = None
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), timeout=10)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "id INTEGER PRIMARY KEY, prn TEXT NOT NULL, fetched_at REAL NOT NULL, "
+                "sha256 TEXT NOT NULL, raw_size INTEGER NOT NULL, stored_size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS pages_prn_fetched ON pages (prn, fetched_at)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _blob_path(self, sha, suffix):
+        return os.path.join(self.blob_dir, sha[:2], sha + suffix)
+
+    def _find_blob(self, sha):
+        for suffix in (ZSTD_SUFFIX, GZIP_SUFFIX):
+            path = self._blob_path(sha, suffix)
+            if os.path.exists(path):
+                return path, suffix
+        return None, None
+
+    def add(self, prn, page_html, fetched_at=None):
+        """Stores one fetched page. Returns its sha256."""
+        raw = page_html.encode("utf-8")
+        sha = hashlib.sha256(raw).hexdigest()
+        path, _ = self._find_blob(sha)
+        if path:
+            # Touch it so a concurrent prune treats the blob as fresh
+            os.utime(path)
+            stored_size = os.path.getsize(path)
+        else:
+            compressed, suffix = _compress(raw)
+            path = self._blob_path(sha, suffix)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename so concurrent readers never see a partial blob
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+            stored_size = len(compressed)
+
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO pages (prn, fetched_at, sha256, raw_size, stored_size) VALUES (?, ?, ?, ?, ?)",
+            (prn, fetched_at or time.time(), sha, len(raw), stored_size)
+        )
+        conn.commit()
+
+        self._schedule_prune()
+        return sha
+
+    def _schedule_prune(self):
+        """Starts prune() on a background thread unless one started in the last AUTO_PRUNE_INTERVAL_SECONDS."""
+        with self._prune_lock:
+            now = time.monotonic()
+            if self._last_prune is not None and now - self._last_prune < AUTO_PRUNE_INTERVAL_SECONDS:
+                return None
+            self._last_prune = now
+        thread = threading.Thread(target=self._auto_prune, name="html-archive-prune", daemon=True)
+        thread.start()
+        return thread
+
+    def _auto_prune(self):
+        try:
+            entries, blobs = self.prune()
+            if entries or blobs:
+                print(f"🧹 Pruned {entries} archive entries and {blobs} blobs")
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Could not prune the dashboard archive: {e}")
+
+    def load(self, sha):
+        path, suffix = self._find_blob(sha)
+        if not path:
+            return None
+        with open(path, "rb") as f:
+            return _decompress(f.read(), suffix).decode("utf-8")
+
+    def entries(self, since=None, latest_only=False):
+        """Returns [(prn, fetched_at, sha256)], oldest first; latest_only keeps each student's newest page."""
+        sql = "SELECT prn, MAX(fetched_at), sha256 FROM pages" if latest_only else "SELECT prn, fetched_at, sha256 FROM pages"
+        params = ()
+        if since is not None:
+            sql += " WHERE fetched_at >= ?"
+            params = (since,)
+        if latest_only:
+            # SQLite returns the sha256 of the row holding MAX(fetched_at)
+            sql += " GROUP BY prn"
+        return [tuple(row) for row in self._connection().execute(sql + " ORDER BY 2", params)]
+
+    def prune(self, retention_days=None):
+        """Drops index entries past retention and deletes unreferenced blobs. Returns (entries, blobs) removed."""
+        retention_days = self.retention_days if retention_days is None else retention_days
+        conn = self._connection()
+        cutoff = time.time() - retention_days * 86400
+        removed_entries = conn.execute("DELETE FROM pages WHERE fetched_at < ?", (cutoff,)).rowcount
+        conn.commit()
+
+        referenced = {row[0] for row in conn.execute("SELECT DISTINCT sha256 FROM pages")}
+        # Blobs written in the last few minutes may belong to an add() that hasn't indexed them yet
+        fresh_cutoff = time.time() - 600
+        removed_blobs = 0
+        for dirpath, _, filenames in os.walk(self.blob_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                sha = filename.split(".", 1)[0]
+                if sha not in referenced and os.path.getmtime(path) < fresh_cutoff:
+                    os.remove(path)
+                    removed_blobs += 1
+        return removed_entries, removed_blobs
+
+    def get_stats(self):
+        conn = self._connection()
+        pages, students, raw_bytes = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT prn), COALESCE(SUM(raw_size), 0) FROM pages"
+        ).fetchone()
+        blobs, stored_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(stored_size), 0) FROM (SELECT DISTINCT sha256, stored_size FROM pages)"
+        ).fetchone()
+        return {
+            "pages": pages,
+            "students": students,
+            "unique_blobs": blobs,
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+            "compression": "zstd" if HAS_ZSTD else "gzip"
+        }
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Returns the process-wide archive, or None when PORTAL_ARCHIVE_DIR is not set."""
+    global _archive
+    if not config.PORTAL_ARCHIVE_DIR:
+        return None
+    with _archive_lock:
+        if _archive is None:
+            _archive = HtmlArchive(config.PORTAL_ARCHIVE_DIR, config.PORTAL_ARCHIVE_RETENTION_DAYS)
+        return _archive
+
+
+def archive_page(prn, page_html):
+    """Archives a fetched dashboard if archiving is enabled. Never raises: archiving must not break a fetch."""
+    archive = get_archive()
+    if archive is None or not page_html:
+        return None
+    try:
+        return archive.add(prn, page_html)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Could not archive dashboard page: {e}")
+        return None
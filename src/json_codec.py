@@ -0,0 +1,138 @@
+# json_codec.py
+"""
+JSON encoding for API responses: a pluggable encoder plus pre-serialized bodies.
+
+FastJSONResponse, the app's default response class, renders with the encoder selected by
+API_JSON_ENCODER. The default "auto" uses orjson when the 'orjson' package is installed and
+the standard library otherwise; register_encoder() adds others.
+
+Payloads that rarely change are serialized once into a PrecomputedBody and served as
+bytes. A BodyCache keeps such bodies per key for a TTL, or until invalidate() is called
+because their source data changed.
+"""
+import hashlib
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from src import config
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def _stdlib_dumps(content, default=None):
+    # Same settings as Starlette's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+                      default=default).encode("utf-8")
+
+
+def _orjson_dumps(content, default=None):
+    option = orjson.OPT_NON_STR_KEYS
+    if default is not None:
+        # Route datetimes through default too, so both encoders format them alike
+        option |= orjson.OPT_PASSTHROUGH_DATETIME
+    return orjson.dumps(content, default=default, option=option)
+
+
+_encoders = {"json": _stdlib_dumps}
+if HAS_ORJSON:
+    _encoders["orjson"] = _orjson_dumps
+
+_encoder_name = None
+_dumps = None
+
+
+def register_encoder(name, dumps_fn):
+    """Makes dumps_fn(content, default=None) -> bytes selectable as name."""
+    _encoders[name] = dumps_fn
+
+
+def use_encoder(name):
+    """Selects the encoder behind dumps() and FastJSONResponse ("auto" prefers orjson)."""
+    global _encoder_name, _dumps
+    if name == "auto":
+        name = "orjson" if HAS_ORJSON else "json"
+    if name not in _encoders:
+        print(f"⚠️ JSON encoder '{name}' is not available, using the standard library")
+        name = "json"
+    _encoder_name, _dumps = name, _encoders[name]
+
+
+use_encoder(config.API_JSON_ENCODER)
+
+
+def dumps(content, default=None):
+    """Serializes content to UTF-8 JSON bytes with the selected encoder."""
+    return _dumps(content, default=default)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the selected encoder."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+class PrecomputedBody:
+    """A JSON payload serialized once, with a strong ETag over its bytes."""
+
+    def __init__(self, content):
+        # jsonable_encoder gives the same output a route returning content would have
+        self.body = dumps(jsonable_encoder(content))
+        self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.created_at = time.monotonic()
+
+    def response(self, headers=None):
+        return Response(self.body, media_type="application/json", headers={"ETag": self.etag, **(headers or {})})
+
+
+class BodyCache:
+    """
+    PrecomputedBody per key, rebuilt after ttl_seconds (0 disables caching) or once
+    invalidate() is called. Use from the API's event loop only.
+    """
+
+    def __init__(self, ttl_seconds, max_entries=64):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # Bumped by invalidate(); a body built from data read before that is not stored
+        self.generation = 0
+        self._bodies = {}
+        self._counts = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, key):
+        body = self._bodies.get(key)
+        if body is not None and time.monotonic() - body.created_at < self.ttl_seconds:
+            self._counts["hits"] += 1
+            return body
+        self._counts["misses"] += 1
+        return None
+
+    def put(self, key, content, generation):
+        """Serializes content and caches it, unless invalidate() ran since generation was read."""
+        body = PrecomputedBody(content)
+        if self.ttl_seconds > 0 and generation == self.generation:
+            self._bodies.pop(key, None)
+            self._bodies[key] = body
+            while len(self._bodies) > self.max_entries:
+                del self._bodies[next(iter(self._bodies))]
+        return body
+
+    def invalidate(self):
+        self.generation += 1
+        if self._bodies:
+            self._counts["invalidations"] += 1
+            self._bodies.clear()
+
+    def get_stats(self):
+        return {"ttl_seconds": self.ttl_seconds, "size": len(self._bodies), **self._counts}
+
+
+def get_stats():
+    return {"encoder": _encoder_name, "orjson_available": HAS_ORJSON}
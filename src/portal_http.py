@@ -0,0 +1,224 @@
+# portal_http.py
+"""
+Shared HTTP connection pools for all portal traffic.
+Every student still gets their own requests.Session / httpx.AsyncClient (and so their
+own cookie jar), but the TCP+TLS connections underneath are pooled process-wide.
+The pooled transports also apply the portal rate limit, retry transient failures with
+jittered backoff and trip a shared circuit breaker when the portal keeps failing.
+"""
+import asyncio
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from src import circuit_breaker
+from src import config
+from src import portal_rate_limit
+
+try:
+    import h2  # noqa: F401
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+_lock = threading.Lock()
+_adapter = None
+_async_transport = None
+_async_counts = {"requests": 0, "new_connections": 0}
+
+# Responses worth retrying; anything else (including 4xx) is returned to the caller as-is
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+breaker = circuit_breaker.CircuitBreaker(
+    "portal",
+    failure_threshold=config.PORTAL_BREAKER_FAILURE_THRESHOLD,
+    recovery_seconds=config.PORTAL_BREAKER_RECOVERY_SECONDS,
+    half_open_max_calls=config.PORTAL_BREAKER_HALF_OPEN_CALLS
+)
+
+
+def _retry_delay(attempt, status_code=None, retry_after=None):
+    """Jittered backoff, stretched to the server's Retry-After (within the cap) on 429/503."""
+    delay = circuit_breaker.backoff_delay(attempt, config.PORTAL_RETRY_BASE_SECONDS, config.PORTAL_RETRY_MAX_SECONDS)
+    if status_code in (429, 503) and retry_after and retry_after.isdigit():
+        delay = max(delay, min(float(retry_after), config.PORTAL_RETRY_MAX_SECONDS))
+    return delay
+
+
+class _PortalAdapter(HTTPAdapter):
+    """
+    HTTPAdapter for portal traffic: checks the circuit breaker, takes a rate-limit token
+    per attempt and retries connection errors, connect timeouts and 429/5xx responses.
+    A read timeout is raised at once; the portal already had the request and a retry
+    would wait out the whole timeout again.
+    """
+
+    def send(self, request, **kwargs):
+        try:
+            breaker.before_call()
+        except circuit_breaker.CircuitOpenError as e:
+            raise requests.exceptions.ConnectionError(str(e), request=request) from e
+
+        attempt = 0
+        try:
+            while True:
+                portal_rate_limit.acquire()
+                try:
+                    response = super().send(request, **kwargs)
+                except requests.exceptions.ReadTimeout:
+                    breaker.record_failure()
+                    raise
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    if attempt >= config.PORTAL_RETRY_ATTEMPTS:
+                        breaker.record_failure()
+                        raise
+                    time.sleep(_retry_delay(attempt))
+                    attempt += 1
+                    continue
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    breaker.record_success()
+                    return response
+                if attempt >= config.PORTAL_RETRY_ATTEMPTS:
+                    breaker.record_failure()
+                    return response
+                delay = _retry_delay(attempt, response.status_code, response.headers.get("Retry-After"))
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+        except BaseException:
+            breaker.release()
+            raise
+
+
+def get_adapter():
+    """
+    Returns the process-wide requests adapter to mount on every portal session.
+    PORTAL_KEEPALIVE_SECONDS does not apply here (urllib3 pools have no idle expiry).
+    """
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            _adapter = _PortalAdapter(pool_connections=4, pool_maxsize=config.PORTAL_POOL_MAXSIZE)
+        return _adapter
+
+
+def mount(session):
+    """Routes a requests.Session through the shared pool. Don't close such sessions; the pool outlives them."""
+    adapter = get_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class _PortalAsyncTransport(httpx.AsyncHTTPTransport):
+    """
+    Async counterpart of _PortalAdapter (same retry rules). Also counts requests and newly
+    opened connections via httpcore's trace hook for the pool stats.
+    """
+
+    async def _send_once(self, request):
+        await portal_rate_limit.acquire_async()
+        _async_counts["requests"] += 1
+        return await super().handle_async_request(request)
+
+    async def handle_async_request(self, request):
+        previous_trace = request.extensions.get("trace")
+
+        async def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                _async_counts["new_connections"] += 1
+            if previous_trace is not None:
+                await previous_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        try:
+            breaker.before_call()
+        except circuit_breaker.CircuitOpenError as e:
+            raise httpx.ConnectError(str(e), request=request) from e
+
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = await self._send_once(request)
+                except httpx.ReadTimeout:
+                    breaker.record_failure()
+                    raise
+                except httpx.TransportError:
+                    if attempt >= config.PORTAL_RETRY_ATTEMPTS:
+                        breaker.record_failure()
+                        raise
+                    await asyncio.sleep(_retry_delay(attempt))
+                    attempt += 1
+                    continue
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    breaker.record_success()
+                    return response
+                if attempt >= config.PORTAL_RETRY_ATTEMPTS:
+                    breaker.record_failure()
+                    return response
+                delay = _retry_delay(attempt, response.status_code, response.headers.get("Retry-After"))
+                await response.aclose()
+                await asyncio.sleep(delay)
+                attempt += 1
+        except BaseException:
+            breaker.release()
+            raise
+
+
+def get_async_transport():
+    """Returns the process-wide httpx transport shared by every async portal client."""
+    global _async_transport
+    if _async_transport is None:
+        use_http2 = config.PORTAL_HTTP2 and HAS_HTTP2
+        if config.PORTAL_HTTP2 and not HAS_HTTP2:
+            print("⚠️ PORTAL_HTTP2 is set but the 'h2' package is not installed. Using HTTP/1.1.")
+        _async_transport = _PortalAsyncTransport(
+            http2=use_http2,
+            limits=httpx.Limits(
+                max_connections=config.PORTAL_POOL_MAXSIZE,
+                max_keepalive_connections=config.PORTAL_POOL_MAXSIZE,
+                keepalive_expiry=config.PORTAL_KEEPALIVE_SECONDS
+            ),
+            retries=0
+        )
+    return _async_transport
+
+
+async def close_async_transport():
+    global _async_transport
+    if _async_transport is not None:
+        await _async_transport.aclose()
+        _async_transport = None
+
+
+def _sync_counts():
+    totals = {"requests": 0, "new_connections": 0}
+    if _adapter is None:
+        return totals
+    pools = _adapter.poolmanager.pools
+    for key in pools.keys():
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        totals["requests"] += pool.num_requests
+        totals["new_connections"] += pool.num_connections
+    return totals
+
+
+def get_pool_stats():
+    """
+    Pool hit/miss counters. A hit is a request served on an already-open connection,
+    a miss is one that had to open a new connection (TCP + TLS handshake).
+    """
+    stats = {}
+    for name, counts in (("sync", _sync_counts()), ("async", dict(_async_counts))):
+        stats[name] = {
+            "requests": counts["requests"],
+            "hits": max(0, counts["requests"] - counts["new_connections"]),
+            "misses": counts["new_connections"]
+        }
+    return stats
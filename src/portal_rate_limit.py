@@ -0,0 +1,203 @@
+# portal_rate_limit.py
+"""
+Token-bucket rate limiting for every request we send to the portal.
+
+The bucket lives in a small SQLite file so the API workers and the batch updater
+(separate processes) draw from the same budget. Requests run in one of two lanes:
+"interactive" (a user waiting on the API/Streamlit) may drain the whole bucket, while
+"background" (batch refreshes) only takes a token when more than
+PORTAL_RATE_BACKGROUND_RESERVE tokens are left, so interactive traffic always has headroom.
+"""
+import asyncio
+import contextlib
+import contextvars
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from src import config
+from src import worker_pools
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+# Highest priority first
+LANES = (INTERACTIVE, BACKGROUND)
+
+_current_lane = contextvars.ContextVar("portal_rate_limit_lane", default=INTERACTIVE)
+
+# Longest sleep between tries, so a lane raised by raise_lane() applies promptly
+MAX_WAIT_SLICE_SECONDS = 0.5
+
+
+@contextlib.contextmanager
+def lane(name):
+    """Runs the enclosed portal requests in the given lane (thread- and task-local)."""
+    if name not in LANES:
+        raise ValueError(f"Unknown rate-limit lane '{name}'")
+    token = _current_lane.set(name)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def current_lane():
+    return _current_lane.get()
+
+
+def raise_lane(context):
+    """
+    Moves the portal requests running in context (a contextvars.Context, e.g. a shared
+    fetch's task) up to the caller's lane if that has priority, so an interactive caller
+    waiting on a background-led fetch isn't paced as background.
+    """
+    lane_name = current_lane()
+    if LANES.index(lane_name) < LANES.index(context.get(_current_lane, INTERACTIVE)):
+        context.run(_current_lane.set, lane_name)
+
+
+class TokenBucket:
+    """
+    A token bucket stored in SQLite. Each take is one BEGIN IMMEDIATE transaction, so
+    refill + withdraw is atomic across threads and processes sharing db_path.
+    """
+
+    def __init__(self, db_path, name, rate, burst, background_reserve):
+        self.db_path = db_path
+        self.name = name
+        self.rate = rate
+        self.capacity = max(1.0, float(burst))
+        # The background lane must leave at least this many tokens behind
+        self.background_reserve = min(max(0.0, float(background_reserve)), self.capacity - 1)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {name: {"acquired": 0, "waited": 0, "wait_seconds": 0.0} for name in LANES}
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets "
+                "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def try_take(self, lane_name=INTERACTIVE):
+        """Takes one token if the lane allows it. Returns 0.0 on success, else seconds to wait before retrying."""
+        needed = 1.0 + (self.background_reserve if lane_name == BACKGROUND else 0.0)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)).fetchone()
+            if row is None:
+                tokens = self.capacity
+            else:
+                # max() guards against clock steps between processes
+                tokens = min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+            taken = tokens >= needed
+            if taken:
+                tokens -= 1.0
+            conn.execute(
+                "INSERT INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (self.name, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return 0.0 if taken else (needed - tokens) / self.rate
+
+    def _record(self, lane_name, waited, throttled):
+        with self._stats_lock:
+            stats = self._stats[lane_name]
+            stats["acquired"] += 1
+            if throttled:
+                stats["waited"] += 1
+                stats["wait_seconds"] += waited
+
+    def acquire(self, lane_name=None):
+        """Blocks until a token is available. Returns the seconds spent waiting."""
+        start = time.monotonic()
+        throttled = False
+        while True:
+            # Without an explicit lane, re-read it on each try: raise_lane() may have moved it up
+            current = lane_name or current_lane()
+            wait = self.try_take(current)
+            if wait == 0.0:
+                break
+            throttled = True
+            time.sleep(min(max(wait, 0.01), MAX_WAIT_SLICE_SECONDS))
+        waited = time.monotonic() - start if throttled else 0.0
+        self._record(current, waited, throttled)
+        return waited
+
+    async def acquire_async(self, lane_name=None):
+        """
+        Async version of acquire(). The SQLite transaction runs on the DB pool and the wait
+        is an asyncio.sleep, so neither blocks the event loop.
+        """
+        start = time.monotonic()
+        throttled = False
+        while True:
+            current = lane_name or current_lane()
+            wait = await worker_pools.run_db(self.try_take, current)
+            if wait == 0.0:
+                break
+            throttled = True
+            await asyncio.sleep(min(max(wait, 0.01), MAX_WAIT_SLICE_SECONDS))
+        waited = time.monotonic() - start if throttled else 0.0
+        self._record(current, waited, throttled)
+        return waited
+
+    def get_stats(self):
+        with self._stats_lock:
+            lanes = {name: dict(stats, wait_seconds=round(stats["wait_seconds"], 3)) for name, stats in self._stats.items()}
+        return {
+            "enabled": True,
+            "rate_per_second": self.rate,
+            "burst": self.capacity,
+            "background_reserve": self.background_reserve,
+            "lanes": lanes
+        }
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_bucket():
+    """Returns the process-wide portal bucket, or None when rate limiting is disabled."""
+    global _bucket
+    if config.PORTAL_RATE_LIMIT_PER_SECOND <= 0:
+        return None
+    with _bucket_lock:
+        if _bucket is None:
+            # One bucket per portal host, so a test portal doesn't eat the real portal's budget
+            _bucket = TokenBucket(
+                config.PORTAL_RATE_LIMIT_DB,
+                urlparse(config.LOGIN_URL).netloc or "portal",
+                config.PORTAL_RATE_LIMIT_PER_SECOND,
+                config.PORTAL_RATE_BURST,
+                config.PORTAL_RATE_BACKGROUND_RESERVE
+            )
+        return _bucket
+
+
+def acquire():
+    bucket = get_bucket()
+    return bucket.acquire() if bucket else 0.0
+
+
+async def acquire_async():
+    bucket = get_bucket()
+    return await bucket.acquire_async() if bucket else 0.0
+
+
+def get_stats():
+    bucket = get_bucket()
+    return bucket.get_stats() if bucket else {"enabled": False}
@@ -0,0 +1,209 @@
+# scrape_jobs.py
+"""
+In-process queue of asynchronous scrape jobs for the API.
+
+POST /api/data/fetch/{username}?job=true enqueues a job and answers 202 right away instead
+of holding the connection open for the portal login, parse and DB write. A fixed number of
+worker tasks (SCRAPE_JOB_WORKERS) drain a bounded queue (SCRAPE_JOB_MAX_QUEUED); a second
+request for a user whose job is still queued or running gets that same job back. Finished
+jobs are kept for SCRAPE_JOB_RETENTION_SECONDS so clients can poll for the result.
+
+Jobs live in this process only: with several API workers, poll the worker that accepted the job.
+"""
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from src import config
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when SCRAPE_JOB_MAX_QUEUED jobs are already waiting."""
+
+
+@dataclass
+class Job:
+    id: str
+    key: Any
+    run: Callable
+    status: str = QUEUED
+    stage: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def set_stage(self, stage):
+        self.stage = stage
+
+    def to_dict(self):
+        job = {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+        if self.status == SUCCEEDED:
+            job["result"] = self.result
+        elif self.status == FAILED:
+            job["error"] = self.error
+            job["error_status"] = self.error_status
+        return job
+
+
+class ScrapeJobQueue:
+    def __init__(self, workers, max_queued, retention_seconds):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self._queue = None
+        self._worker_tasks = []
+        self._jobs: Dict[str, Job] = {}
+        self._active_by_key: Dict[Any, Job] = {}
+        self._running = 0
+        self._counts = {"submitted": 0, "deduplicated": 0, "rejected": 0, "succeeded": 0, "failed": 0,
+                        "wait_seconds": 0.0, "max_wait_seconds": 0.0, "run_seconds": 0.0, "max_run_seconds": 0.0}
+
+    def _ensure_workers(self):
+        # Created on first use so the queue and workers belong to the server's event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _prune(self):
+        # Runs on every submit, get and get_stats, so finished jobs expire even when nothing new is queued
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, key, run):
+        """
+        Enqueues run(job) -- a coroutine function -- unless a job for key is already queued or
+        running, in which case that job is returned. Returns (job, created).
+        """
+        self._prune()
+        existing = self._active_by_key.get(key)
+        if existing is not None:
+            self._counts["deduplicated"] += 1
+            return existing, False
+        self._ensure_workers()
+        if self.max_queued > 0 and self._queue.qsize() >= self.max_queued:
+            self._counts["rejected"] += 1
+            raise QueueFullError(f"{self._queue.qsize()} scrape jobs are already queued")
+
+        job = Job(id=uuid.uuid4().hex, key=key, run=run)
+        self._jobs[job.id] = job
+        self._active_by_key[key] = job
+        self._counts["submitted"] += 1
+        self._queue.put_nowait(job)
+        return job, True
+
+    def get(self, job_id):
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job):
+        job.status = RUNNING
+        job.started_at = time.time()
+        waited = job.started_at - job.created_at
+        self._counts["wait_seconds"] += waited
+        self._counts["max_wait_seconds"] = max(self._counts["max_wait_seconds"], waited)
+        self._running += 1
+        try:
+            job.result = await job.run(job)
+            job.status = SUCCEEDED
+        except asyncio.CancelledError:
+            job.status = FAILED
+            job.error = "Job cancelled (server shutting down)"
+            raise
+        except Exception as e:
+            job.status = FAILED
+            # HTTPException-style errors carry a status code and detail for the poller
+            job.error = str(getattr(e, "detail", e))
+            job.error_status = getattr(e, "status_code", 500)
+        finally:
+            self._running -= 1
+            job.finished_at = time.time()
+            ran = job.finished_at - job.started_at
+            self._counts["run_seconds"] += ran
+            self._counts["max_run_seconds"] = max(self._counts["max_run_seconds"], ran)
+            self._counts["succeeded" if job.status == SUCCEEDED else "failed"] += 1
+            if self._active_by_key.get(job.key) is job:
+                del self._active_by_key[job.key]
+
+    async def close(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        # Jobs still waiting will never run; fail them so pollers see it and a new submit isn't deduplicated onto them
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            job.status = FAILED
+            job.error = "Job cancelled before it started (server shutting down)"
+            job.finished_at = time.time()
+        self._active_by_key.clear()
+        self._queue = None
+
+    def get_stats(self):
+        self._prune()
+        finished = self._counts["succeeded"] + self._counts["failed"]
+        started = finished + self._running
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "max_queued": self.max_queued,
+            "retained_jobs": len(self._jobs),
+            "submitted": self._counts["submitted"],
+            "deduplicated": self._counts["deduplicated"],
+            "rejected": self._counts["rejected"],
+            "succeeded": self._counts["succeeded"],
+            "failed": self._counts["failed"],
+            "avg_wait_ms": round(self._counts["wait_seconds"] / started * 1000, 2) if started else 0.0,
+            "max_wait_ms": round(self._counts["max_wait_seconds"] * 1000, 2),
+            "avg_run_ms": round(self._counts["run_seconds"] / finished * 1000, 2) if finished else 0.0,
+            "max_run_ms": round(self._counts["max_run_seconds"] * 1000, 2)
+        }
+
+
+job_queue = ScrapeJobQueue(config.SCRAPE_JOB_WORKERS, config.SCRAPE_JOB_MAX_QUEUED, config.SCRAPE_JOB_RETENTION_SECONDS)
+
+
+def submit(key, run):
+    return job_queue.submit(key, run)
+
+
+def get_job(job_id):
+    return job_queue.get(job_id)
+
+
+async def close():
+    await job_queue.close()
+
+
+def get_stats():
+    return job_queue.get_stats()
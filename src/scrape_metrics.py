@@ -0,0 +1,146 @@
+# scrape_metrics.py
+"""
+Timing spans for each phase of a portal scrape (login GET, login POST, dashboard
+download, parsing, attendance detail pages).
+
+Code under measurement wraps a phase in `with span("login.post") as s:` and may set
+s.bytes / s.outcome. When the block exits, every registered hook receives the finished
+Span. By default an in-memory histogram hook aggregates them (see get_metrics(), exposed
+on /health); add_hook() lets callers log or export spans without scraping stdout.
+"""
+import bisect
+import contextlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from src import config
+
+# Upper bounds of the duration histogram buckets, in milliseconds
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000)
+
+
+@dataclass
+class Span:
+    name: str
+    outcome: str = "ok"
+    bytes: Optional[int] = None
+    duration_ms: float = 0.0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+class InMemoryHistograms:
+    """Default hook: a duration histogram plus byte totals per (span name, outcome)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def __call__(self, finished):
+        key = (finished.name, finished.outcome)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "count": 0, "sum_ms": 0.0, "max_ms": 0.0, "bytes": 0,
+                    "buckets": [0] * (len(BUCKETS_MS) + 1)
+                }
+            series["count"] += 1
+            series["sum_ms"] += finished.duration_ms
+            series["max_ms"] = max(series["max_ms"], finished.duration_ms)
+            series["bytes"] += finished.bytes or 0
+            series["buckets"][bisect.bisect_left(BUCKETS_MS, finished.duration_ms)] += 1
+
+    @staticmethod
+    def _quantile(buckets, count, q):
+        """Upper bound of the bucket holding the q-th quantile (None past the last bound)."""
+        target = q * count
+        seen = 0
+        for bound, bucket_count in zip(BUCKETS_MS + (None,), buckets):
+            seen += bucket_count
+            if seen >= target:
+                return bound
+        return None
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for (name, outcome), series in sorted(self._series.items()):
+                count = series["count"]
+                result.setdefault(name, {})[outcome] = {
+                    "count": count,
+                    "avg_ms": round(series["sum_ms"] / count, 2),
+                    "max_ms": round(series["max_ms"], 2),
+                    "p50_ms_le": self._quantile(series["buckets"], count, 0.5),
+                    "p95_ms_le": self._quantile(series["buckets"], count, 0.95),
+                    "bytes": series["bytes"],
+                    "buckets": dict(zip([f"le_{b}" for b in BUCKETS_MS] + ["le_inf"], series["buckets"]))
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+def log_span(finished):
+    """Hook that prints one JSON line per span (enable with SCRAPE_METRICS_LOG=true)."""
+    print(json.dumps({"span": finished.name, "outcome": finished.outcome, "ms": round(finished.duration_ms, 2),
+                      "bytes": finished.bytes, **finished.attributes}))
+
+
+histograms = InMemoryHistograms()
+_hooks = [histograms]
+_hooks_lock = threading.Lock()
+if config.SCRAPE_METRICS_LOG:
+    _hooks.append(log_span)
+
+
+def add_hook(hook):
+    """Registers hook(span) to be called for every finished span."""
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+
+
+def remove_hook(hook):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def emit(finished):
+    with _hooks_lock:
+        hooks = list(_hooks)
+    for hook in hooks:
+        try:
+            hook(finished)
+        except Exception as e:
+            # A broken exporter must never fail a scrape
+            print(f"⚠️ Metrics hook {hook!r} failed: {e}")
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """
+    Times the enclosed block. An exception sets the outcome to the exception's class
+    name (unless the block already set a specific outcome) and is re-raised.
+    """
+    current = Span(name, attributes=attributes)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        if current.outcome == "ok":
+            current.outcome = type(e).__name__
+        raise
+    finally:
+        current.duration_ms = (time.perf_counter() - start) * 1000
+        emit(current)
+
+
+def get_metrics():
+    """Aggregated spans from the default in-memory hook: {name: {outcome: stats}}."""
+    return histograms.snapshot()
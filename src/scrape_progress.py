@@ -0,0 +1,60 @@
+# scrape_progress.py
+"""
+Live progress events for portal scrapes, keyed by PRN.
+
+The scrape pipeline publishes an event as each step finishes (login started, login ok,
+attendance parsed, CIE parsed, DB persisted); the SSE endpoint subscribes for one student
+and forwards them, so the UI can render attendance as soon as it is parsed. A streamed
+dashboard publishes each chart as its script arrives, before the rest of the page. Events are
+serialized when published, so later mutation of the scraped data can't leak into them.
+
+Publishing with no subscribers costs a dict lookup. Use from the API's event loop only.
+"""
+import contextlib
+import json
+import time
+from collections import defaultdict
+
+LOGIN_STARTED = "login_started"
+LOGIN_OK = "login_ok"
+ATTENDANCE_PARSED = "attendance_parsed"
+CIE_PARSED = "cie_parsed"
+ATTENDANCE_DETAILS = "attendance_details"
+DB_PERSISTED = "db_persisted"
+ANALYTICS_READY = "analytics_ready"
+ERROR = "error"
+DONE = "done"
+
+_subscribers = defaultdict(set)
+
+
+def format_event(event, data=None):
+    """One Server-Sent Events message."""
+    payload = json.dumps({"event": event, "at": time.time(), "data": data}, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def publish(key, event, data=None):
+    queues = _subscribers.get(key)
+    if not queues:
+        return
+    message = format_event(event, data)
+    for queue in queues:
+        queue.put_nowait((event, message))
+
+
+@contextlib.contextmanager
+def subscribe(key, queue_factory):
+    """Registers a queue (from queue_factory()) for key's events; yields it and unsubscribes on exit."""
+    queue = queue_factory()
+    _subscribers[key].add(queue)
+    try:
+        yield queue
+    finally:
+        _subscribers[key].discard(queue)
+        if not _subscribers[key]:
+            del _subscribers[key]
+
+
+def subscriber_count():
+    return sum(len(queues) for queues in _subscribers.values())
@@ -0,0 +1,161 @@
+# single_flight.py
+"""
+Request coalescing ("single flight") for portal fetches.
+
+When several callers ask for the same key at once (the dashboard fires /api/data/fetch,
+/analytics and /api/analytics/correlation together for one student), only the first one
+does the work; the rest wait for it and get the same result. A successful result is then
+reused for a short window so callers arriving just after it finishes don't log in again.
+Failures (exceptions or a None result) are shared with the waiters but never reused.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"leaders": 0, "coalesced": 0, "reused": 0}
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+class _ResultCache:
+    """key -> (expires_at, value) for the reuse window. Callers hold the owning lock."""
+
+    def __init__(self, reuse_seconds):
+        self.reuse_seconds = reuse_seconds
+        self._entries = {}
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def put(self, key, value):
+        if self.reuse_seconds <= 0 or value is None:
+            return
+        now = time.monotonic()
+        for stale_key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[stale_key]
+        self._entries[key] = (now + self.reuse_seconds, value)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Thread-based single flight for the sync scraper."""
+
+    def __init__(self, reuse_seconds):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._results = _ResultCache(reuse_seconds)
+        self._stats = _Stats()
+
+    def do(self, key, fn):
+        """Returns fn()'s result, sharing one in-flight call (and a recent result) per key."""
+        with self._lock:
+            value = self._results.get(key)
+            if value is not None:
+                self._stats.count("reused")
+                return value
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._stats.count("coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        self._stats.count("leaders")
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None:
+                    self._results.put(key, call.value)
+            call.done.set()
+        return call.value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._results.invalidate(key)
+
+    def get_stats(self):
+        return self._stats.snapshot()
+
+
+class AsyncSingleFlight:
+    """
+    asyncio single flight for the async scraper. Use from one event loop.
+    on_join(context), if given, runs in each caller that joins an in-flight call, with the
+    contextvars.Context the shared call runs in (e.g. to raise its rate-limit lane).
+    """
+
+    def __init__(self, reuse_seconds, on_join=None):
+        self.on_join = on_join
+        # key -> (task, the task's context)
+        self._tasks = {}
+        self._results = _ResultCache(reuse_seconds)
+        self._stats = _Stats()
+
+    async def do(self, key, coro_fn):
+        value = self._results.get(key)
+        if value is not None:
+            self._stats.count("reused")
+            return value
+        entry = self._tasks.get(key)
+        if entry is None:
+            self._stats.count("leaders")
+            # The work runs in its own task so a cancelled caller doesn't cancel it for the others
+            context = contextvars.copy_context()
+            task = asyncio.get_running_loop().create_task(coro_fn(), context=context)
+            self._tasks[key] = (task, context)
+            task.add_done_callback(lambda finished: self._finish(key, finished))
+        else:
+            task, context = entry
+            self._stats.count("coalesced")
+            if self.on_join is not None:
+                self.on_join(context)
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        entry = self._tasks.get(key)
+        if entry is not None and entry[0] is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is None:
+            self._results.put(key, task.result())
+
+    def invalidate(self, key):
+        self._results.invalidate(key)
+
+    def get_stats(self):
+        return self._stats.snapshot()
@@ -40,21 +40,19 @@ def get_processed_student_data(prn, dob_day, dob_month, dob_year, full_name):
     Logs into the portal, scrapes data, and returns it along with a timestamp.
     The entire dictionary output is cached.
     """
-    session, html = web_scraper.login_and_get_welcome_page(
+    dashboard = web_scraper.fetch_dashboard(
         prn, dob_day, dob_month, dob_year, full_name
     )
 
-    if not html:
+    if not dashboard:
         return None
 
-    attendance_records = web_scraper.extract_attendance_from_welcome_page(html)
-    cie_marks_records = web_scraper.extract_cie_marks(html)
-
     return {
         "data": {
-            "attendance": attendance_records,
-            "cie_marks": cie_marks_records
+            "attendance": dashboard.attendance,
+            "cie_marks": dashboard.cie_marks
         },
+        "fingerprint": dashboard.fingerprint(),
         "scraped_at": datetime.now(pytz.utc)
     }
 
@@ -219,9 +217,14 @@ if st.session_state.student_data_result:
         # This check ensures the DB update runs only ONCE per new data fetch
         if 'db_updated_at' not in st.session_state or st.session_state.db_updated_at != scraped_time_utc:
             st.success("Login and data processing successful!")
-            if result["data"]["cie_marks"]:
-                if db_utils.update_student_marks_in_db_pg(current_user_id, result["data"]["cie_marks"], scraped_time_utc):
-                    st.toast("Leaderboard data updated!", icon="🏆")
+            if result["data"]["cie_marks"] or result["data"]["attendance"]:
+                save_status = db_utils.save_scrape_if_changed_pg(
+                    current_user_id, result["data"]["cie_marks"], result["fingerprint"], scraped_time_utc,
+                    result["data"]["attendance"]
+                )
+                if save_status:
+                    if save_status == "updated":
+                        st.toast("Leaderboard data updated!", icon="🏆")
                     # Mark this data batch as having been processed for DB update
                     st.session_state.db_updated_at = scraped_time_utc
 
@@ -1,174 +1,559 @@
 # web_scraper.py
 import requests
 from bs4 import BeautifulSoup
-import re
+import contextvars
+import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from urllib.parse import urljoin # Moved import here
 from src import config # Import your config file
+from src import dashboard_parser
+from src import html_archive
+from src import portal_http
+from src import scrape_metrics
+from src import single_flight
 
-def login_and_get_welcome_page(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check):
+PORTAL_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36",
+    "Referer": config.LOGIN_URL
+}
+
+LOGIN_FIELD_NAMES = [config.PRN_FIELD_NAME, config.DAY_FIELD_NAME, config.MONTH_FIELD_NAME, config.YEAR_FIELD_NAME, config.PASSWORD_FIELD_NAME]
+
+@dataclass(frozen=True)
+class LoginForm:
+    """What a login needs from form#login-form: where to POST and the hidden inputs to echo back."""
+    post_url: str
+    hidden_fields: tuple
+
+def parse_login_form(login_page_html):
+    """Returns the LoginForm found on the login page, or None if form#login-form is missing."""
+    soup_login = BeautifulSoup(login_page_html, "html.parser")
+    login_form = soup_login.find("form", {"id": "login-form"})
+    if not login_form:
+        print("Could not find the login form with id='login-form'. This is critical.")
+        return None
+    hidden_fields = []
+    for hidden_input in login_form.find_all("input", {"type": "hidden"}):
+        name = hidden_input.get("name")
+        value = hidden_input.get("value")
+        if name and name not in LOGIN_FIELD_NAMES:
+            hidden_fields.append((name, value if value is not None else ""))
+    form_action = login_form.get("action")
+    actual_post_url = config.FORM_ACTION_URL
+    if form_action:
+        actual_post_url = urljoin(config.LOGIN_URL, form_action)
+    return LoginForm(actual_post_url, tuple(hidden_fields))
+
+def build_login_payload(login_form, prn, dob_day, dob_month_val, dob_year):
+    password_string_for_payload = f"{dob_year}-{str(dob_month_val).zfill(2)}-{str(dob_day).zfill(2)}"
+    payload = {
+        config.PRN_FIELD_NAME: prn,
+        config.DAY_FIELD_NAME: dob_day,
+        config.MONTH_FIELD_NAME: dob_month_val,
+        config.YEAR_FIELD_NAME: dob_year,
+        config.PASSWORD_FIELD_NAME: password_string_for_payload,
+    }
+    payload.update(login_form.hidden_fields)
+    return payload
+
+class LoginFormCache:
+    """
+    Process-wide cache of the login form so most logins can skip the GET of the login page.
+    If two consecutive fetches of the form disagree on the hidden inputs, the portal is
+    issuing per-request tokens and the cache turns itself off for the rest of the process.
+    """
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self.disabled = ttl_seconds <= 0
+        self._form = None
+        self._last_seen = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self.disabled or self._form is None or self._expires_at <= time.monotonic():
+                return None
+            return self._form
+
+    def put(self, login_form):
+        with self._lock:
+            if self._last_seen is not None and self._last_seen.hidden_fields != login_form.hidden_fields and not self.disabled:
+                print("Login form hidden fields changed between fetches. Disabling the login form cache.")
+                self.disabled = True
+            self._last_seen = login_form
+            if self.disabled:
+                self._form = None
+                return
+            self._form = login_form
+            self._expires_at = time.monotonic() + self.ttl_seconds
+
+    def invalidate(self):
+        with self._lock:
+            self._form = None
+
+    def discard(self, login_form):
+        """
+        Drops login_form after the portal rejected it, unless another login already replaced
+        it. Returns the newer cached form to retry with, or None if a fresh GET is needed.
+        """
+        with self._lock:
+            if self._form is login_form:
+                self._form = None
+                return None
+            if self._form is not None and self._expires_at > time.monotonic():
+                return self._form
+            return None
+
+login_form_cache = LoginFormCache(config.PORTAL_LOGIN_FORM_TTL_SECONDS)
+
+def check_login_success(welcome_page_html, user_full_name_for_check):
+    """Returns True if the page returned after the login POST is the student dashboard."""
+    if user_full_name_for_check.lower() in welcome_page_html.lower():
+        print(f"Login successful! Welcome {user_full_name_for_check}.")
+        return True
+    elif "id=\"gaugeTypeMulti\"" in welcome_page_html: 
+        print(f"Login successful (found attendance chart)! Welcome {user_full_name_for_check}.")
+        return True
+    elif "id=\"stackedBarChart_1\"" in welcome_page_html: 
+        print(f"Login successful (found CIE chart)! Welcome {user_full_name_for_check}.")
+        return True
+    temp_soup_post = BeautifulSoup(welcome_page_html, "html.parser")
+    if temp_soup_post.find("form", {"id": "login-form"}):
+        print("Login FAILED. The page after POST still contains the login form.")
+        if "invalid username or password" in welcome_page_html.lower():
+             print("Reason: Invalid username or password detected on page.")
+    else:
+        print("Login status uncertain. User identifier not found, dashboard elements not found, but it's not clearly the login page either.")
+    return False
+
+def has_login_form(page_html):
+    return "id=\"login-form\"" in page_html or "id='login-form'" in page_html
+
+def is_credentials_rejection(page_html):
+    """True if the portal rejected the PRN/DOB itself (as opposed to a stale form token)."""
+    return "invalid username or password" in page_html.lower()
+
+def should_retry_login_form(welcome_page_html):
+    """
+    A cached form is worth retrying with a fresh one only when the portal sent the login
+    form back without a credentials error. Wrong PRN/DOB would just fail a second time.
+    """
+    return has_login_form(welcome_page_html) and not is_credentials_rejection(welcome_page_html)
+
+def is_dashboard_page(page_html, user_full_name_for_check):
+    """Quiet check used on cached sessions: True if the page is the dashboard, not the login form."""
+    if has_login_form(page_html):
+        return False
+    return (user_full_name_for_check.lower() in page_html.lower()
+            or "id=\"gaugeTypeMulti\"" in page_html
+            or "id=\"stackedBarChart_1\"" in page_html)
+
+def credentials_key(dob_day, dob_month_val, dob_year):
+    """Key that ties a cached session to the credentials it was created with."""
+    return f"{dob_year}-{str(dob_month_val).zfill(2)}-{str(dob_day).zfill(2)}"
+
+class PortalSessionCache:
+    """
+    Logged-in portal sessions keyed by PRN, kept for a fixed TTL.
+    Entries only match when the DOB used to create them matches, so a cached
+    session is never handed out for different credentials.
+    """
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, prn, creds_key):
+        """Returns (session, dashboard_url) for a live entry, or (None, None)."""
+        if self.ttl_seconds <= 0:
+            return None, None
+        with self._lock:
+            entry = self._entries.get(prn)
+            if not entry:
+                return None, None
+            if entry["creds_key"] != creds_key or entry["expires_at"] <= time.monotonic():
+                del self._entries[prn]
+                return None, None
+            return entry["session"], entry["dashboard_url"]
+
+    def put(self, prn, creds_key, session, dashboard_url):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            for stale_prn in [k for k, v in self._entries.items() if v["expires_at"] <= now]:
+                del self._entries[stale_prn]
+            self._entries[prn] = {
+                "session": session,
+                "dashboard_url": dashboard_url,
+                "creds_key": creds_key,
+                "expires_at": now + self.ttl_seconds
+            }
+
+    def invalidate(self, prn):
+        with self._lock:
+            return self._entries.pop(prn, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+_session_cache = PortalSessionCache(config.PORTAL_SESSION_TTL_SECONDS)
+
+STREAM_CHUNK_SIZE = 16 * 1024
+
+def needs_rest_of_dashboard(scanner):
+    """
+    Called once both charts have streamed in: whether the rest of the page is still needed,
+    by the archive (which stores whole pages), for a chart that didn't parse, or to find
+    attendance detail links not seen yet.
+    """
+    if html_archive.get_archive() is not None:
+        return True
+    if scanner.attendance is None or scanner.cie_marks is None:
+        # A chart script didn't parse; parse_dashboard falls back to searching the whole page
+        return True
+    if not config.PORTAL_FETCH_ATTENDANCE_DETAILS or not scanner.attendance:
+        return False
+    subject_codes = [record["subject"] for record in scanner.attendance]
+    return len(dashboard_parser.find_attendance_links(scanner.getvalue(), subject_codes)) < len(subject_codes)
+
+
+def read_dashboard_response(response, on_chart=None):
+    """
+    Returns the page text of a dashboard response. Streamed responses are parsed as they
+    arrive: on_chart(name, data) gets each chart as soon as its script is in (see
+    IncrementalDashboardScanner), and reading stops there unless needs_rest_of_dashboard().
+    Stopping early returns only the start of the page and gives up the keep-alive
+    connection, which costs less than downloading the rest of a large page.
+    """
+    with scrape_metrics.span("dashboard.download", streamed=config.PORTAL_STREAM_DASHBOARD) as download_span:
+        if not config.PORTAL_STREAM_DASHBOARD:
+            download_span.bytes = len(response.content)
+            return response.text
+        scanner = dashboard_parser.IncrementalDashboardScanner(on_chart)
+        stopped_early = False
+        try:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                charts_were_done = scanner.done
+                # Decide once, on the chunk that completes both charts
+                if scanner.feed(chunk) and not charts_were_done and not needs_rest_of_dashboard(scanner):
+                    stopped_early = True
+                    break
+        finally:
+            # Releases the connection to the pool if the body was read to the end, else closes it
+            response.close()
+        raw = scanner.getvalue()
+        download_span.bytes = len(raw)
+        download_span.attributes["charts_at_bytes"] = scanner.charts_at
+        download_span.attributes["stopped_early"] = stopped_early
+        return raw.decode(response.encoding or "utf-8", errors="replace")
+
+def new_portal_session():
+    """A requests.Session with its own cookie jar on the shared portal connection pool."""
     session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.102 Safari/537.36",
-        "Referer": config.LOGIN_URL
-    })
-    try:
-        # print(f"Navigating to login page: {config.LOGIN_URL}")
+    session.headers.update(PORTAL_HEADERS)
+    return portal_http.mount(session)
+
+def _fetch_login_form(session):
+    # print(f"Navigating to login page: {config.LOGIN_URL}")
+    with scrape_metrics.span("login.get_form") as form_span:
         response_get = session.get(config.LOGIN_URL, timeout=20)
         response_get.raise_for_status()
-        # print("Successfully fetched login page.")
-        soup_login = BeautifulSoup(response_get.content, "html.parser")
-        login_form = soup_login.find("form", {"id": "login-form"})
+        form_span.bytes = len(response_get.content)
+        login_form = parse_login_form(response_get.content)
         if not login_form:
-            print("Could not find the login form with id='login-form'. This is critical.")
-            return None, None
-        # print("Successfully found login form with id='login-form'.")
-        password_string_for_payload = f"{dob_year}-{str(dob_month_val).zfill(2)}-{str(dob_day).zfill(2)}"
-        # print(f"Constructed password string for '{config.PASSWORD_FIELD_NAME}': {password_string_for_payload}")
-        payload = {
-            config.PRN_FIELD_NAME: prn,
-            config.DAY_FIELD_NAME: dob_day,
-            config.MONTH_FIELD_NAME: dob_month_val,
-            config.YEAR_FIELD_NAME: dob_year,
-            config.PASSWORD_FIELD_NAME: password_string_for_payload,
-        }
-        hidden_inputs = login_form.find_all("input", {"type": "hidden"})
-        if hidden_inputs:
-            # print("Found hidden fields in the targeted login form (id='login-form'):")
-            for hidden_input in hidden_inputs:
-                name = hidden_input.get("name")
-                value = hidden_input.get("value")
-                if name:
-                    if name not in [config.PRN_FIELD_NAME, config.DAY_FIELD_NAME, config.MONTH_FIELD_NAME, config.YEAR_FIELD_NAME, config.PASSWORD_FIELD_NAME]:
-                        payload[name] = value if value is not None else ""
-                        # print(f"  Added hidden field: {name}={payload[name]}")
-        # else:
-            # print("No hidden input fields found in the login form (id='login-form').")
-        # print(f"Payload to be sent: {payload}")
-        form_action = login_form.get("action")
-        actual_post_url = config.FORM_ACTION_URL
-        if form_action:
-            actual_post_url = urljoin(config.LOGIN_URL, form_action)
-        # print(f"Attempting to POST login data to: {actual_post_url}")
-        response_post = session.post(actual_post_url, data=payload, timeout=20)
+            form_span.outcome = "no_form"
+    if login_form:
+        login_form_cache.put(login_form)
+    return login_form
+
+def _post_login(session, login_form, prn, dob_day, dob_month_val, dob_year, on_chart=None):
+    payload = build_login_payload(login_form, prn, dob_day, dob_month_val, dob_year)
+    # print(f"Attempting to POST login data to: {login_form.post_url}")
+    with scrape_metrics.span("login.post"):
+        response_post = session.post(login_form.post_url, data=payload, timeout=20, stream=config.PORTAL_STREAM_DASHBOARD)
         response_post.raise_for_status()
-        # print(f"POST request completed. Status: {response_post.status_code}")
-        # print(f"Current URL after POST: {response_post.url}")
-        welcome_page_html = response_post.text
-        login_successful = False
-        if user_full_name_for_check.lower() in welcome_page_html.lower():
-            print(f"Login successful! Welcome {user_full_name_for_check}.")
-            login_successful = True
-        elif "id=\"gaugeTypeMulti\"" in welcome_page_html: 
-            print(f"Login successful (found attendance chart)! Welcome {user_full_name_for_check}.")
-            login_successful = True
-        elif "id=\"stackedBarChart_1\"" in welcome_page_html: 
-            print(f"Login successful (found CIE chart)! Welcome {user_full_name_for_check}.")
-            login_successful = True
+    return read_dashboard_response(response_post, on_chart), response_post.url
+
+def _login(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check, on_chart=None):
+    """
+    Performs the login POST, preceded by a GET of the login page unless the login form
+    is cached. Returns (session, welcome_page_html, dashboard_url).
+    """
+    session = new_portal_session()
+    with scrape_metrics.span("login") as login_span:
+        try:
+            login_form = login_form_cache.get()
+            login_span.attributes["cached_form"] = login_form is not None
+            if login_form:
+                welcome_page_html, dashboard_url = _post_login(session, login_form, prn, dob_day, dob_month_val, dob_year, on_chart)
+                if should_retry_login_form(welcome_page_html):
+                    print("Cached login form was rejected. Retrying with a fresh form.")
+                    login_form = login_form_cache.discard(login_form)
+                    if login_form:
+                        welcome_page_html, dashboard_url = _post_login(session, login_form, prn, dob_day, dob_month_val, dob_year, on_chart)
+            if not login_form:
+                login_form = _fetch_login_form(session)
+                if not login_form:
+                    login_span.outcome = "no_form"
+                    return None, None, None
+                welcome_page_html, dashboard_url = _post_login(session, login_form, prn, dob_day, dob_month_val, dob_year, on_chart)
+            if not check_login_success(welcome_page_html, user_full_name_for_check):
+                login_span.outcome = "rejected"
+                return None, None, None
+            return session, welcome_page_html, dashboard_url
+        except requests.exceptions.HTTPError as e:
+            login_span.outcome = "http_error"
+            print(f"HTTP error occurred during login: {e}")
+            if e.response is not None: print(f"Response content (first 500 chars): {e.response.text[:500]}...")
+            return None, None, None
+        except requests.exceptions.RequestException as e:
+            login_span.outcome = "request_error"
+            print(f"A request error occurred during login: {e}")
+            return None, None, None
+        except Exception as e:
+            login_span.outcome = "error"
+            print(f"An unexpected error occurred during login: {e}")
+            return None, None, None
+
+def login_and_get_welcome_page(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check):
+    """
+    Always performs a fresh login. Use this when validating credentials;
+    use get_welcome_page for data fetches that may reuse a cached session.
+    """
+    session, welcome_page_html, _ = _login(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check)
+    return session, welcome_page_html
+
+def get_welcome_page(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check, on_chart=None):
+    """
+    Returns (session, welcome_page_html), reusing a cached logged-in session for this PRN
+    when one is still within its TTL. A cached session that lands back on the login form
+    is discarded and a fresh login is performed. on_chart is passed to read_dashboard_response;
+    a streamed page may be only the start of the dashboard.
+    """
+    creds_key = credentials_key(dob_day, dob_month_val, dob_year)
+    session, dashboard_url = _session_cache.get(prn, creds_key)
+    if session is not None:
+        try:
+            with scrape_metrics.span("dashboard.get"):
+                response = session.get(dashboard_url, timeout=20, stream=config.PORTAL_STREAM_DASHBOARD)
+                response.raise_for_status()
+            welcome_page_html = read_dashboard_response(response, on_chart)
+            if is_dashboard_page(welcome_page_html, user_full_name_for_check):
+                return session, welcome_page_html
+            print("Cached portal session expired on the portal side. Logging in again.")
+        except requests.exceptions.RequestException as e:
+            print(f"Cached portal session failed ({e}). Logging in again.")
+        _session_cache.invalidate(prn)
+
+    session, welcome_page_html, dashboard_url = _login(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check, on_chart)
+    if session is not None:
+        _session_cache.put(prn, creds_key, session, dashboard_url)
+    return session, welcome_page_html
+
+class AttendanceDetailCache:
+    """
+    Attended/conducted counts per (PRN, subject), remembered together with the gauge
+    percentage they were fetched at. A subject's detail page is only fetched again when
+    its gauge value moves or the entry is older than the TTL. A fresh process starts
+    from the stored counts (seed()), so restarts and batch runs don't re-fetch everything.
+    """
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, prn, subject_code, percentage, allow_expired=False):
+        with self._lock:
+            entry = self._entries.get((prn, subject_code))
+            if not entry or entry["percentage"] != percentage:
+                return None
+            if entry["expires_at"] <= time.monotonic() and not allow_expired:
+                return None
+            return dict(entry["counts"])
+
+    def _entry(self, percentage, counts):
+        return {"percentage": percentage, "counts": dict(counts), "expires_at": time.monotonic() + self.ttl_seconds}
+
+    def seed(self, prn, subject_code, percentage, counts):
+        """
+        Adds stored counts unless this process already has an entry for the subject; an
+        expired one is due a re-fetch. Returns True if they were added.
+        """
+        if self.ttl_seconds <= 0:
+            return False
+        with self._lock:
+            if (prn, subject_code) in self._entries:
+                return False
+            self._entries[(prn, subject_code)] = self._entry(percentage, counts)
+        return True
+
+    def put(self, prn, subject_code, percentage, counts):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries[(prn, subject_code)] = self._entry(percentage, counts)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+attendance_detail_cache = AttendanceDetailCache(config.PORTAL_ATTENDANCE_DETAIL_TTL_SECONDS)
+
+def stored_detail_counts(stored_attendance):
+    """{code: (percentage, counts)} for stored attendance rows (the DB getters' shape) that have all three counts."""
+    return {
+        record["subject"]: (record["percentage"], {key: record[key] for key in ("present", "absent", "total")})
+        for record in stored_attendance or []
+        if record["percentage"] is not None and None not in (record["present"], record["absent"], record["total"])
+    }
+
+def plan_attendance_details(prn, attendance_records, welcome_page_html, stored_attendance=None):
+    """
+    Splits the dashboard's subjects into counts we still have for the current gauge value
+    (cached, or stored and not yet cached) and detail pages that need fetching.
+    Returns (cached, {code: url}).
+    """
+    links = dashboard_parser.find_attendance_links(welcome_page_html, [r["subject"] for r in attendance_records])
+    stored = stored_detail_counts(stored_attendance)
+    cached, to_fetch = {}, {}
+    for record in attendance_records:
+        code = record["subject"]
+        counts = attendance_detail_cache.get(prn, code, record["percentage"])
+        if (not counts and code in stored and stored[code][0] == float(record["percentage"])
+                and attendance_detail_cache.seed(prn, code, record["percentage"], stored[code][1])):
+            counts = dict(stored[code][1])
+        if counts:
+            cached[code] = counts
+        elif code in links:
+            to_fetch[code] = urljoin(config.LOGIN_URL, links[code])
+    return cached, to_fetch
+
+def merge_attendance_details(prn, attendance_records, cached, fetched, stored_attendance=None):
+    """
+    Caches freshly fetched counts ({code: counts, None or an exception}) and sets
+    present/absent/total on every record. A subject whose detail page failed keeps the
+    counts last seen for its current gauge value (cached, even if expired, or stored);
+    they are None only when nothing is known.
+    """
+    counts_by_subject = dict(cached)
+    percentages = {r["subject"]: r["percentage"] for r in attendance_records}
+    stored = stored_detail_counts(stored_attendance)
+    for code, result in fetched.items():
+        if result and not isinstance(result, Exception):
+            attendance_detail_cache.put(prn, code, percentages[code], result)
+            counts_by_subject[code] = result
+            continue
+        if isinstance(result, Exception):
+            print(f"Could not fetch attendance details for {code}: {result}")
+        # Blank counts would change the fingerprint and overwrite the stored ones
+        previous = attendance_detail_cache.get(prn, code, percentages[code], allow_expired=True)
+        if previous is None and code in stored and stored[code][0] == float(percentages[code]):
+            previous = dict(stored[code][1])
+        if previous:
+            counts_by_subject[code] = previous
+    for record in attendance_records:
+        record.update(counts_by_subject.get(record["subject"]) or {"present": None, "absent": None, "total": None})
+
+def _fetch_attendance_detail(cookies, url):
+    # Own session per worker thread, sharing the logged-in cookies and the connection pool
+    detail_session = new_portal_session()
+    detail_session.cookies.update(cookies)
+    with scrape_metrics.span("attendance_detail.get") as detail_span:
+        response = detail_session.get(url, timeout=20)
+        response.raise_for_status()
+        detail_span.bytes = len(response.content)
+        counts = dashboard_parser.parse_attendance_detail(response.text)
+        if counts is None:
+            detail_span.outcome = "unparsed"
+    return counts
+
+def fetch_attendance_details(session, prn, attendance_records, welcome_page_html, stored_attendance=None):
+    """
+    Adds real present/absent/total counts to the dashboard's attendance records by
+    fetching the per-subject detail pages over the logged-in session, at most
+    PORTAL_ATTENDANCE_DETAIL_FANOUT at a time. stored_attendance (the student's saved
+    attendance rows, if any) supplies counts for gauges that haven't moved, and for pages
+    that fail.
+    """
+    cached, to_fetch = plan_attendance_details(prn, attendance_records, welcome_page_html, stored_attendance)
+    fetched = {}
+    if to_fetch:
+        with ThreadPoolExecutor(max_workers=min(config.PORTAL_ATTENDANCE_DETAIL_FANOUT, len(to_fetch))) as pool:
+            # copy_context keeps the caller's rate-limit lane in the worker threads
+            futures = {
+                code: pool.submit(contextvars.copy_context().run, _fetch_attendance_detail, session.cookies, url)
+                for code, url in to_fetch.items()
+            }
+        for code, future in futures.items():
+            try:
+                fetched[code] = future.result()
+            except requests.exceptions.RequestException as e:
+                fetched[code] = e
+    merge_attendance_details(prn, attendance_records, cached, fetched, stored_attendance)
+
+_dashboard_flight = single_flight.SingleFlight(config.PORTAL_SINGLE_FLIGHT_REUSE_SECONDS)
+
+def fetch_dashboard(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check, stored_attendance=None):
+    """
+    Fetches and parses the dashboard for one student. Concurrent calls for the same PRN
+    share a single login+parse, and a result is reused for PORTAL_SINGLE_FLIGHT_REUSE_SECONDS.
+    stored_attendance is the student's saved attendance (see fetch_attendance_details).
+
+    Returns:
+        DashboardData (a private copy, safe to modify) or None if the page couldn't be fetched
+    """
+    def fetch():
+        # Charts parsed while the page streamed in; the page is only searched again if one is missing
+        streamed = {}
+        session, welcome_page_html = get_welcome_page(prn, dob_day, dob_month_val, dob_year, user_full_name_for_check,
+                                                      streamed.__setitem__)
+        if not welcome_page_html:
+            return None
+        if len(streamed) == 2:
+            dashboard = dashboard_parser.streamed_dashboard(streamed["attendance"], streamed["cie"])
         else:
-            temp_soup_post = BeautifulSoup(welcome_page_html, "html.parser")
-            if temp_soup_post.find("form", {"id": "login-form"}):
-                print("Login FAILED. The page after POST still contains the login form.")
-                if "invalid username or password" in welcome_page_html.lower():
-                     print("Reason: Invalid username or password detected on page.")
-            else:
-                print("Login status uncertain. User identifier not found, dashboard elements not found, but it's not clearly the login page either.")
-        if not login_successful:
-            return None, None
-        return session, welcome_page_html
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP error occurred during login: {e}")
-        if e.response is not None: print(f"Response content (first 500 chars): {e.response.text[:500]}...")
-        return None, None
-    except requests.exceptions.RequestException as e:
-        print(f"A request error occurred during login: {e}")
-        return None, None
-    except Exception as e:
-        print(f"An unexpected error occurred during login: {e}")
-        return None, None
+            dashboard = parse_dashboard(welcome_page_html)
+        if config.PORTAL_FETCH_ATTENDANCE_DETAILS and dashboard.attendance:
+            fetch_attendance_details(session, prn, dashboard.attendance, welcome_page_html, stored_attendance)
+        # After parsing, so compression doesn't delay the data
+        html_archive.archive_page(prn, welcome_page_html)
+        return dashboard
+
+    key = (prn, credentials_key(dob_day, dob_month_val, dob_year))
+    dashboard = _dashboard_flight.do(key, fetch)
+    return copy.deepcopy(dashboard) if dashboard is not None else None
+
+def get_single_flight_stats():
+    """Leader / coalesced / reused counts for fetch_dashboard in this process."""
+    return _dashboard_flight.get_stats()
 
 def extract_attendance_from_welcome_page(welcome_page_html):
     if not welcome_page_html: return None
-    soup = BeautifulSoup(welcome_page_html, "html.parser")
-    attendance_data = []
-    found_data_script = False
-    scripts = soup.find_all("script")
-    for i, script in enumerate(scripts):
-        if script.string: 
-            script_content = script.string.strip()
-            if "gaugeTypeMulti" in script_content and "type: \"gauge\"" in script_content and "columns:" in script_content:
-                data_block_regex = r"data\s*:\s*(\{[\s\S]*?type\s*:\s*\"gauge\"[\s\S]*?\})"
-                data_block_match = re.search(data_block_regex, script_content, re.DOTALL)
-                if data_block_match:
-                    data_object_str = data_block_match.group(1) 
-                    columns_array_capture_regex = r"columns\s*:\s*(\[[\s\S]*?\])\s*,\s*type\s*:\s*\"gauge\""
-                    columns_match = re.search(columns_array_capture_regex, data_object_str, re.DOTALL)
-                    if columns_match:
-                        columns_the_actual_array_str = columns_match.group(1).strip() 
-                        pair_regex = r"\[\s*['\"]([^'\"]+)['\"]\s*,\s*(\d+)\s*\]"
-                        subject_value_pairs = re.findall(pair_regex, columns_the_actual_array_str)
-                        if subject_value_pairs:
-                            for subject, value in subject_value_pairs:
-                                attendance_data.append({"subject": subject.strip(), "percentage": int(value)})
-                            found_data_script = True 
-                            print("  Successfully parsed attendance data.")
-                            break 
-    if not found_data_script: 
-        print("\nCould not find or parse the specific attendance chart data.")
-        return None
-    return attendance_data
+    return dashboard_parser.parse_dashboard(welcome_page_html, want_cie=False).attendance
 
 def extract_cie_marks(welcome_page_html):
     if not welcome_page_html: return None
-    soup = BeautifulSoup(welcome_page_html, "html.parser")
-    cie_data = {} 
-    scripts = soup.find_all("script")
-    found_cie_script = False
-    for i, script in enumerate(scripts):
-        if script.string:
-            script_content = script.string.strip()
-            if "stackedBarChart_1" in script_content and "type: \"bar\"" in script_content and "categories:" in script_content:
-                chart_config_regex = r"bb\.generate\s*\(\s*(\{[\s\S]*?bindto\s*:\s*[\"']#stackedBarChart_1[\"'][\s\S]*?\}\s*)\s*\)\s*;"
-                bb_generate_match = re.search(chart_config_regex, script_content, re.DOTALL)
-                if bb_generate_match:
-                    chart_config_str = bb_generate_match.group(1)
-                    categories_match = re.search(r"categories\s*:\s*(\[[\s\S]*?\])", chart_config_str, re.DOTALL)
-                    subjects = []
-                    if categories_match:
-                        categories_str = categories_match.group(1)
-                        subjects = re.findall(r"['\"]([^'\"]+)['\"]", categories_str)
-                    else: continue 
-                    if not subjects: continue
-                    columns_data_match = re.search(r"columns\s*:\s*(\[[\s\S]*?\])\s*,\s*type\s*:\s*\"bar\"", chart_config_str, re.DOTALL)
-                    if columns_data_match:
-                        columns_str = columns_data_match.group(1)
-                        series_regex = r"\[\s*['\"]([^'\"]+)['\"]\s*([^\]]*)?\s*\]"
-                        all_series_matches = re.findall(series_regex, columns_str)
-                        for exam_type, marks_values_str in all_series_matches:
-                            parsed_marks = []
-                            if marks_values_str: 
-                                individual_mark_items = marks_values_str.strip(',').split(',')
-                                for mark_val_raw in individual_mark_items:
-                                    mark_val = mark_val_raw.strip()
-                                    if mark_val.lower() == 'null': parsed_marks.append(None)
-                                    elif mark_val.startswith('"') and mark_val.endswith('"'):
-                                        val_inside_quotes = mark_val[1:-1]
-                                        if val_inside_quotes.lower() == 'null': parsed_marks.append(None)
-                                        elif not val_inside_quotes: parsed_marks.append(None)
-                                        else:
-                                            try: parsed_marks.append(float(val_inside_quotes))
-                                            except ValueError: parsed_marks.append(val_inside_quotes) 
-                                    elif not mark_val: parsed_marks.append(None)
-                                    else: 
-                                        try: parsed_marks.append(float(mark_val))
-                                        except ValueError: parsed_marks.append(mark_val)
-                            for idx, subject_code in enumerate(subjects):
-                                if subject_code not in cie_data: cie_data[subject_code] = {}
-                                if idx < len(parsed_marks): cie_data[subject_code][exam_type] = parsed_marks[idx]
-                                else: cie_data[subject_code][exam_type] = None 
-                        found_cie_script = True 
-                        print(f"  Successfully parsed CIE marks for {len(subjects)} subjects and {len(all_series_matches)} exam types.")
-                        break 
-    if not found_cie_script:
-        print("\nCould not find or parse the CIE marks data from any script tag.")
-        return None
-    return cie_data
\ No newline at end of file
+    return dashboard_parser.parse_dashboard(welcome_page_html, want_attendance=False).cie_marks
+
+def parse_dashboard(welcome_page_html):
+    """
+    Extracts attendance and CIE marks together. Prefer this over calling
+    extract_attendance_from_welcome_page and extract_cie_marks back to back.
+
+    Returns:
+        DashboardData: with .attendance and .cie_marks (None when not found)
+    """
+    return dashboard_parser.parse_dashboard(welcome_page_html)
+
+def get_parse_path_stats():
+    """Counts of dashboard charts parsed by the fast path vs the BeautifulSoup fallback."""
+    return dashboard_parser.get_parse_path_stats()
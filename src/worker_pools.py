@@ -0,0 +1,121 @@
+# worker_pools.py
+"""
+Bounded thread pools for blocking work called from the async API.
+
+psycopg2 queries and CPU-bound parsing/archiving block the thread they run on, so the
+FastAPI routes hand them to a pool instead of running them on the event loop. The DB
+and scraper pools are sized separately (API_DB_POOL_SIZE, API_SCRAPER_POOL_SIZE) so a
+burst of slow portal work can't hold every thread while quick DB reads queue behind it.
+
+Each pool reports its queue depth, wait time (submit -> start) and run time; see
+get_stats(), exposed on /health.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import config
+
+
+class BoundedPool:
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        # Created on first use, and again after shutdown() (e.g. the app restarting in-process)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._counts = {"completed": 0, "failed": 0, "peak_queued": 0,
+                        "wait_seconds": 0.0, "max_wait_seconds": 0.0, "run_seconds": 0.0}
+
+    def _run(self, submitted_at, fn):
+        started_at = time.perf_counter()
+        waited = started_at - submitted_at
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._counts["wait_seconds"] += waited
+            self._counts["max_wait_seconds"] = max(self._counts["max_wait_seconds"], waited)
+        failed = True
+        try:
+            result = fn()
+            failed = False
+            return result
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._counts["failed" if failed else "completed"] += 1
+                self._counts["run_seconds"] += time.perf_counter() - started_at
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) on the pool and awaits its result. The caller's contextvars carry over."""
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.name}-pool")
+            executor = self._executor
+            self._queued += 1
+            self._counts["peak_queued"] = max(self._counts["peak_queued"], self._queued)
+        submitted_at = time.perf_counter()
+        try:
+            future = executor.submit(self._run, submitted_at, call)
+        except RuntimeError:
+            # shutdown() ran between picking the executor and submitting: the task never started
+            self._release_queued()
+            raise
+        # Cancelled before it started (the caller went away, or shutdown()): _run won't release it
+        future.add_done_callback(lambda done: done.cancelled() and self._release_queued())
+        return await asyncio.wrap_future(future)
+
+    def _release_queued(self):
+        with self._lock:
+            self._queued -= 1
+
+    def shutdown(self):
+        """Stops the current threads and cancels queued work. The next run() starts a new executor."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self):
+        with self._lock:
+            finished = self._counts["completed"] + self._counts["failed"]
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queued": self._queued,
+                "peak_queued": self._counts["peak_queued"],
+                "completed": self._counts["completed"],
+                "failed": self._counts["failed"],
+                "avg_wait_ms": round(self._counts["wait_seconds"] / finished * 1000, 2) if finished else 0.0,
+                "max_wait_ms": round(self._counts["max_wait_seconds"] * 1000, 2),
+                "avg_run_ms": round(self._counts["run_seconds"] / finished * 1000, 2) if finished else 0.0
+            }
+
+
+db_pool = BoundedPool("db", config.API_DB_POOL_SIZE)
+scraper_pool = BoundedPool("scraper", config.API_SCRAPER_POOL_SIZE)
+
+
+async def run_db(fn, *args, **kwargs):
+    """Runs a blocking database call on the DB pool."""
+    return await db_pool.run(fn, *args, **kwargs)
+
+
+async def run_scraper(fn, *args, **kwargs):
+    """Runs blocking scraper work (parsing, archiving, sync portal calls) on the scraper pool."""
+    return await scraper_pool.run(fn, *args, **kwargs)
+
+
+def shutdown():
+    db_pool.shutdown()
+    scraper_pool.shutdown()
+
+
+def get_stats():
+    return {"db": db_pool.get_stats(), "scraper": scraper_pool.get_stats()}
@@ -0,0 +1,121 @@
+"""
+Concurrency benchmark for the API's DB-backed endpoints: requests/s with blocking calls
+run inline on the event loop ("before") versus on the bounded worker pools ("after").
+
+Requests go through httpx's ASGI transport, so no server or port is needed. By default
+the db_utils functions the endpoints call are replaced by stand-ins that sleep for
+--db-latency-ms (a Neon round trip from a typical host) and return synthetic records;
+pass --real-db to hit the configured database instead (the usernames must exist).
+
+Run with:
+    python tests/benchmark_api_concurrency.py --requests 400 --concurrency 50 --db-latency-ms 40
+    python tests/benchmark_api_concurrency.py --real-db --usernames alice,bob
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fake_portal
+
+ENDPOINTS = ["/api/users/{username}", "/api/data/marks/{username}", "/api/analytics/performance/{username}"]
+
+
+def install_simulated_db(db_utils, latency_seconds):
+    """Replaces the read paths used by ENDPOINTS with blocking sleeps plus synthetic data."""
+    def get_user_from_db_pg(first_name_query):
+        time.sleep(latency_seconds)
+        index = int(first_name_query.removeprefix("student") or 0)
+        student = fake_portal.student_for_index(index)
+        return {"id": index + 1, "full_name": student["full_name"], "prn": student["prn"],
+                "dob_day": student["dob_day"], "dob_month": student["dob_month"], "dob_year": student["dob_year"]}
+
+    def get_user_current_cie_marks_pg(user_id):
+        time.sleep(latency_seconds)
+        return {code: {exam: float((user_id * 7 + i * 3 + j) % 20 + 1) for j, exam in enumerate(fake_portal.EXAMS[:3])}
+                for i, code in enumerate(fake_portal.SUBJECTS)}
+
+    db_utils.get_user_from_db_pg = get_user_from_db_pg
+    db_utils.get_user_current_cie_marks_pg = get_user_current_cie_marks_pg
+
+
+async def run_inline(fn, *args, **kwargs):
+    """The pre-pool behaviour: the blocking call runs on the event loop thread."""
+    return fn(*args, **kwargs)
+
+
+async def run_benchmark(app, usernames, args):
+    import httpx
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failures = 0
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one(i):
+            nonlocal failures
+            path = ENDPOINTS[i % len(ENDPOINTS)].format(username=usernames[i % len(usernames)])
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path)
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - start
+    return latencies, failures, elapsed
+
+
+def summarize(label, latencies, failures, elapsed):
+    ok = len(latencies)
+    print(f"\n📊 {label}")
+    print(f"  - Completed: {ok} ok, {failures} failed in {elapsed:.2f}s")
+    print(f"  - Throughput: {ok / elapsed:.1f} requests/s")
+    if latencies:
+        ordered = sorted(latencies)
+        print(f"  - Latency p50 {statistics.median(ordered) * 1000:.0f}ms, "
+              f"p95 {ordered[int(len(ordered) * 0.95) - 1] * 1000:.0f}ms, max {ordered[-1] * 1000:.0f}ms")
+    return ok / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--db-latency-ms", type=float, default=40)
+    parser.add_argument("--real-db", action="store_true", help="use the configured database instead of simulated latency")
+    parser.add_argument("--usernames", default="", help="comma-separated usernames (default: synthetic student0..99)")
+    args = parser.parse_args()
+
+    from src import api
+    from src import worker_pools
+
+    usernames = [u for u in args.usernames.split(",") if u] or [f"student{i}" for i in range(100)]
+    if not args.real_db:
+        install_simulated_db(api.db_utils, args.db_latency_ms / 1000)
+
+    pooled_run_db = worker_pools.run_db
+    results = {}
+    for label, run_db in (("inline (blocking the event loop)", run_inline), ("worker pools", pooled_run_db)):
+        worker_pools.run_db = run_db
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies, failures, elapsed = asyncio.run(run_benchmark(api.app, usernames, args))
+        results[label] = summarize(label, latencies, failures, elapsed)
+    worker_pools.run_db = pooled_run_db
+
+    before, after = results.values()
+    print(f"\n🚀 Speedup: {after / before:.1f}x with API_DB_POOL_SIZE={worker_pools.db_pool.max_workers}")
+    print(f"  - Pool stats: {worker_pools.get_stats()['db']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Parser benchmark suite over the dashboard fixture corpus.
+Reports parse time and peak memory per extractor, the speedup of parse_dashboard over the
+original full-soup extractors (tests/soup_baseline.py), and compares against a saved baseline.
+
+Run with:
+    python tests/benchmark_parsers.py                          # print results
+    python tests/benchmark_parsers.py --save-baseline base.json
+    python tests/benchmark_parsers.py --baseline base.json     # exit 1 on regression
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src import dashboard_parser
+from src import web_scraper
+import dashboard_fixtures
+import soup_baseline
+
+EXTRACTORS = {
+    "baseline_soup": soup_baseline.parse_dashboard,
+    "extract_attendance": web_scraper.extract_attendance_from_welcome_page,
+    "extract_cie_marks": web_scraper.extract_cie_marks,
+    "parse_dashboard": dashboard_parser.parse_dashboard,
+    "parse_dashboard_soup": dashboard_parser.parse_dashboard_soup,
+}
+
+
+def check_expected(corpus):
+    """Verifies parse_dashboard still produces the recorded results before timing anything."""
+    expected = dashboard_fixtures.load_expected()
+    failures = []
+    for name, want in expected.items():
+        got = dashboard_parser.parse_dashboard(corpus[name])
+        if got.attendance != want["attendance"] or got.cie_marks != want["cie_marks"]:
+            failures.append(name)
+
+    # Every page, synthetic ones included, must parse the same as with the original extractors
+    for name, html in corpus.items():
+        got = dashboard_parser.parse_dashboard(html)
+        if (got.attendance, got.cie_marks) != soup_baseline.parse_dashboard(html):
+            failures.append(f"{name} (vs baseline_soup)")
+
+    attendance_pages = dashboard_fixtures.load_attendance_pages()
+    for name, want in dashboard_fixtures.load_attendance_expected().items():
+        if name == "dashboard_with_links":
+            got = dashboard_parser.find_attendance_links(attendance_pages[name], list(want))
+        else:
+            got = dashboard_parser.parse_attendance_detail(attendance_pages[name])
+        if got != want:
+            failures.append(f"attendance/{name}")
+    return failures
+
+
+def measure(func, html, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"median_ms": round(statistics.median(timings) * 1000, 3), "peak_kb": round(peak / 1024, 1)}
+
+
+def run(corpus, repeat):
+    results = {}
+    for fixture_name, html in corpus.items():
+        runs = max(1, repeat // 5) if len(html) > 500_000 else repeat
+        for extractor_name, func in EXTRACTORS.items():
+            results[f"{fixture_name}/{extractor_name}"] = measure(func, html, runs)
+    return results
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """Returns a list of human-readable regressions versus the baseline."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        # Ignore noise on sub-millisecond cases
+        if current["median_ms"] > max(previous["median_ms"] * time_tolerance, previous["median_ms"] + 1):
+            regressions.append(f"{key}: {previous['median_ms']}ms -> {current['median_ms']}ms")
+        if current["peak_kb"] > max(previous["peak_kb"] * memory_tolerance, previous["peak_kb"] + 64):
+            regressions.append(f"{key}: {previous['peak_kb']}KB -> {current['peak_kb']}KB peak")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--no-synthetic", action="store_true", help="skip the generated multi-megabyte pages")
+    parser.add_argument("--baseline", type=Path, help="compare against this baseline file")
+    parser.add_argument("--save-baseline", type=Path, help="write the results to this baseline file")
+    parser.add_argument("--time-tolerance", type=float, default=1.5)
+    parser.add_argument("--memory-tolerance", type=float, default=1.25)
+    args = parser.parse_args()
+
+    corpus = dashboard_fixtures.load_corpus(include_synthetic=not args.no_synthetic)
+    with contextlib.redirect_stdout(io.StringIO()):
+        failures = check_expected(corpus)
+        results = run(corpus, args.repeat)
+    if failures:
+        print(f"❌ Parse results changed for: {', '.join(failures)}")
+        return 1
+
+    print(f"{'fixture / extractor':<58} {'median ms':>10} {'peak KB':>10}")
+    for key, result in results.items():
+        print(f"{key:<58} {result['median_ms']:>10.3f} {result['peak_kb']:>10.1f}")
+
+    print(f"\n{'parse_dashboard vs baseline_soup':<58} {'speedup':>10}")
+    for fixture_name in corpus:
+        fast = results[f"{fixture_name}/parse_dashboard"]["median_ms"]
+        baseline = results[f"{fixture_name}/baseline_soup"]["median_ms"]
+        print(f"{fixture_name:<58} {baseline / max(fast, 0.001):>9.1f}x")
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"\n✅ Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")),
+                              args.time_tolerance, args.memory_tolerance)
+        if regressions:
+            print("\n❌ Parser performance regressions:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\n✅ No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Per-endpoint response serialization benchmark: time to turn each endpoint's payload into
+body bytes with the stdlib encoder (the old JSONResponse path), with the configured fast
+encoder (FastJSONResponse), and, for the endpoints that now serve pre-serialized bodies,
+the per-request cost of reusing those bytes.
+
+The stdlib and fast columns cover what FastAPI does for a returned dict: jsonable_encoder,
+then render; the render column isolates the encoder itself (stdlib -> fast).
+Payloads are built from synthetic students (tests/fake_portal.py) and the real subject
+config, so no database or portal is needed.
+
+Run with:
+    python tests/benchmark_serialization.py
+    python tests/benchmark_serialization.py --iterations 5000 --leaderboard-size 500
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fake_portal
+
+
+def synthetic_student(index):
+    """(cie_marks, attendance records) for student #index, shaped like the DB getters return them."""
+    cie_marks = {code: {exam: float((index * 7 + i * 3 + j) % 20 + 1) for j, exam in enumerate(fake_portal.EXAMS)}
+                 for i, code in enumerate(fake_portal.SUBJECTS)}
+    attendance = [
+        {"subject": code, "percentage": round(present / conducted * 100, 2),
+         "present": present, "absent": conducted - present, "total": conducted}
+        for code, (present, conducted) in fake_portal.attendance_for(index).items()
+    ]
+    return cie_marks, attendance
+
+
+def build_payloads(api, config, leaderboard_size):
+    """{endpoint: (payload, precomputed body or None)}"""
+    from src import cgpa_calculator
+    from src import json_codec
+
+    cie_marks, attendance = synthetic_student(3)
+    semesters = [{"semester_number": n, "semester_name": f"Semester {n}", "sgpa": 7.5 + n / 10,
+                  "total_credits": 22, "academic_year": "2025-26", "created_at": "2026-01-10T09:00:00"}
+                 for n in (1, 2)]
+    leaderboard = [{"rank": i + 1, "username": f"student{i}", "full_name": f"Student {i}",
+                    "sgpa": round(9.5 - i * 0.01, 2), "total_credits": 32, "avg_attendance": 0}
+                   for i in range(leaderboard_size)]
+    subject_leaderboard = {"subject_code": fake_portal.SUBJECTS[0], "exam_type": "MSE",
+                           "leaderboard": [{"rank": i + 1, "name": f"Student {i}", "marks": 20.0 - i * 0.1}
+                                           for i in range(10)]}
+    subjects = {"subjects": config.SUBJECT_CODE_TO_NAME_MAP, "credits": config.SUBJECT_CREDITS}
+
+    return {
+        "/api/config/subjects": (subjects, api.subjects_body),
+        "/leaderboard": (leaderboard, json_codec.PrecomputedBody(leaderboard)),
+        "/api/leaderboard/{subject}/{exam}": (subject_leaderboard, json_codec.PrecomputedBody(subject_leaderboard)),
+        "/api/data/marks/{username}": ({"username": "student3", "cie_marks": cie_marks}, None),
+        "/api/cgpa/calculate/{username}": (cgpa_calculator.calculate_sgpa(cie_marks), None),
+        "/analytics/{username}": (api.combined_analytics_payload(cie_marks, semesters, attendance), None),
+    }
+
+
+def time_per_call(fn, iterations, repeats=5):
+    """Median microseconds per call over repeats runs of iterations calls."""
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        runs.append((time.perf_counter() - start) / iterations * 1_000_000)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--leaderboard-size", type=int, default=50, help="rows in the /leaderboard payload")
+    args = parser.parse_args()
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from src import api
+        from src import config
+        from src import json_codec
+    payloads = build_payloads(api, config, args.leaderboard_size)
+
+    encoder = json_codec.get_stats()["encoder"]
+    print(f"📊 Serialization per request (µs, median of 5 x {args.iterations}); fast encoder: {encoder}")
+    print(f"  {'endpoint':<36}{'bytes':>8}{'stdlib':>10}{encoder:>10}{'render':>16}{'precomp':>10}{'speedup':>10}")
+    for endpoint, (payload, precomputed) in payloads.items():
+        stdlib_us = time_per_call(lambda: JSONResponse(jsonable_encoder(payload)).body, args.iterations)
+        fast_us = time_per_call(lambda: json_codec.FastJSONResponse(jsonable_encoder(payload)).body, args.iterations)
+        encoded = jsonable_encoder(payload)
+        render_stdlib_us = time_per_call(lambda: JSONResponse(encoded).body, args.iterations)
+        render_fast_us = time_per_call(lambda: json_codec.FastJSONResponse(encoded).body, args.iterations)
+        render_column = f"{render_stdlib_us:.1f} -> {render_fast_us:.1f}"
+        best_us = fast_us
+        precomputed_column = "-"
+        if precomputed is not None:
+            precomputed_us = time_per_call(precomputed.response, args.iterations)
+            precomputed_column = f"{precomputed_us:.1f}"
+            best_us = precomputed_us
+        size = len(json_codec.dumps(encoded))
+        print(f"  {endpoint:<36}{size:>8}{stdlib_us:>10.1f}{fast_us:>10.1f}{render_column:>16}{precomputed_column:>10}"
+              f"{stdlib_us / best_us:>9.1f}x")
+
+    # The bytes must match what the stdlib path produced, modulo encoder formatting
+    for endpoint, (payload, precomputed) in payloads.items():
+        expected = json.loads(JSONResponse(jsonable_encoder(payload)).body)
+        assert json.loads(json_codec.FastJSONResponse(jsonable_encoder(payload)).body) == expected, endpoint
+        if precomputed is not None:
+            assert json.loads(precomputed.body) == expected, endpoint
+    print("\n✅ Fast and precomputed bodies decode to the same JSON as the stdlib path")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Shared pytest setup: one fake portal (tests/fake_portal.py) serves the whole session.
+src.config reads the environment at import time, so it is pointed at the fake portal
+here, before any test module imports from src.
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fake_portal
+
+# Script that writes to the real Prisma database; run it by hand
+collect_ignore = ["test_add_user.py"]
+
+_server, _portal, _login_url = fake_portal.start_fake_portal(students=200)
+os.environ["PORTAL_LOGIN_URL"] = _login_url
+os.environ["PORTAL_RATE_LIMIT_PER_SECOND"] = "0"
+os.environ["PORTAL_ARCHIVE_DIR"] = ""
+
+
+@pytest.fixture
+def portal():
+    """The session's FakePortal. Page options a test changes are reset afterwards."""
+    yield _portal
+    _portal.padding_rows = 0
+    _portal.extra_lectures = 0
+    _portal.links_after_charts = False
+    _portal.attendance_page_status = 200
+
+
+def student_args(index):
+    """(prn, dob_day, dob_month, dob_year, full_name) for fake_portal student #index."""
+    student = fake_portal.student_for_index(index)
+    return student["prn"], student["dob_day"], student["dob_month"], student["dob_year"], student["full_name"]
+
+
+@pytest.fixture
+def student():
+    """Returns student_args(index); use a different index per test, fetch results are cached per PRN."""
+    return student_args
@@ -0,0 +1,126 @@
+"""
+Dashboard fixture corpus for parser checks and benchmarks.
+Recorded pages live in tests/fixtures/dashboards (anonymized); very large pages are generated.
+Per-subject attendance pages (and a dashboard linking to them) live in tests/fixtures/attendance.
+"""
+import json
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "dashboards"
+EXPECTED_FILE = FIXTURES_DIR / "expected.json"
+ATTENDANCE_FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "attendance"
+
+
+def make_dashboard_html(num_subjects=10, filler_rows=2000, student_name="TEST STUDENT"):
+    """Builds a dashboard page shaped like the portal's, padded with filler markup."""
+    subjects = [f"CSC6{i:02d}" for i in range(num_subjects)]
+    gauge_columns = ",\n".join(f'["{code}", {60 + i % 40}]' for i, code in enumerate(subjects))
+    categories = ", ".join(f'"{code}"' for code in subjects)
+    mse = ", ".join(str(10 + i % 10) for i in range(num_subjects))
+    ise1 = ", ".join(f'"{20 + i % 30}"' for i in range(num_subjects))
+    ese = ", ".join("null" for _ in range(num_subjects))
+    filler = "\n".join(
+        f'<tr><td class="cell">Row {i}</td><td><a href="#r{i}">details</a></td></tr>' for i in range(filler_rows)
+    )
+    return f"""<html><head><title>Dashboard</title>
+<script src="/media/js/billboard.js"></script>
+<script>var analytics = {{ page: "dashboard" }};</script>
+</head><body>
+<div class="welcome">Welcome {student_name}</div>
+<table>{filler}</table>
+<div id="gaugeTypeMulti"></div>
+<script>
+var chart = bb.generate({{
+    data: {{
+        columns: [
+{gauge_columns}
+        ],
+        type: "gauge"
+    }},
+    bindto: "#gaugeTypeMulti"
+}});
+</script>
+<div id="stackedBarChart_1"></div>
+<script>
+var chart1 = bb.generate({{
+    data: {{
+        columns: [
+            ["MSE", {mse}],
+            ["TH-ISE1", {ise1}],
+            ["ESE", {ese}]
+        ],
+        type: "bar",
+        groups: [["MSE", "TH-ISE1", "ESE"]]
+    }},
+    axis: {{ x: {{ type: "category", categories: [{categories}] }} }},
+    bindto: "#stackedBarChart_1"
+}});
+</script>
+<table>{filler}</table>
+</body></html>"""
+
+
+def make_backtracking_html(repeats=1000):
+    """
+    A page whose gauge script passes the marker checks but is full of unterminated
+    'data: {' blocks, the worst case for the lazy [\\s\\S]*? patterns.
+    """
+    noise = "\n".join(f'    data: {{ label: "item {i}", values: [{i}, {i + 1}]' for i in range(repeats))
+    return f"""<html><body>
+<div id="gaugeTypeMulti"></div>
+<script>
+var gaugeTarget = "#gaugeTypeMulti"; // type: "gauge", columns: filled in below
+var broken = {{
+{noise}
+}};
+</script>
+</body></html>"""
+
+
+def make_cie_backtracking_html(repeats=1000):
+    """The CIE counterpart: a bar chart script full of 'bb.generate({' calls that never bind."""
+    noise = "\n".join(f'bb.generate({{ data: {{ columns: [["S{i}", {i}]] }}' for i in range(repeats))
+    return f"""<html><body>
+<div id="stackedBarChart_1"></div>
+<script>
+// type: "bar", categories: filled in by the chart for #stackedBarChart_1
+{noise}
+</script>
+</body></html>"""
+
+
+def load_recorded():
+    """Returns {fixture_name: html} for the recorded pages."""
+    return {path.stem: path.read_text(encoding="utf-8") for path in sorted(FIXTURES_DIR.glob("*.html"))}
+
+
+def load_synthetic():
+    """Returns {fixture_name: html} for generated pages too large to keep in the repo."""
+    return {
+        "synthetic_1mb": make_dashboard_html(16, 6500),
+        "synthetic_5mb": make_dashboard_html(16, 32000),
+        "synthetic_backtracking": make_backtracking_html(),
+        "synthetic_backtracking_cie": make_cie_backtracking_html(),
+    }
+
+
+def load_corpus(include_synthetic=True):
+    corpus = load_recorded()
+    if include_synthetic:
+        corpus.update(load_synthetic())
+    return corpus
+
+
+def load_expected():
+    """Expected parse results for the recorded pages: {name: {"attendance": ..., "cie_marks": ...}}."""
+    return json.loads(EXPECTED_FILE.read_text(encoding="utf-8"))
+
+
+def load_attendance_pages():
+    """Returns {fixture_name: html} for the attendance detail fixtures."""
+    return {path.stem: path.read_text(encoding="utf-8") for path in sorted(ATTENDANCE_FIXTURES_DIR.glob("*.html"))}
+
+
+def load_attendance_expected():
+    """Expected counts per detail page, and the expected {subject: href} for dashboard_with_links."""
+    return json.loads((ATTENDANCE_FIXTURES_DIR / "expected.json").read_text(encoding="utf-8"))
@@ -0,0 +1,391 @@
+"""
+Fake Contineo portal for offline end-to-end and load testing.
+
+Serves form#login-form with hidden fields, accepts the PRN/dd/mm/yyyy/passwd POST and
+returns a dashboard with the gaugeTypeMulti and stackedBarChart_1 scripts for a synthetic
+cohort of students, plus a per-subject attendance page (task=attendencelist) linked from
+the dashboard. Latency, error rate and rate limiting are configurable.
+
+Run with:
+    python tests/fake_portal.py --port 8765 --students 5000 --latency-ms 150 --error-rate 0.01
+Then point the scraper at it:
+    PORTAL_LOGIN_URL="http://127.0.0.1:8765/parents/index.php" python run_api.py
+"""
+import argparse
+import json
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+PORTAL_PATH = "/parents/index.php"
+SESSION_COOKIE = "fakeportal_sid"
+SUBJECTS = ["25PCC13CE11", "25PCC13CE12", "25PCC13CE13", "25PCC13CE14", "25PEC13CE16", "25MDM42", "25PECL13CE14", "25OE13CE43"]
+EXAMS = ["MSE", "TH-ISE1", "TH-ISE2", "ESE"]
+
+
+def student_for_index(index):
+    """Deterministic synthetic student #index: PRN, DOB and full name."""
+    rng = random.Random(index)
+    return {
+        "username": f"student{index}",
+        "prn": f"MU{index:016d}",
+        "full_name": f"SYNTHETIC STUDENT {index}",
+        "dob_day": f"{rng.randint(1, 28):02d}",
+        "dob_month": f"{rng.randint(1, 12):02d}",
+        "dob_year": str(rng.randint(2002, 2006)),
+    }
+
+
+def attendance_for(index, extra_lectures=0):
+    """{subject: (present, conducted)} for student #index; extra_lectures are all attended."""
+    rng = random.Random(index * 104729)
+    attendance = {}
+    for code in SUBJECTS:
+        conducted = rng.randint(20, 45)
+        present = rng.randint(conducted // 3, conducted)
+        attendance[code] = (present + extra_lectures, conducted + extra_lectures)
+    return attendance
+
+
+def attendance_link(code):
+    return f"{PORTAL_PATH}?option=com_studentdashboard&amp;controller=studentdashboard&amp;task=attendencelist&amp;subject={quote(code)}"
+
+
+def render_attendance_detail(index, student, code, extra_lectures=0):
+    present, conducted = attendance_for(index, extra_lectures)[code]
+    statuses = ["P"] * present + ["A"] * (conducted - present)
+    random.Random(f"{index}-{code}").shuffle(statuses)
+    rows = "\n".join(f'<tr><td>{n + 1}</td><td>Lecture {n + 1}</td><td>{status}</td></tr>'
+                     for n, status in enumerate(statuses))
+    return f"""<!DOCTYPE html>
+<html lang="en-gb"><head><meta charset="utf-8"><title>Attendance Details</title></head>
+<body class="site com_studentdashboard">
+<div class="cn-stu-data"><span class="name">Welcome, {student["full_name"]}</span></div>
+<h3>Attendance: {code}</h3>
+<table class="uk-table cn-attend-list">
+<thead><tr><th>#</th><th>Lecture</th><th>Status</th></tr></thead>
+<tbody>
+{rows}
+</tbody>
+</table>
+</body></html>"""
+
+
+# What Joomla shows for a wrong password vs a stale/missing form token
+LOGIN_ERRORS = {
+    "credentials": "Invalid username or password",
+    "token": "The most recent request was denied because it contained an invalid security token. "
+             "Please refresh the page and try again."
+}
+
+
+def render_login_page(form_token, error=None):
+    message = f'<div class="alert alert-error">{LOGIN_ERRORS[error]}</div>' if error else ""
+    return f"""<!DOCTYPE html>
+<html lang="en-gb"><head><meta charset="utf-8"><title>Parent Login</title></head>
+<body class="site com_users view-login">
+<div id="system-message-container">{message}</div>
+<form action="{PORTAL_PATH}" method="post" id="login-form" class="form-inline">
+  <input type="text" name="username" id="username">
+  <select name="dd"></select><select name="mm"></select><select name="yyyy"></select>
+  <input type="hidden" name="passwd" value="">
+  <input type="hidden" name="option" value="com_users">
+  <input type="hidden" name="task" value="user.login">
+  <input type="hidden" name="{form_token}" value="1">
+  <button type="submit">Log in</button>
+</form>
+</body></html>"""
+
+
+def render_dashboard(index, student, padding_rows=0, extra_lectures=0, links_after_charts=False):
+    rng = random.Random(index * 7919)
+    attendance = attendance_for(index, extra_lectures)
+    gauge = ",\n".join(f'            ["{code}", {round(100 * present / conducted)}]'
+                       for code, (present, conducted) in attendance.items())
+    attendance_rows = "\n".join(f'<tr><td><a href="{attendance_link(code)}">{code}</a></td></tr>' for code in SUBJECTS)
+    links_table = f'<table class="cn-attend-subjects">\n{attendance_rows}\n</table>'
+    series = []
+    for exam in EXAMS:
+        values = []
+        for _ in SUBJECTS:
+            if exam == "ESE" or rng.random() < 0.1:
+                values.append("null")
+            else:
+                values.append(str(round(rng.uniform(5, 20), 1)))
+        series.append(f'            ["{exam}", {", ".join(values)}]')
+    columns = ",\n".join(series)
+    categories = ", ".join(f'"{code}"' for code in SUBJECTS)
+    padding = "\n".join(f'<tr><td>Notice {i}</td><td><a href="#n{i}">read</a></td></tr>' for i in range(padding_rows))
+    return f"""<!DOCTYPE html>
+<html lang="en-gb"><head><meta charset="utf-8"><title>Student Dashboard</title>
+<script src="/parents/media/js/billboard.min.js"></script>
+</head>
+<body class="site com_studentdashboard">
+<div class="cn-stu-data"><span class="name">Welcome, {student["full_name"]}</span></div>
+{"" if links_after_charts else links_table}
+<div id="gaugeTypeMulti"></div>
+<div id="stackedBarChart_1"></div>
+<script>
+var chart = bb.generate({{
+    data: {{
+        columns: [
+{gauge}
+        ],
+        type: "gauge"
+    }},
+    gauge: {{ type: "multi", max: 100 }},
+    bindto: "#gaugeTypeMulti"
+}});
+</script>
+<script>
+var chart1 = bb.generate({{
+    data: {{
+        columns: [
+{columns}
+        ],
+        type: "bar",
+        groups: [["MSE", "TH-ISE1", "TH-ISE2", "ESE"]]
+    }},
+    axis: {{ x: {{ type: "category", categories: [{categories}] }} }},
+    bindto: "#stackedBarChart_1"
+}});
+</script>
+<table class="notices">{padding}</table>
+{links_table if links_after_charts else ""}
+</body></html>"""
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class FakePortal:
+    """Portal state shared by all request handlers."""
+
+    def __init__(self, students=1000, latency_ms=0, jitter_ms=0, error_rate=0.0,
+                 rate_limit=0.0, burst=10, per_request_token=False, padding_rows=0, extra_lectures=0,
+                 links_after_charts=False):
+        self.students = {}
+        for index in range(students):
+            student = student_for_index(index)
+            self.students[student["prn"]] = (index, student)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit > 0 else None
+        self.per_request_token = per_request_token
+        self.padding_rows = padding_rows
+        # Put the attendance detail links after the charts and padding, at the end of the page
+        self.links_after_charts = links_after_charts
+        # Bump at runtime to simulate new lectures (moves every gauge)
+        self.extra_lectures = extra_lectures
+        # Set at runtime to make every attendance detail page fail with this status
+        self.attendance_page_status = 200
+        self.static_token = secrets.token_hex(16)
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.stats = {"login_pages": 0, "logins_ok": 0, "logins_failed": 0, "dashboards": 0,
+                      "attendance_pages": 0, "errors_injected": 0, "rate_limited": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def new_session(self, form_token=None, prn=None):
+        sid = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[sid] = {"form_token": form_token, "prn": prn}
+        return sid
+
+    def get_session(self, sid):
+        with self.lock:
+            return self.sessions.get(sid)
+
+    def authenticate(self, form):
+        def field(name):
+            return form.get(name, [""])[0]
+
+        entry = self.students.get(field("username"))
+        if not entry:
+            return None
+        index, student = entry
+        expected_password = f"{student['dob_year']}-{student['dob_month']}-{student['dob_day']}"
+        if (field("dd").zfill(2), field("mm").zfill(2), field("yyyy")) != (student["dob_day"], student["dob_month"], student["dob_year"]):
+            return None
+        if field("passwd") != expected_password:
+            return None
+        return index, student
+
+
+def make_handler(portal):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _session_id(self):
+            for part in self.headers.get("Cookie", "").split(";"):
+                name, _, value = part.strip().partition("=")
+                if name == SESSION_COOKIE:
+                    return value
+            return None
+
+        def get_session_or_none(self):
+            sid = self._session_id()
+            return portal.get_session(sid) if sid else None
+
+        def _send(self, status, body, cookie=None):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            if cookie:
+                self.send_header("Set-Cookie", f"{SESSION_COOKIE}={cookie}; Path=/; HttpOnly")
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _simulate_network(self):
+            """Applies latency, rate limiting and injected errors. Returns False if the request was answered."""
+            delay = portal.latency_ms + (random.uniform(-portal.jitter_ms, portal.jitter_ms) if portal.jitter_ms else 0)
+            if delay > 0:
+                time.sleep(delay / 1000)
+            if portal.bucket and not portal.bucket.take():
+                portal.count("rate_limited")
+                self._send(429, "<h1>Too Many Requests</h1>")
+                return False
+            if portal.error_rate and random.random() < portal.error_rate:
+                portal.count("errors_injected")
+                self._send(503, "<h1>Service Unavailable</h1>")
+                return False
+            return True
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != PORTAL_PATH:
+                self._send(404, "<h1>Not Found</h1>")
+                return
+            if not self._simulate_network():
+                return
+            session = self.get_session_or_none()
+            if session and session["prn"]:
+                index, student = portal.students[session["prn"]]
+                query = parse_qs(url.query)
+                if query.get("task") == ["attendencelist"]:
+                    code = query.get("subject", [""])[0]
+                    if code not in SUBJECTS:
+                        self._send(404, "<h1>Unknown subject</h1>")
+                        return
+                    portal.count("attendance_pages")
+                    if portal.attendance_page_status != 200:
+                        self._send(portal.attendance_page_status, "<h1>Attendance unavailable</h1>")
+                        return
+                    self._send(200, render_attendance_detail(index, student, code, portal.extra_lectures))
+                    return
+                portal.count("dashboards")
+                self._send(200, render_dashboard(index, student, portal.padding_rows, portal.extra_lectures,
+                                                 portal.links_after_charts))
+                return
+            portal.count("login_pages")
+            form_token = secrets.token_hex(16) if portal.per_request_token else portal.static_token
+            sid = portal.new_session(form_token=form_token)
+            self._send(200, render_login_page(form_token), cookie=sid)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            form = parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True)
+            if urlparse(self.path).path != PORTAL_PATH:
+                self._send(404, "<h1>Not Found</h1>")
+                return
+            if not self._simulate_network():
+                return
+            if portal.per_request_token:
+                session = self.get_session_or_none()
+                token_ok = session is not None and session["form_token"] in form
+            else:
+                token_ok = portal.static_token in form
+            authenticated = portal.authenticate(form) if token_ok else None
+            if not authenticated:
+                portal.count("logins_failed")
+                form_token = secrets.token_hex(16) if portal.per_request_token else portal.static_token
+                sid = portal.new_session(form_token=form_token)
+                self._send(200, render_login_page(form_token, error="credentials" if token_ok else "token"), cookie=sid)
+                return
+            index, student = authenticated
+            portal.count("logins_ok")
+            sid = portal.new_session(prn=student["prn"])
+            self._send(200, render_dashboard(index, student, portal.padding_rows, portal.extra_lectures,
+                                             portal.links_after_charts), cookie=sid)
+
+    return Handler
+
+
+def start_fake_portal(host="127.0.0.1", port=0, **options):
+    """Starts the portal in a background thread. Returns (server, portal, login_url)."""
+    portal = FakePortal(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(portal))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, portal, f"http://{host}:{server.server_port}{PORTAL_PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Contineo portal for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests/second before answering 429 (0 = off)")
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--per-request-token", action="store_true", help="bind the hidden form token to the GET session")
+    parser.add_argument("--padding-rows", type=int, default=0, help="extra markup after the charts")
+    parser.add_argument("--links-after-charts", action="store_true",
+                        help="put the attendance detail links at the end of the dashboard")
+    parser.add_argument("--dump-cohort", help="write the synthetic students to this JSON file and exit")
+    args = parser.parse_args()
+
+    if args.dump_cohort:
+        with open(args.dump_cohort, "w", encoding="utf-8") as f:
+            json.dump([student_for_index(i) for i in range(args.students)], f, indent=2)
+        print(f"✅ Wrote {args.students} students to {args.dump_cohort}")
+        return
+
+    server, portal, login_url = start_fake_portal(
+        args.host, args.port, students=args.students, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, rate_limit=args.rate_limit, burst=args.burst,
+        per_request_token=args.per_request_token, padding_rows=args.padding_rows,
+        links_after_charts=args.links_after_charts
+    )
+    print(f"🚀 Fake portal with {args.students} students at {login_url}")
+    print(f'   export PORTAL_LOGIN_URL="{login_url}"')
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   stats: {portal.stats}")
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"\nFinal stats: {portal.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Load test of the login + fetch + parse pipeline against the fake portal.
+
+Run with:
+    python tests/load_test_pipeline.py --mode sync --requests 500 --concurrency 20 --latency-ms 100
+    python tests/load_test_pipeline.py --mode async --requests 2000 --concurrency 100
+    python tests/load_test_pipeline.py --mode api --api-url http://127.0.0.1:8000 --requests 200
+In api mode the API must already be running with PORTAL_LOGIN_URL pointing at a fake portal
+and the cohort registered (see fake_portal.py --dump-cohort).
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fake_portal
+
+
+def summarize(label, latencies, failures, elapsed):
+    ok = len(latencies)
+    print(f"\n📊 {label}")
+    print(f"  - Completed: {ok} ok, {failures} failed in {elapsed:.2f}s")
+    print(f"  - Throughput: {ok / elapsed:.1f} fetches/s")
+    if latencies:
+        ordered = sorted(latencies)
+        print(f"  - Latency p50 {statistics.median(ordered) * 1000:.0f}ms, "
+              f"p95 {ordered[int(len(ordered) * 0.95) - 1] * 1000:.0f}ms, max {ordered[-1] * 1000:.0f}ms")
+
+
+def run_sync(students, args):
+    from src import web_scraper
+
+    def fetch_one(student):
+        start = time.perf_counter()
+        _, html = web_scraper.get_welcome_page(
+            student["prn"], student["dob_day"], student["dob_month"], student["dob_year"], student["full_name"]
+        )
+        dashboard = web_scraper.parse_dashboard(html) if html else None
+        ok = bool(dashboard and dashboard.cie_marks and dashboard.attendance)
+        return ok, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        return list(pool.map(fetch_one, students))
+
+
+def run_async(students, args):
+    from src import async_scraper
+    from src import web_scraper
+
+    async def main():
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def fetch_one(student):
+            async with semaphore:
+                start = time.perf_counter()
+                _, html = await async_scraper.get_welcome_page(
+                    student["prn"], student["dob_day"], student["dob_month"], student["dob_year"], student["full_name"]
+                )
+                dashboard = web_scraper.parse_dashboard(html) if html else None
+                ok = bool(dashboard and dashboard.cie_marks and dashboard.attendance)
+                return ok, time.perf_counter() - start
+
+        try:
+            return await asyncio.gather(*(fetch_one(student) for student in students))
+        finally:
+            await async_scraper.close()
+
+    return asyncio.run(main())
+
+
+def run_api(students, args):
+    import httpx
+
+    async def main():
+        semaphore = asyncio.Semaphore(args.concurrency)
+        async with httpx.AsyncClient(base_url=args.api_url, timeout=120) as client:
+            async def fetch_one(student):
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post(f"/api/data/fetch/{student['username']}")
+                    return response.status_code == 200, time.perf_counter() - start
+
+            return await asyncio.gather(*(fetch_one(student) for student in students))
+
+    return asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the scrape pipeline against the fake portal")
+    parser.add_argument("--mode", choices=["sync", "async", "api"], default="sync")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--portal-url", help="use an already running fake portal instead of starting one")
+    parser.add_argument("--api-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="portal-side limit (answers 429)")
+    parser.add_argument("--client-rate", type=float,
+                        help="client token bucket rate, PORTAL_RATE_LIMIT_PER_SECOND (default: as configured, 0 = off)")
+    args = parser.parse_args()
+
+    if args.client_rate is not None:
+        os.environ["PORTAL_RATE_LIMIT_PER_SECOND"] = str(args.client_rate)
+    portal = None
+    if args.mode != "api" and not args.portal_url:
+        _, portal, login_url = fake_portal.start_fake_portal(
+            students=args.students, latency_ms=args.latency_ms, error_rate=args.error_rate, rate_limit=args.rate_limit
+        )
+        os.environ["PORTAL_LOGIN_URL"] = login_url
+        print(f"🚀 Started fake portal at {login_url}")
+    elif args.portal_url:
+        os.environ["PORTAL_LOGIN_URL"] = args.portal_url
+
+    students = [fake_portal.student_for_index(i % args.students) for i in range(args.requests)]
+    runner = {"sync": run_sync, "async": run_async, "api": run_api}[args.mode]
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = runner(students, args)
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for ok, latency in results if ok]
+    summarize(f"{args.mode} mode, concurrency {args.concurrency}", latencies, len(results) - len(latencies), elapsed)
+    if portal:
+        print(f"  - Portal stats: {portal.stats}")
+
+
+if __name__ == "__main__":
+    main()
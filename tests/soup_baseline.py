@@ -0,0 +1,99 @@
+"""
+The chart extractors as they were before the regex fast path and the SoupStrainer rewrite:
+a full BeautifulSoup parse of the page, then the original unbounded regexes on every
+script. Kept verbatim (minus the prints) as the reference the parser benchmarks
+compare against; nothing in src/ uses them.
+"""
+import re
+
+from bs4 import BeautifulSoup
+
+
+def extract_attendance_from_welcome_page(welcome_page_html):
+    if not welcome_page_html: return None
+    soup = BeautifulSoup(welcome_page_html, "html.parser")
+    attendance_data = []
+    found_data_script = False
+    scripts = soup.find_all("script")
+    for i, script in enumerate(scripts):
+        if script.string:
+            script_content = script.string.strip()
+            if "gaugeTypeMulti" in script_content and "type: \"gauge\"" in script_content and "columns:" in script_content:
+                data_block_regex = r"data\s*:\s*(\{[\s\S]*?type\s*:\s*\"gauge\"[\s\S]*?\})"
+                data_block_match = re.search(data_block_regex, script_content, re.DOTALL)
+                if data_block_match:
+                    data_object_str = data_block_match.group(1)
+                    columns_array_capture_regex = r"columns\s*:\s*(\[[\s\S]*?\])\s*,\s*type\s*:\s*\"gauge\""
+                    columns_match = re.search(columns_array_capture_regex, data_object_str, re.DOTALL)
+                    if columns_match:
+                        columns_the_actual_array_str = columns_match.group(1).strip()
+                        pair_regex = r"\[\s*['\"]([^'\"]+)['\"]\s*,\s*(\d+)\s*\]"
+                        subject_value_pairs = re.findall(pair_regex, columns_the_actual_array_str)
+                        if subject_value_pairs:
+                            for subject, value in subject_value_pairs:
+                                attendance_data.append({"subject": subject.strip(), "percentage": int(value)})
+                            found_data_script = True
+                            break
+    if not found_data_script:
+        return None
+    return attendance_data
+
+
+def extract_cie_marks(welcome_page_html):
+    if not welcome_page_html: return None
+    soup = BeautifulSoup(welcome_page_html, "html.parser")
+    cie_data = {}
+    scripts = soup.find_all("script")
+    found_cie_script = False
+    for i, script in enumerate(scripts):
+        if script.string:
+            script_content = script.string.strip()
+            if "stackedBarChart_1" in script_content and "type: \"bar\"" in script_content and "categories:" in script_content:
+                chart_config_regex = r"bb\.generate\s*\(\s*(\{[\s\S]*?bindto\s*:\s*[\"']#stackedBarChart_1[\"'][\s\S]*?\}\s*)\s*\)\s*;"
+                bb_generate_match = re.search(chart_config_regex, script_content, re.DOTALL)
+                if bb_generate_match:
+                    chart_config_str = bb_generate_match.group(1)
+                    categories_match = re.search(r"categories\s*:\s*(\[[\s\S]*?\])", chart_config_str, re.DOTALL)
+                    subjects = []
+                    if categories_match:
+                        categories_str = categories_match.group(1)
+                        subjects = re.findall(r"['\"]([^'\"]+)['\"]", categories_str)
+                    else: continue
+                    if not subjects: continue
+                    columns_data_match = re.search(r"columns\s*:\s*(\[[\s\S]*?\])\s*,\s*type\s*:\s*\"bar\"", chart_config_str, re.DOTALL)
+                    if columns_data_match:
+                        columns_str = columns_data_match.group(1)
+                        series_regex = r"\[\s*['\"]([^'\"]+)['\"]\s*([^\]]*)?\s*\]"
+                        all_series_matches = re.findall(series_regex, columns_str)
+                        for exam_type, marks_values_str in all_series_matches:
+                            parsed_marks = []
+                            if marks_values_str:
+                                individual_mark_items = marks_values_str.strip(',').split(',')
+                                for mark_val_raw in individual_mark_items:
+                                    mark_val = mark_val_raw.strip()
+                                    if mark_val.lower() == 'null': parsed_marks.append(None)
+                                    elif mark_val.startswith('"') and mark_val.endswith('"'):
+                                        val_inside_quotes = mark_val[1:-1]
+                                        if val_inside_quotes.lower() == 'null': parsed_marks.append(None)
+                                        elif not val_inside_quotes: parsed_marks.append(None)
+                                        else:
+                                            try: parsed_marks.append(float(val_inside_quotes))
+                                            except ValueError: parsed_marks.append(val_inside_quotes)
+                                    elif not mark_val: parsed_marks.append(None)
+                                    else:
+                                        try: parsed_marks.append(float(mark_val))
+                                        except ValueError: parsed_marks.append(mark_val)
+                            for idx, subject_code in enumerate(subjects):
+                                if subject_code not in cie_data: cie_data[subject_code] = {}
+                                if idx < len(parsed_marks): cie_data[subject_code][exam_type] = parsed_marks[idx]
+                                else: cie_data[subject_code][exam_type] = None
+                        found_cie_script = True
+                        break
+    if not found_cie_script:
+        return None
+    return cie_data
+
+
+def parse_dashboard(welcome_page_html):
+    """(attendance, cie_marks) the way the API got them before: two full soup parses."""
+    return extract_attendance_from_welcome_page(welcome_page_html), extract_cie_marks(welcome_page_html)
@@ -0,0 +1,170 @@
+"""
+Every attendance record must get its present/absent/total counts from the detail pages,
+wherever the portal puts the links, with and without streaming the dashboard. When the
+detail pages fail, stored counts are kept for subjects whose gauge hasn't moved.
+A streamed download stops after the charts unless the links are still to come.
+"""
+import asyncio
+
+import pytest
+
+import fake_portal
+from src import async_scraper
+from src import config
+from src import scrape_metrics
+from src import web_scraper
+
+
+def assert_counts_filled(dashboard, index):
+    assert dashboard is not None
+    expected = fake_portal.attendance_for(index)
+    assert [record["subject"] for record in dashboard.attendance] == list(expected)
+    for record in dashboard.attendance:
+        present, conducted = expected[record["subject"]]
+        assert (record["present"], record["absent"], record["total"]) == (present, conducted - present, conducted), record["subject"]
+
+
+@pytest.fixture(params=[True, False], ids=["streamed", "buffered"])
+def stream_dashboard(request, monkeypatch):
+    monkeypatch.setattr(config, "PORTAL_STREAM_DASHBOARD", request.param)
+    return request.param
+
+
+# Each case uses its own students: fetched pages and detail counts are cached per PRN
+@pytest.mark.parametrize("links_after_charts, padding_rows, index", [
+    (False, 0, 10),
+    (True, 0, 12),
+    # Charts in the first chunks, links tens of kilobytes later
+    (True, 2000, 14),
+])
+def test_sync_fetch_fills_detail_counts(portal, student, stream_dashboard, links_after_charts, padding_rows, index):
+    portal.links_after_charts = links_after_charts
+    portal.padding_rows = padding_rows
+    index += int(stream_dashboard)
+    assert_counts_filled(web_scraper.fetch_dashboard(*student(index)), index)
+
+
+@pytest.mark.parametrize("links_after_charts, padding_rows, index", [
+    (False, 0, 20),
+    (True, 0, 22),
+    (True, 2000, 24),
+])
+def test_async_fetch_fills_detail_counts(portal, student, stream_dashboard, links_after_charts, padding_rows, index):
+    portal.links_after_charts = links_after_charts
+    portal.padding_rows = padding_rows
+    index += int(stream_dashboard)
+
+    async def fetch():
+        try:
+            return await async_scraper.fetch_dashboard(*student(index))
+        finally:
+            await async_scraper.close()
+
+    assert_counts_filled(asyncio.run(fetch()), index)
+
+
+@pytest.fixture
+def download_spans():
+    spans = []
+
+    def record(finished):
+        if finished.name == "dashboard.download":
+            spans.append(finished)
+
+    scrape_metrics.add_hook(record)
+    yield spans
+    scrape_metrics.remove_hook(record)
+
+
+@pytest.mark.parametrize("links_after_charts, index", [(False, 50), (True, 52)])
+@pytest.mark.parametrize("use_async", [False, True], ids=["sync", "async"])
+def test_streamed_download_stops_once_nothing_else_is_needed(portal, student, monkeypatch, download_spans,
+                                                             links_after_charts, index, use_async):
+    monkeypatch.setattr(config, "PORTAL_STREAM_DASHBOARD", True)
+    portal.links_after_charts = links_after_charts
+    portal.padding_rows = 5000
+    index += int(use_async)
+
+    if use_async:
+        async def fetch():
+            try:
+                return await async_scraper.fetch_dashboard(*student(index))
+            finally:
+                await async_scraper.close()
+        dashboard = asyncio.run(fetch())
+    else:
+        dashboard = web_scraper.fetch_dashboard(*student(index))
+
+    assert_counts_filled(dashboard, index)
+    page_size = len(fake_portal.render_dashboard(index, fake_portal.student_for_index(index), 5000,
+                                                 links_after_charts=links_after_charts).encode())
+    [download] = download_spans
+    # Links after the charts mean the whole page is needed to find them
+    assert download.attributes["stopped_early"] is not links_after_charts
+    if links_after_charts:
+        assert download.bytes == page_size
+    else:
+        assert download.bytes < page_size // 4
+
+
+def stored_rows(index, moved=()):
+    """Attendance rows as the DB getters return them; subjects in moved were saved at an older gauge value."""
+    return [
+        {"subject": code, "percentage": float(round(100 * present / conducted)) - (code in moved),
+         "present": present, "absent": conducted - present, "total": conducted}
+        for code, (present, conducted) in fake_portal.attendance_for(index).items()
+    ]
+
+
+def assert_stored_counts_kept(dashboard, index, moved):
+    expected = {row["subject"]: row for row in stored_rows(index)}
+    for record in dashboard.attendance:
+        counts = (record["present"], record["absent"], record["total"])
+        if record["subject"] in moved:
+            assert counts == (None, None, None), record["subject"]
+        else:
+            stored = expected[record["subject"]]
+            assert counts == (stored["present"], stored["absent"], stored["total"]), record["subject"]
+
+
+def test_sync_fetch_keeps_stored_counts_when_detail_pages_fail(portal, student):
+    portal.attendance_page_status = 404
+    moved = {fake_portal.SUBJECTS[0]}
+    dashboard = web_scraper.fetch_dashboard(*student(30), stored_rows(30, moved))
+    assert_stored_counts_kept(dashboard, 30, moved)
+
+
+def test_async_fetch_keeps_stored_counts_when_detail_pages_fail(portal, student):
+    portal.attendance_page_status = 404
+    moved = {fake_portal.SUBJECTS[1]}
+
+    async def fetch():
+        try:
+            return await async_scraper.fetch_dashboard(*student(31), stored_rows(31, moved))
+        finally:
+            await async_scraper.close()
+
+    assert_stored_counts_kept(asyncio.run(fetch()), 31, moved)
+
+
+def test_sync_fetch_only_fetches_detail_pages_whose_gauge_moved(portal, student):
+    moved = {fake_portal.SUBJECTS[0], fake_portal.SUBJECTS[2]}
+    pages_before = portal.stats["attendance_pages"]
+    dashboard = web_scraper.fetch_dashboard(*student(32), stored_rows(32, moved))
+    assert portal.stats["attendance_pages"] - pages_before == len(moved)
+    assert_counts_filled(dashboard, 32)
+
+
+def test_async_fetch_only_fetches_detail_pages_whose_gauge_moved(portal, student):
+    moved = {fake_portal.SUBJECTS[1]}
+    pages_before = portal.stats["attendance_pages"]
+
+    async def fetch():
+        try:
+            return await async_scraper.fetch_dashboard(*student(33), stored_rows(33, moved))
+        finally:
+            await async_scraper.close()
+
+    dashboard = asyncio.run(fetch())
+    assert portal.stats["attendance_pages"] - pages_before == len(moved)
+    assert_counts_filled(dashboard, 33)
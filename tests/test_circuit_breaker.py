@@ -0,0 +1,71 @@
+"""CircuitBreaker state transitions and backoff_delay bounds."""
+import time
+
+import pytest
+
+from src import circuit_breaker
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    breaker = circuit_breaker.CircuitBreaker("test", failure_threshold=3, recovery_seconds=60)
+    fail(breaker, 2)
+    breaker.before_call()
+    breaker.record_success()
+    # A success resets the streak
+    fail(breaker, 2)
+    assert breaker.state == circuit_breaker.CLOSED
+
+    fail(breaker, 1)
+    assert breaker.is_open()
+    with pytest.raises(circuit_breaker.CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert 0 < excinfo.value.retry_after <= 60
+    state = breaker.get_state()
+    assert (state["opened"], state["rejected"], state["failures"]) == (1, 1, 5)
+    assert "retry_after_seconds" in state
+
+
+def test_half_open_trial_success_closes():
+    breaker = circuit_breaker.CircuitBreaker("test", failure_threshold=1, recovery_seconds=0.05, half_open_max_calls=1)
+    fail(breaker, 1)
+    time.sleep(0.06)
+    assert breaker.state == circuit_breaker.HALF_OPEN
+
+    breaker.before_call()
+    # Only half_open_max_calls trials at a time
+    with pytest.raises(circuit_breaker.CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == circuit_breaker.CLOSED
+    breaker.before_call()
+
+
+def test_half_open_trial_failure_reopens():
+    breaker = circuit_breaker.CircuitBreaker("test", failure_threshold=1, recovery_seconds=0.05)
+    fail(breaker, 1)
+    time.sleep(0.06)
+    fail(breaker, 1)
+    assert breaker.state == circuit_breaker.OPEN
+    assert breaker.get_state()["opened"] == 2
+
+
+def test_release_returns_a_half_open_slot():
+    breaker = circuit_breaker.CircuitBreaker("test", failure_threshold=1, recovery_seconds=0.05)
+    fail(breaker, 1)
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state == circuit_breaker.HALF_OPEN
+
+
+def test_backoff_delay_is_capped_full_jitter():
+    delays = [circuit_breaker.backoff_delay(attempt, 0.5, 5) for attempt in range(10) for _ in range(50)]
+    assert all(0 <= delay <= 5 for delay in delays)
+    assert all(circuit_breaker.backoff_delay(0, 0.5, 5) <= 0.5 for _ in range(50))
@@ -0,0 +1,189 @@
+"""
+db_queries.PostgresQueries against an in-memory SQLite database: payload fingerprints and
+save_scrape_if_changed. SQLite runs the same statements once %s placeholders become ?.
+"""
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from src import api
+from src import async_scraper
+from src import db_queries
+from src.dashboard_parser import DashboardData, payload_fingerprint
+
+SCHEMA = """
+CREATE TABLE cie_marks (
+    id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, subject_code TEXT NOT NULL, exam_type TEXT NOT NULL,
+    marks REAL, scraped_at TEXT NOT NULL, UNIQUE (user_id, subject_code, exam_type)
+);
+CREATE TABLE scrape_state (
+    user_id INTEGER PRIMARY KEY, payload_hash TEXT NOT NULL,
+    last_checked_at TEXT NOT NULL, last_changed_at TEXT NOT NULL
+);
+CREATE TABLE attendance (
+    id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, subject_code TEXT NOT NULL,
+    percentage REAL, present INTEGER, absent INTEGER, total INTEGER, scraped_at TEXT NOT NULL
+);
+"""
+
+T0 = datetime(2026, 1, 10, 9, 0, tzinfo=pytz.utc)
+
+
+class SqliteCursor:
+    def __init__(self, connection):
+        self._cursor = connection.cursor()
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(sql.replace("%s", "?"), [_sqlite_value(value) for value in params])
+
+    def executemany(self, sql, rows):
+        self._cursor.executemany(sql.replace("%s", "?"), [[_sqlite_value(value) for value in row] for row in rows])
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return _python_row(row) if row is not None else None
+
+    def fetchall(self):
+        return [_python_row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """Stands in for a RealDictCursor connection; close() leaves the shared database open."""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self):
+        return SqliteCursor(self._connection)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        pass
+
+
+def _sqlite_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _python_row(row):
+    # Timestamps come back as datetimes, like psycopg2 returns them
+    return {key: datetime.fromisoformat(row[key]) if key.endswith("_at") and row[key] else row[key]
+            for key in row.keys()}
+
+
+@pytest.fixture
+def database():
+    # The API reads through worker_pools threads
+    connection = sqlite3.connect(":memory:", check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def queries(database):
+    return db_queries.PostgresQueries(lambda: SqliteConnection(database), "SQLite")
+
+
+def rows(database, table):
+    return [_python_row(row) for row in database.execute(f"SELECT * FROM {table} ORDER BY id")]
+
+
+CIE_MARKS = {"CS301": {"MSE": 15.0, "ESE": 40.0}, "CS302": {"MSE": 12.5}}
+ATTENDANCE = [{"subject": "CS301", "percentage": 80.0, "present": 8, "absent": 2, "total": 10},
+              {"subject": "CS302", "percentage": 75.0, "present": 6, "absent": 2, "total": 8}]
+
+
+def test_fingerprint_ignores_key_order_and_tracks_values():
+    reordered_marks = {"CS302": {"MSE": 12.5}, "CS301": {"ESE": 40.0, "MSE": 15.0}}
+    assert payload_fingerprint(ATTENDANCE, CIE_MARKS) == payload_fingerprint(ATTENDANCE, reordered_marks)
+    assert DashboardData(ATTENDANCE, CIE_MARKS).fingerprint() == payload_fingerprint(ATTENDANCE, CIE_MARKS)
+
+    changed = [dict(ATTENDANCE[0], present=9), ATTENDANCE[1]]
+    assert payload_fingerprint(changed, CIE_MARKS) != payload_fingerprint(ATTENDANCE, CIE_MARKS)
+    assert payload_fingerprint(None, CIE_MARKS) != payload_fingerprint([], CIE_MARKS)
+
+
+def test_unchanged_payload_only_bumps_last_checked(queries, database):
+    fingerprint = payload_fingerprint(ATTENDANCE, CIE_MARKS)
+    assert queries.save_scrape_if_changed(1, CIE_MARKS, fingerprint, T0, ATTENDANCE) == "updated"
+    stored_marks = rows(database, "cie_marks")
+    assert len(stored_marks) == 3
+    assert queries.get_user_attendance(1) == ATTENDANCE
+
+    later = T0 + timedelta(hours=1)
+    assert queries.save_scrape_if_changed(1, CIE_MARKS, fingerprint, later, ATTENDANCE) == "unchanged"
+    # Same rows (same ids), not a delete and reinsert
+    assert rows(database, "cie_marks") == stored_marks
+    state = queries.get_scrape_state(1)
+    assert state["payload_hash"] == fingerprint
+    assert (state["last_checked_at"], state["last_changed_at"]) == (later, T0)
+
+
+def test_changed_payload_rewrites_and_missing_parts_keep_their_rows(queries, database):
+    queries.save_scrape_if_changed(1, CIE_MARKS, payload_fingerprint(ATTENDANCE, CIE_MARKS), T0, ATTENDANCE)
+
+    new_marks = {"CS301": {"MSE": 16.0}}
+    later = T0 + timedelta(hours=1)
+    # The attendance chart failed to parse this time
+    fingerprint = payload_fingerprint(None, new_marks)
+    assert queries.save_scrape_if_changed(1, new_marks, fingerprint, later, None) == "updated"
+    assert [(row["subject_code"], row["exam_type"], row["marks"]) for row in rows(database, "cie_marks")] == \
+        [("CS301", "MSE", 16.0)]
+    assert queries.get_user_attendance(1) == ATTENDANCE
+    state = queries.get_scrape_state(1)
+    assert (state["payload_hash"], state["last_changed_at"]) == (fingerprint, later)
+
+
+def test_empty_scrape_records_the_check_and_keeps_stored_rows(queries, database):
+    empty = DashboardData()
+    assert queries.save_scrape_if_changed(1, None, empty.fingerprint(), T0, None) == "unchanged"
+    assert queries.get_scrape_state(1) == {"payload_hash": empty.fingerprint(), "last_checked_at": T0,
+                                           "last_changed_at": T0}
+
+    fingerprint = payload_fingerprint(ATTENDANCE, CIE_MARKS)
+    later = T0 + timedelta(hours=1)
+    assert queries.save_scrape_if_changed(1, CIE_MARKS, fingerprint, later, ATTENDANCE) == "updated"
+    latest = later + timedelta(hours=1)
+    assert queries.save_scrape_if_changed(1, {}, empty.fingerprint(), latest, []) == "unchanged"
+    assert queries.get_user_attendance(1) == ATTENDANCE
+    assert len(rows(database, "cie_marks")) == 3
+    state = queries.get_scrape_state(1)
+    assert (state["payload_hash"], state["last_checked_at"]) == (fingerprint, latest)
+
+
+def test_student_without_charts_is_scraped_once(queries, monkeypatch):
+    for name in ("save_scrape_if_changed", "get_user_attendance", "get_scrape_state"):
+        monkeypatch.setattr(api.db_utils, f"{name}_pg", getattr(queries, name))
+    fetches = []
+
+    async def fetch_dashboard(*args):
+        fetches.append(args)
+        return DashboardData()
+
+    monkeypatch.setattr(async_scraper, "fetch_dashboard", fetch_dashboard)
+    user = {"id": 1, "prn": "PRN0001", "dob_day": "01", "dob_month": "02", "dob_year": "2004", "full_name": "ASHA RAO"}
+
+    async def scenario():
+        return [await api.load_attendance(user) for _ in range(2)]
+
+    (first, _, _), (second, _, refreshing) = asyncio.run(scenario())
+    assert first == second == []
+    assert not refreshing
+    assert len(fetches) == 1
@@ -0,0 +1,19 @@
+"""Conditional GET matching (api.etag_matches)."""
+import pytest
+
+from src import api
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ("", False),
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"zzz", W/"abc"', True),
+    ('"zzz",  "abc" ', True),
+    ("*", True),
+    ('"abcd"', False),
+    ('W/"zzz"', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert api.etag_matches(if_none_match, '"abc"') is expected
@@ -0,0 +1,54 @@
+"""json_codec.PrecomputedBody and BodyCache generation, TTL and size checks."""
+import json
+import time
+
+from src import json_codec
+
+
+def test_precomputed_body_etag_follows_the_bytes():
+    first = json_codec.PrecomputedBody({"rank": 1})
+    same = json_codec.PrecomputedBody({"rank": 1})
+    other = json_codec.PrecomputedBody({"rank": 2})
+    assert json.loads(first.body) == {"rank": 1}
+    assert first.etag == same.etag != other.etag
+
+
+def test_body_cache_hits_until_invalidated():
+    cache = json_codec.BodyCache(ttl_seconds=60)
+    assert cache.get("leaderboard") is None
+    body = cache.put("leaderboard", [1, 2], cache.generation)
+    assert cache.get("leaderboard") is body
+
+    cache.invalidate()
+    assert cache.get("leaderboard") is None
+    assert cache.get_stats() == {"ttl_seconds": 60, "size": 0, "hits": 1, "misses": 2, "invalidations": 1}
+
+
+def test_body_built_before_an_invalidation_is_not_cached():
+    cache = json_codec.BodyCache(ttl_seconds=60)
+    generation = cache.generation
+    # A scrape saves new marks while the leaderboard query was running
+    cache.invalidate()
+    body = cache.put("leaderboard", [1], generation)
+    assert json.loads(body.body) == [1]
+    assert cache.get("leaderboard") is None
+
+    cache.put("leaderboard", [2], cache.generation)
+    assert json.loads(cache.get("leaderboard").body) == [2]
+
+
+def test_body_cache_ttl_and_size_bounds():
+    disabled = json_codec.BodyCache(ttl_seconds=0)
+    disabled.put("k", 1, disabled.generation)
+    assert disabled.get("k") is None
+
+    short = json_codec.BodyCache(ttl_seconds=0.05)
+    short.put("k", 1, short.generation)
+    time.sleep(0.06)
+    assert short.get("k") is None
+
+    small = json_codec.BodyCache(ttl_seconds=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        small.put(key, key, small.generation)
+    assert small.get("a") is None and small.get("c") is not None
+    assert small.get_stats()["size"] == 2
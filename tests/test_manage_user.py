@@ -0,0 +1,65 @@
+"""docs/scripts/manage_user.py against an in-memory users table, with db_utils_neon's user cache in front."""
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "docs" / "scripts"))
+
+import manage_user
+
+
+class FakeUsersCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.result = None
+
+    def execute(self, sql, params):
+        if sql.lstrip().startswith("UPDATE users"):
+            first_name, prn, user_id = params
+            row = next(row for row in self.rows if row["id"] == user_id)
+            row.update(first_name=first_name, prn=prn)
+        else:
+            self.result = next((dict(row) for row in self.rows if row["first_name"] == params[0]), None)
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FakeUsersConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return FakeUsersCursor(self.rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def users(monkeypatch):
+    rows = [{"id": 7, "first_name": "asha", "full_name": "ASHA RAO", "prn": "OLD123",
+             "dob_day": "01", "dob_month": "02", "dob_year": "2004"}]
+    db_utils = manage_user.db_utils
+    monkeypatch.setattr(db_utils, "get_db_connection", lambda: FakeUsersConnection(rows))
+    db_utils.invalidate_user_cache("asha", "ashar")
+    yield rows
+    db_utils.invalidate_user_cache("asha", "ashar")
+
+
+@pytest.mark.parametrize("new_username", ["asha", "ashar"])
+def test_update_reads_back_the_new_row(users, new_username):
+    assert manage_user.db_utils.get_user_from_db_pg("asha")["prn"] == "OLD123"
+
+    assert manage_user.update_user_username_and_prn("asha", new_username, "NEW456") is True
+    assert users[0]["prn"] == "NEW456"
+    assert manage_user.db_utils.get_user_from_db_pg(new_username)["prn"] == "NEW456"
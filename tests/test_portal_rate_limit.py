@@ -0,0 +1,85 @@
+"""TokenBucket: burst, refill, the background reserve and sharing through the SQLite file."""
+import asyncio
+import time
+
+import pytest
+
+from src import portal_rate_limit
+
+
+@pytest.fixture
+def bucket_path(tmp_path):
+    return str(tmp_path / "buckets.sqlite3")
+
+
+def test_burst_then_wait_for_refill(bucket_path):
+    bucket = portal_rate_limit.TokenBucket(bucket_path, "portal", rate=10, burst=3, background_reserve=0)
+    assert [bucket.try_take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = bucket.try_take()
+    assert 0 < wait <= 0.1
+
+    waited = bucket.acquire()
+    assert waited > 0
+    stats = bucket.get_stats()["lanes"]["interactive"]
+    assert (stats["acquired"], stats["waited"]) == (1, 1)
+
+
+def test_background_lane_leaves_the_reserve_for_interactive_requests(bucket_path):
+    bucket = portal_rate_limit.TokenBucket(bucket_path, "portal", rate=0.001, burst=5, background_reserve=2)
+    taken = 0
+    while bucket.try_take(portal_rate_limit.BACKGROUND) == 0.0:
+        taken += 1
+    assert taken == 3
+    assert bucket.try_take(portal_rate_limit.INTERACTIVE) == 0.0
+    assert bucket.try_take(portal_rate_limit.INTERACTIVE) == 0.0
+    assert bucket.try_take(portal_rate_limit.INTERACTIVE) > 0
+
+
+def test_buckets_on_the_same_file_share_one_budget(bucket_path):
+    # Two instances stand in for two processes (API worker and batch updater)
+    api_bucket = portal_rate_limit.TokenBucket(bucket_path, "portal", rate=0.001, burst=2, background_reserve=0)
+    batch_bucket = portal_rate_limit.TokenBucket(bucket_path, "portal", rate=0.001, burst=2, background_reserve=0)
+    other_host = portal_rate_limit.TokenBucket(bucket_path, "test-portal", rate=0.001, burst=2, background_reserve=0)
+    assert api_bucket.try_take() == 0.0
+    assert batch_bucket.try_take() == 0.0
+    assert api_bucket.try_take() > 0
+    assert other_host.try_take() == 0.0
+
+
+def test_acquire_async_waits_without_blocking_the_loop(bucket_path):
+    bucket = portal_rate_limit.TokenBucket(bucket_path, "portal", rate=20, burst=1, background_reserve=0)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticking = asyncio.create_task(ticker())
+        start = time.monotonic()
+        waits = [await bucket.acquire_async() for _ in range(3)]
+        elapsed = time.monotonic() - start
+        ticking.cancel()
+        return waits, elapsed, ticks
+
+    waits, elapsed, ticks = asyncio.run(scenario())
+    assert waits[0] == 0.0 and waits[1] > 0 and waits[2] > 0
+    assert elapsed >= 0.08
+    assert ticks >= 5
+
+
+def test_lane_context_and_disabled_limit():
+    assert portal_rate_limit.current_lane() == portal_rate_limit.INTERACTIVE
+    with portal_rate_limit.lane(portal_rate_limit.BACKGROUND):
+        assert portal_rate_limit.current_lane() == portal_rate_limit.BACKGROUND
+    assert portal_rate_limit.current_lane() == portal_rate_limit.INTERACTIVE
+    with pytest.raises(ValueError):
+        with portal_rate_limit.lane("bulk"):
+            pass
+    # conftest sets PORTAL_RATE_LIMIT_PER_SECOND=0
+    assert portal_rate_limit.get_bucket() is None
+    assert portal_rate_limit.acquire() == 0.0
+    assert portal_rate_limit.get_stats() == {"enabled": False}
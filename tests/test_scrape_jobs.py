@@ -0,0 +1,161 @@
+"""ScrapeJobQueue: deduplication, the queue limit (503 from the API), retention and shutdown."""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import fake_portal
+from src import api
+from src import scrape_jobs
+
+
+async def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.005)
+
+
+def blocking_run(release):
+    async def run(job):
+        job.set_stage("portal")
+        await release.wait()
+        return {"ok": True}
+    return run
+
+
+def test_second_submit_for_a_key_returns_the_active_job():
+    async def scenario():
+        queue = scrape_jobs.ScrapeJobQueue(workers=1, max_queued=10, retention_seconds=60)
+        release = asyncio.Event()
+        try:
+            job, created = queue.submit("student-1", blocking_run(release))
+            again, created_again = queue.submit("student-1", blocking_run(release))
+            other, created_other = queue.submit("student-2", blocking_run(release))
+            assert (created, created_again, created_other) == (True, False, True)
+            assert again is job and other is not job
+
+            release.set()
+            await wait_for(lambda: job.done and other.done)
+            assert job.to_dict()["result"] == {"ok": True}
+            # Finished jobs no longer deduplicate
+            _, created_after = queue.submit("student-1", blocking_run(release))
+            assert created_after
+            stats = queue.get_stats()
+            assert (stats["submitted"], stats["deduplicated"]) == (3, 1)
+        finally:
+            await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_submit_beyond_max_queued_raises():
+    async def scenario():
+        queue = scrape_jobs.ScrapeJobQueue(workers=1, max_queued=1, retention_seconds=60)
+        release = asyncio.Event()
+        try:
+            running, _ = queue.submit("a", blocking_run(release))
+            await wait_for(lambda: running.status == scrape_jobs.RUNNING)
+            queue.submit("b", blocking_run(release))
+            with pytest.raises(scrape_jobs.QueueFullError):
+                queue.submit("c", blocking_run(release))
+            assert queue.get_stats()["rejected"] == 1
+        finally:
+            await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_api_answers_503_when_the_job_queue_is_full(monkeypatch):
+    students = {f"student{i}": {"id": i, **fake_portal.student_for_index(i)} for i in range(3)}
+    release = asyncio.Event()
+
+    async def slow_payload(username, user_details, set_stage=None):
+        await release.wait()
+        return {"user": {"username": username}}
+
+    monkeypatch.setattr(api.db_utils, "get_user_from_db_pg", lambda username: students.get(username))
+    monkeypatch.setattr(api, "build_fetch_payload", slow_payload)
+    monkeypatch.setattr(scrape_jobs, "job_queue", scrape_jobs.ScrapeJobQueue(workers=1, max_queued=1, retention_seconds=60))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            try:
+                first = await client.post("/api/data/fetch/student0?job=true")
+                await wait_for(lambda: scrape_jobs.job_queue.get(first.json()["job_id"]).status == scrape_jobs.RUNNING)
+                queued = await client.post("/api/data/fetch/student1?job=true")
+                duplicate = await client.post("/api/data/fetch/student1?job=true")
+                rejected = await client.post("/api/data/fetch/student2?job=true")
+                assert (first.status_code, queued.status_code, duplicate.status_code) == (202, 202, 202)
+                assert duplicate.json()["deduplicated"] and duplicate.json()["job_id"] == queued.json()["job_id"]
+                assert rejected.status_code == 503
+                assert rejected.headers["Retry-After"] == "5"
+
+                release.set()
+                await wait_for(lambda: scrape_jobs.job_queue.get(queued.json()["job_id"]).done)
+                polled = await client.get(queued.json()["status_url"])
+                assert polled.json()["status"] == scrape_jobs.SUCCEEDED
+            finally:
+                await scrape_jobs.close()
+
+    asyncio.run(scenario())
+
+
+def test_finished_jobs_expire_without_new_submissions():
+    async def scenario():
+        queue = scrape_jobs.ScrapeJobQueue(workers=1, max_queued=10, retention_seconds=0.05)
+
+        async def run(job):
+            return "done"
+
+        try:
+            job, _ = queue.submit("a", run)
+            await wait_for(lambda: job.done)
+            assert queue.get(job.id) is job
+            await asyncio.sleep(0.1)
+            assert queue.get_stats()["retained_jobs"] == 0
+            assert queue.get(job.id) is None
+        finally:
+            await queue.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_cancels_running_jobs():
+    async def scenario():
+        queue = scrape_jobs.ScrapeJobQueue(workers=1, max_queued=10, retention_seconds=60)
+        job, _ = queue.submit("a", blocking_run(asyncio.Event()))
+        await wait_for(lambda: job.status == scrape_jobs.RUNNING)
+        await queue.close()
+        assert job.status == scrape_jobs.FAILED
+        assert "cancelled" in job.error
+        assert queue.get_stats()["running"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_close_fails_queued_jobs_so_a_resubmit_runs():
+    async def scenario():
+        queue = scrape_jobs.ScrapeJobQueue(workers=1, max_queued=10, retention_seconds=60)
+        running, _ = queue.submit("a", blocking_run(asyncio.Event()))
+        queued, _ = queue.submit("b", blocking_run(asyncio.Event()))
+        await wait_for(lambda: running.status == scrape_jobs.RUNNING)
+        await queue.close()
+        assert queued.status == scrape_jobs.FAILED
+        assert "cancelled" in queued.error
+        assert queue.get(queued.id).to_dict()["status"] == scrape_jobs.FAILED
+
+        async def run(job):
+            return "done"
+
+        try:
+            job, created = queue.submit("b", run)
+            assert created and job is not queued
+            await wait_for(lambda: job.done)
+            assert job.result == "done"
+        finally:
+            await queue.close()
+
+    asyncio.run(scenario())
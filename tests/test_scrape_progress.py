@@ -0,0 +1,105 @@
+"""scrape_progress pub/sub, and the events an async fetch from the fake portal publishes."""
+import asyncio
+import json
+
+from src import async_scraper
+from src import config
+from src import scrape_progress
+from src import web_scraper
+
+
+def parse_message(message):
+    event_line, data_line, *_ = message.split("\n")
+    assert event_line.startswith("event: ") and data_line.startswith("data: ")
+    return event_line[len("event: "):], json.loads(data_line[len("data: "):])
+
+
+def test_subscribers_get_events_serialized_at_publish_time():
+    records = [{"subject": "CS", "percentage": 80}]
+    with scrape_progress.subscribe("prn-1", asyncio.Queue) as queue, \
+            scrape_progress.subscribe("prn-1", asyncio.Queue) as second_queue:
+        scrape_progress.publish("prn-1", scrape_progress.ATTENDANCE_PARSED, records)
+        scrape_progress.publish("prn-2", scrape_progress.LOGIN_OK)
+        records[0]["percentage"] = 0
+        assert scrape_progress.subscriber_count() == 2
+
+        event, message = queue.get_nowait()
+        assert event == scrape_progress.ATTENDANCE_PARSED
+        assert parse_message(message)[1]["data"] == [{"subject": "CS", "percentage": 80}]
+        assert second_queue.get_nowait()[0] == scrape_progress.ATTENDANCE_PARSED
+        assert queue.empty()
+    assert scrape_progress.subscriber_count() == 0
+    # No subscribers: a no-op
+    scrape_progress.publish("prn-1", scrape_progress.DONE)
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.events = []
+
+    def put_nowait(self, item):
+        self.events.append(parse_message(item[1]))
+
+
+def test_async_fetch_publishes_progress_in_order(student):
+    prn = student(40)[0]
+
+    async def scenario():
+        with scrape_progress.subscribe(prn, asyncio.Queue) as queue:
+            try:
+                dashboard = await async_scraper.fetch_dashboard(*student(40))
+            finally:
+                await async_scraper.close()
+            events = []
+            while not queue.empty():
+                events.append(parse_message(queue.get_nowait()[1]))
+        return dashboard, events
+
+    dashboard, events = asyncio.run(scenario())
+    names = [event for event, _ in events]
+    assert names[0] == scrape_progress.LOGIN_STARTED
+    assert set(names) == {scrape_progress.LOGIN_STARTED, scrape_progress.LOGIN_OK, scrape_progress.ATTENDANCE_PARSED,
+                          scrape_progress.CIE_PARSED, scrape_progress.ATTENDANCE_DETAILS}
+    assert len(names) == len(set(names))
+    assert names.index(scrape_progress.LOGIN_OK) < names.index(scrape_progress.ATTENDANCE_PARSED)
+    assert names.index(scrape_progress.ATTENDANCE_PARSED) < names.index(scrape_progress.ATTENDANCE_DETAILS)
+
+    data = {event: payload["data"] for event, payload in events}
+    assert [record["subject"] for record in data[scrape_progress.ATTENDANCE_PARSED]] == \
+        [record["subject"] for record in dashboard.attendance]
+    assert data[scrape_progress.CIE_PARSED] == dashboard.cie_marks
+    assert all(record["total"] is not None for record in data[scrape_progress.ATTENDANCE_DETAILS])
+
+
+def test_streamed_dashboard_publishes_charts_without_a_full_parse(portal, student, monkeypatch):
+    portal.padding_rows = 5000
+    monkeypatch.setattr(config, "PORTAL_STREAM_DASHBOARD", True)
+    prn = student(41)[0]
+    full_parses = []
+    parse_dashboard = web_scraper.parse_dashboard
+
+    def recording_parse(html):
+        full_parses.append(html)
+        return parse_dashboard(html)
+
+    monkeypatch.setattr(web_scraper, "parse_dashboard", recording_parse)
+
+    async def scenario():
+        try:
+            return await async_scraper.fetch_dashboard(*student(41))
+        finally:
+            await async_scraper.close()
+
+    with scrape_progress.subscribe(prn, RecordingQueue) as queue:
+        dashboard = asyncio.run(scenario())
+
+    # Both charts came from the stream, so the page was never searched again
+    assert full_parses == []
+    names = [event for event, _ in queue.events]
+    assert names[:4] == [scrape_progress.LOGIN_STARTED, scrape_progress.LOGIN_OK,
+                         scrape_progress.ATTENDANCE_PARSED, scrape_progress.CIE_PARSED]
+    assert len(names) == len(set(names))
+    data = {event: payload["data"] for event, payload in queue.events}
+    assert [record["subject"] for record in data[scrape_progress.ATTENDANCE_PARSED]] == \
+        [record["subject"] for record in dashboard.attendance]
+    assert data[scrape_progress.CIE_PARSED] == dashboard.cie_marks
@@ -0,0 +1,197 @@
+"""SingleFlight / AsyncSingleFlight: one call per key in flight, short reuse, failures never cached."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src import portal_rate_limit
+from src import single_flight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = single_flight.SingleFlight(reuse_seconds=0)
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return {"marks": 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("prn", fetch))) for _ in range(5)]
+    threads[0].start()
+    started.wait(2)
+    for thread in threads[1:]:
+        thread.start()
+    # Let the followers reach the in-flight call before it finishes
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert len(calls) == 1
+    assert len(results) == 5 and all(result is results[0] for result in results)
+    assert flight.get_stats() == {"leaders": 1, "coalesced": 4, "reused": 0}
+
+
+def test_result_is_reused_within_the_window_and_can_be_invalidated():
+    flight = single_flight.SingleFlight(reuse_seconds=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert flight.do("prn", fetch) == 1
+    assert flight.do("prn", fetch) == 1
+    assert flight.do("other", fetch) == 2
+    flight.invalidate("prn")
+    assert flight.do("prn", fetch) == 3
+    assert flight.get_stats()["reused"] == 1
+
+
+def test_reuse_window_expires():
+    flight = single_flight.SingleFlight(reuse_seconds=0.05)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return "page"
+
+    flight.do("prn", fetch)
+    time.sleep(0.1)
+    flight.do("prn", fetch)
+    assert len(calls) == 2
+
+
+def test_failures_are_not_reused():
+    flight = single_flight.SingleFlight(reuse_seconds=60)
+    outcomes = iter([ValueError("portal down"), None, "page"])
+
+    def fetch():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    with pytest.raises(ValueError):
+        flight.do("prn", fetch)
+    assert flight.do("prn", fetch) is None
+    assert flight.do("prn", fetch) == "page"
+
+
+def test_async_callers_share_one_task():
+    async def scenario():
+        flight = single_flight.AsyncSingleFlight(reuse_seconds=0)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "page"
+
+        results = await asyncio.gather(*(flight.do("prn", fetch) for _ in range(5)))
+        return calls, results, flight.get_stats()
+
+    calls, results, stats = asyncio.run(scenario())
+    assert len(calls) == 1 and results == ["page"] * 5
+    assert stats == {"leaders": 1, "coalesced": 4, "reused": 0}
+
+
+def test_cancelled_async_caller_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = single_flight.AsyncSingleFlight(reuse_seconds=60)
+        finished = []
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            finished.append(1)
+            return "page"
+
+        impatient = asyncio.create_task(flight.do("prn", fetch))
+        patient = asyncio.create_task(flight.do("prn", fetch))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        result = await patient
+        # The finished result is reused afterwards
+        reused = await flight.do("prn", fetch)
+        return impatient.cancelled(), result, reused, finished
+
+    impatient_cancelled, result, reused, finished = asyncio.run(scenario())
+    assert impatient_cancelled
+    assert (result, reused, finished) == ("page", "page", [1])
+
+
+def test_async_exception_is_shared_but_not_reused():
+    async def scenario():
+        flight = single_flight.AsyncSingleFlight(reuse_seconds=60)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            if len(calls) == 1:
+                raise ConnectionError("portal down")
+            return "page"
+
+        first = await asyncio.gather(flight.do("prn", fetch), flight.do("prn", fetch), return_exceptions=True)
+        second = await flight.do("prn", fetch)
+        return first, second, calls
+
+    first, second, calls = asyncio.run(scenario())
+    assert all(isinstance(result, ConnectionError) for result in first)
+    assert second == "page" and len(calls) == 2
+
+
+def test_interactive_caller_raises_a_background_leaders_lane(tmp_path):
+    # Two tokens left and a reserve of two: background requests wait, interactive ones don't
+    bucket = portal_rate_limit.TokenBucket(str(tmp_path / "bucket.sqlite3"), "portal", rate=0.001, burst=3,
+                                           background_reserve=2)
+    assert bucket.try_take() == 0.0
+    flight = single_flight.AsyncSingleFlight(reuse_seconds=0, on_join=portal_rate_limit.raise_lane)
+
+    async def fetch():
+        await bucket.acquire_async()
+        return portal_rate_limit.current_lane()
+
+    async def background_refresh():
+        with portal_rate_limit.lane(portal_rate_limit.BACKGROUND):
+            return await flight.do("prn", fetch)
+
+    async def scenario():
+        refresh = asyncio.ensure_future(background_refresh())
+        await asyncio.sleep(0.05)
+        assert not refresh.done()
+        interactive = await asyncio.wait_for(flight.do("prn", fetch), 2)
+        return interactive, await refresh, portal_rate_limit.current_lane()
+
+    interactive, background, caller_lane = asyncio.run(scenario())
+    assert interactive == background == portal_rate_limit.INTERACTIVE
+    assert caller_lane == portal_rate_limit.INTERACTIVE
+    assert bucket.get_stats()["lanes"]["interactive"]["acquired"] == 1
+    assert bucket.get_stats()["lanes"]["background"]["acquired"] == 0
+
+
+def test_background_caller_does_not_lower_an_interactive_leader():
+    flight = single_flight.AsyncSingleFlight(reuse_seconds=0, on_join=portal_rate_limit.raise_lane)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return portal_rate_limit.current_lane()
+
+        leader = asyncio.ensure_future(flight.do("prn", fetch))
+        await asyncio.sleep(0)
+        with portal_rate_limit.lane(portal_rate_limit.BACKGROUND):
+            follower = asyncio.ensure_future(flight.do("prn", fetch))
+            await asyncio.sleep(0)
+        release.set()
+        return await leader, await follower
+
+    assert asyncio.run(scenario()) == (portal_rate_limit.INTERACTIVE, portal_rate_limit.INTERACTIVE)
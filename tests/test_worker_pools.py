@@ -0,0 +1,60 @@
+"""BoundedPool runs work on its own threads, keeps working after shutdown() and counts its queue."""
+import asyncio
+import threading
+
+from src import worker_pools
+
+
+def test_pool_recreates_executor_after_shutdown():
+    pool = worker_pools.BoundedPool("test", 2)
+
+    async def thread_names():
+        first = await pool.run(lambda: threading.current_thread().name)
+        pool.shutdown()
+        second = await pool.run(lambda: threading.current_thread().name)
+        return first, second
+
+    try:
+        first, second = asyncio.run(thread_names())
+    finally:
+        pool.shutdown()
+    assert first.startswith("test-pool") and second.startswith("test-pool")
+    stats = pool.get_stats()
+    assert (stats["completed"], stats["failed"], stats["queued"], stats["active"]) == (2, 0, 0, 0)
+
+
+def test_shutdown_before_first_use_is_a_no_op():
+    pool = worker_pools.BoundedPool("idle", 1)
+    pool.shutdown()
+    assert asyncio.run(pool.run(sum, [1, 2, 3])) == 6
+    pool.shutdown()
+
+
+def test_work_cancelled_before_it_starts_leaves_the_queue():
+    pool = worker_pools.BoundedPool("cancel", 1)
+    release = threading.Event()
+
+    async def scenario():
+        busy = asyncio.ensure_future(pool.run(release.wait))
+        waiting = asyncio.ensure_future(pool.run(sum, [1]))
+        await asyncio.sleep(0.05)
+        assert pool.get_stats()["queued"] == 1
+        # The caller goes away while its work is still queued
+        waiting.cancel()
+        await asyncio.sleep(0.05)
+        assert pool.get_stats()["queued"] == 0
+        # shutdown() cancels whatever is still queued
+        queued = asyncio.ensure_future(pool.run(sum, [2]))
+        await asyncio.sleep(0.05)
+        pool.shutdown()
+        release.set()
+        await busy
+        await asyncio.gather(queued, return_exceptions=True)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    stats = pool.get_stats()
+    assert (stats["queued"], stats["active"], stats["completed"]) == (0, 0, 1)